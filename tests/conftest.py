@@ -0,0 +1,27 @@
+# This file sets up the UTodo application's tests: the modules are imported from the repository root,
+# and each test that asks for data_dir gets an empty data directory of its own.
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import utodo_core
+
+# an empty data directory, with every storage module pointed at it for the test
+@pytest.fixture
+def data_dir(tmp_path):
+	data_dir = tmp_path / "data"
+	data_dir.mkdir()
+	utodo_core.use_data_dir(data_dir)
+	return data_dir
+
+# a function writing a list file straight into the test's data directory, as if edited by hand
+# Args of the function: list_name string with whitespace; lines list of task lines
+@pytest.fixture
+def write_list(data_dir):
+	def write(list_name, lines):
+		(data_dir / f"{list_name.replace(' ', '_')}.txt").write_text("".join(f"{line}\n" for line in lines))
+	return write
@@ -0,0 +1,50 @@
+# Tests for the list catalog in utodo_catalog.
+
+import os
+
+import utodo_catalog
+import utodo_core
+
+# count the times the catalog walks the data directory, from here on
+def count_rescans(monkeypatch):
+	counts = {"rescans": 0}
+	rescan = utodo_catalog.rescan
+	def counting(old_lists, dir_mtime):
+		counts["rescans"] += 1
+		return rescan(old_lists, dir_mtime)
+	monkeypatch.setattr(utodo_catalog, "rescan", counting)
+	return counts
+
+# writes change the catalog in memory and it is saved once, when the process is done with it
+def test_changes_are_saved_once(data_dir, write_list, monkeypatch):
+	write_list("Chores", ["Sweep|2030-01-01|"])
+	utodo_catalog.get_catalog()
+	utodo_core.use_data_dir(data_dir)
+
+	saves = []
+	save_catalog = utodo_catalog.save_catalog
+	monkeypatch.setattr(utodo_catalog, "save_catalog", lambda new_catalog: saves.append(save_catalog(new_catalog)))
+	storage = utodo_core.storage()
+	for n in range(5):
+		storage.add_task("Chores", f"Task {n}|2030-01-01|")
+	assert saves == []
+	assert utodo_catalog.read_catalog()["lists"]["Chores"]["tasks"] == 1
+
+	utodo_core.use_data_dir(data_dir)
+	assert len(saves) == 1
+	assert utodo_catalog.read_catalog()["lists"]["Chores"]["tasks"] == 6
+	assert storage.num_tasks("Chores") == 6
+
+# the first run makes data/.utodo, which must not make the next run rescan the directory
+def test_next_run_does_not_rescan(data_dir, write_list, monkeypatch):
+	write_list("Chores", ["Sweep|2030-01-01|"])
+	write_list("Errands", ["Post office|2030-01-02|"])
+	os.utime(data_dir, ns=(10**18, 10**18)) # an mtime making data/.utodo would certainly move
+	assert not (data_dir / ".utodo").exists()
+	assert sorted(utodo_catalog.get_list_names()) == ["Chores", "Errands"]
+	utodo_core.use_data_dir(data_dir)
+
+	counts = count_rescans(monkeypatch)
+	assert sorted(utodo_catalog.get_list_names()) == ["Chores", "Errands"]
+	assert utodo_catalog.get_list_info("Errands")["tasks"] == 1
+	assert counts == {"rescans": 0}
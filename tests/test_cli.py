@@ -0,0 +1,41 @@
+# Tests for the non-interactive commands in utodo.py, run against both storage backends.
+
+import json
+
+import pytest
+
+import utodo
+import utodo_core
+
+# a data directory using the text or the SQLite backend, holding a "Chores" list with one task
+@pytest.fixture(params=["text", "sqlite"])
+def chores(request, data_dir):
+	(data_dir / "settings.json").write_text(json.dumps({"Storage": request.param}))
+	utodo_core.use_data_dir(data_dir) # picks the backend from the settings again
+	assert utodo.run_command(["add", "Chores", "Sweep", "--due", "2030-01-01"]) == 0
+	yield data_dir
+	utodo_core.use_data_dir(data_dir) # closes the database before the directory goes
+
+@pytest.mark.parametrize("argv", [
+	["list", "Errands"],
+	["list", "Chores", "Errands"],
+	["export", "--to", "-", "Errands"],
+	["complete", "0123456789abcdef", "--list", "Errands"],
+])
+def test_unknown_list(chores, capsys, argv):
+	capsys.readouterr()
+	assert utodo.run_command(argv) == 1
+	out, err = capsys.readouterr()
+	assert out == ""
+	assert err == 'List "Errands" not found\n'
+
+def test_list_and_complete(chores, capsys):
+	capsys.readouterr()
+	assert utodo.run_command(["list", "Chores"]) == 0
+	task_id, list_name, name, due, description = capsys.readouterr().out.rstrip("\n").split("\t")
+	assert (list_name, name, due) == ("Chores", "Sweep", "2030-01-01")
+
+	assert utodo.run_command(["complete", task_id, "--list", "Chores"]) == 0
+	assert capsys.readouterr().out == "Completed 1 task in Chores.\n"
+	assert utodo_core.storage().num_tasks("Chores") == 0
+	assert utodo_core.storage().num_tasks("Errands") == 0
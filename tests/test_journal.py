@@ -0,0 +1,88 @@
+# Tests for the write-ahead journal in utodo_journal.
+
+import json
+
+import utodo_journal
+from utodo_journal import task_id
+
+def test_replay_applies_entries_in_order():
+	lines = ["A|2030-01-01|", "B|2030-01-02|", "C|2030-01-03|"]
+	entries = [
+		{"op": "add", "task": "D|2030-01-04|"},
+		{"op": "add", "tasks": ["E|2030-01-05|", "F|2030-01-06|"]},
+		{"op": "edit", "id": task_id("B|2030-01-02|"), "task": "B2|2030-01-02|"},
+		{"op": "complete", "id": task_id("A|2030-01-01|")},
+		{"op": "delete", "id": task_id("E|2030-01-05|")},
+		{"op": "edit", "id": task_id("B2|2030-01-02|"), "task": "B3|2030-01-02|"},
+	]
+	assert utodo_journal.replay(lines, entries) == ["B3|2030-01-02|", "C|2030-01-03|", "D|2030-01-04|", "F|2030-01-06|"]
+	assert lines == ["A|2030-01-01|", "B|2030-01-02|", "C|2030-01-03|"] # the snapshot is left alone
+
+# an entry naming a task another session already removed changes nothing
+def test_replay_skips_missing_tasks():
+	lines = ["A|2030-01-01|"]
+	entries = [{"op": "delete", "id": task_id("Gone|2030-01-01|")}, {"op": "edit", "id": task_id("Gone|2030-01-01|"), "task": "X"}]
+	assert utodo_journal.replay(lines, entries) == lines
+
+# of exact duplicate lines, an entry applies to the last
+def test_replay_duplicates_take_the_last():
+	lines = ["A|2030-01-01|", "B|2030-01-02|", "A|2030-01-01|"]
+	entries = [{"op": "edit", "id": task_id("A|2030-01-01|"), "task": "A2|2030-01-01|"}]
+	assert utodo_journal.replay(lines, entries) == ["A|2030-01-01|", "B|2030-01-02|", "A2|2030-01-01|"]
+
+def test_appends_are_read_back(data_dir, write_list):
+	write_list("Chores", ["Sweep|2030-01-01|", "Dust|2030-01-02|"])
+	utodo_journal.append("Chores", {"op": "add", "task": "Mop|2030-01-03|"})
+	utodo_journal.append_many("Chores", [
+		{"op": "complete", "id": task_id("Sweep|2030-01-01|")},
+		{"op": "edit", "id": task_id("Dust|2030-01-02|"), "task": "Dust shelves|2030-01-02|"},
+	])
+	assert utodo_journal.read_list("Chores") == ["Dust shelves|2030-01-02|", "Mop|2030-01-03|"]
+	assert utodo_journal.count_entries("Chores") == 3
+	assert utodo_journal.read_range("Chores", 1, 2) == ["Mop|2030-01-03|"]
+
+# a crash part way through an append leaves a torn last line, which readers and the next append ignore
+def test_torn_last_line(data_dir, write_list):
+	write_list("Chores", ["Sweep|2030-01-01|"])
+	utodo_journal.append("Chores", {"op": "add", "task": "Mop|2030-01-03|"})
+	utodo_journal.close_all()
+	with open(utodo_journal.journal_path("Chores"), "a") as journal:
+		journal.write('{"op": "add", "task": "Half')
+
+	assert utodo_journal.read_list("Chores") == ["Sweep|2030-01-01|", "Mop|2030-01-03|"]
+	utodo_journal.append("Chores", {"op": "add", "task": "Dust|2030-01-02|"})
+	assert utodo_journal.read_list("Chores") == ["Sweep|2030-01-01|", "Mop|2030-01-03|", "Dust|2030-01-02|"]
+	assert all(json.loads(line) for line in utodo_journal.journal_path("Chores").read_text().splitlines())
+
+def test_compact_folds_the_journal_into_the_list(data_dir, write_list):
+	write_list("Chores", ["Sweep|2030-01-01|", "Dust|2030-01-02|"])
+	utodo_journal.append_many("Chores", [
+		{"op": "add", "task": "Mop|2030-01-03|"},
+		{"op": "delete", "id": task_id("Sweep|2030-01-01|")},
+	])
+	utodo_journal.compact("Chores")
+	assert not utodo_journal.journal_path("Chores").exists()
+	assert utodo_journal.list_path("Chores").read_text() == "Dust|2030-01-02|\nMop|2030-01-03|\n"
+	assert utodo_journal.read_list("Chores") == ["Dust|2030-01-02|", "Mop|2030-01-03|"]
+	assert utodo_journal.count_entries("Chores") == 0
+
+# enough appends compact on their own
+def test_append_compacts_past_the_threshold(data_dir, write_list, monkeypatch):
+	monkeypatch.setattr(utodo_journal, "COMPACT_THRESHOLD", 4)
+	write_list("Chores", [])
+	for n in range(4):
+		utodo_journal.append("Chores", {"op": "add", "task": f"Task {n}|2030-01-01|"})
+	assert not utodo_journal.journal_path("Chores").exists()
+	assert utodo_journal.list_path("Chores").read_text().count("\n") == 4
+
+# a journal left behind by a crash after compaction was written against the old list file, so it is ignored
+def test_stale_journal_is_ignored(data_dir, write_list):
+	write_list("Chores", ["Sweep|2030-01-01|"])
+	utodo_journal.append("Chores", {"op": "add", "task": "Mop|2030-01-03|"})
+	stale = utodo_journal.journal_path("Chores").read_text()
+	utodo_journal.compact("Chores")
+	utodo_journal.journal_path("Chores").write_text(stale)
+
+	assert utodo_journal.read_list("Chores") == ["Sweep|2030-01-01|", "Mop|2030-01-03|"]
+	utodo_journal.append("Chores", {"op": "add", "task": "Dust|2030-01-02|"})
+	assert utodo_journal.read_list("Chores") == ["Sweep|2030-01-01|", "Mop|2030-01-03|", "Dust|2030-01-02|"]
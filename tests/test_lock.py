@@ -0,0 +1,94 @@
+# Tests for the advisory list locks in utodo_lock.
+# Each thread opens its own lock file, so threads contend for a lock just as processes do.
+
+import sys
+import threading
+import subprocess
+from pathlib import Path
+
+import pytest
+
+import utodo_journal
+import utodo_lock
+
+# run fn in a thread once started, returning the thread and an event set once fn has returned
+def in_thread(fn):
+	done = threading.Event()
+	def run():
+		fn()
+		done.set()
+	thread = threading.Thread(target=run, daemon=True)
+	thread.start()
+	return thread, done
+
+# take a list's lock in another thread, hold it until the returned event is set, then release it
+def hold(list_name, mode):
+	taken, release = threading.Event(), threading.Event()
+	def run():
+		with utodo_lock.locked(list_name, mode):
+			taken.set()
+			release.wait(5)
+	thread, done = in_thread(run)
+	assert taken.wait(5)
+	return release, done
+
+def test_nested_holds_take_the_lock_once(data_dir):
+	with utodo_lock.exclusive("Chores"):
+		with utodo_lock.exclusive("Chores"):
+			with utodo_lock.shared("Chores"):
+				assert utodo_lock.local.held["Chores"][1:] == ["exclusive", 3]
+		assert utodo_lock.local.held["Chores"][2] == 1
+	assert "Chores" not in utodo_lock.local.held
+
+def test_shared_lock_cannot_be_upgraded(data_dir):
+	with utodo_lock.shared("Chores"):
+		with pytest.raises(RuntimeError):
+			with utodo_lock.exclusive("Chores"):
+				pass
+		assert utodo_lock.local.held["Chores"][1:] == ["shared", 1]
+
+def test_exclusive_waits_for_exclusive(data_dir, monkeypatch):
+	monkeypatch.setattr(utodo_lock, "waits", [])
+	release, holder_done = hold("Chores", "exclusive")
+	with utodo_lock.exclusive("Errands"): # another list's lock is free
+		pass
+
+	def write():
+		with utodo_lock.exclusive("Chores"):
+			pass
+	thread, done = in_thread(write)
+	assert not done.wait(0.2)
+	release.set()
+	assert done.wait(5)
+	assert max(utodo_lock.waits) >= 0.2
+
+def test_readers_share_and_keep_writers_out(data_dir):
+	release, holder_done = hold("Chores", "shared")
+	with utodo_lock.shared("Chores"): # another reader gets in
+		pass
+
+	def write():
+		with utodo_lock.exclusive("Chores"):
+			pass
+	thread, done = in_thread(write)
+	assert not done.wait(0.2)
+	release.set()
+	assert done.wait(5)
+
+# processes appending to one list at once lose none of each other's changes
+def test_concurrent_appends(data_dir, write_list):
+	write_list("Chores", [])
+	script = (
+		"import sys, utodo_core, utodo_journal\n"
+		"utodo_core.use_data_dir(sys.argv[1])\n"
+		"for n in range(100):\n"
+		"\tutodo_journal.append('Chores', {'op': 'add', 'task': f'{sys.argv[2]} {n}|2030-01-01|'})\n"
+	)
+	root = str(Path(__file__).parent.parent)
+	writers = [subprocess.Popen([sys.executable, "-c", script, str(data_dir), name], cwd=root) for name in ("A", "B", "C")]
+	assert [writer.wait(60) for writer in writers] == [0, 0, 0]
+
+	lines = utodo_journal.read_list("Chores")
+	assert sorted(lines) == sorted(f"{name} {n}|2030-01-01|" for name in "ABC" for n in range(100))
+	for name in "ABC":
+		assert [line for line in lines if line.startswith(name)] == [f"{name} {n}|2030-01-01|" for n in range(100)]
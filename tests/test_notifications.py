@@ -0,0 +1,42 @@
+# Tests for sending every user's digest in utodo_notifications.
+
+import json
+import logging
+
+import utodo_mailer
+import utodo_notifications
+
+# a mailer that keeps the messages it is given instead of sending them
+class KeepingMailer:
+	sent = []
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		pass
+
+	def send_all(self, messages):
+		self.sent.extend(messages)
+		return []
+
+# make a user's data directory with the given settings and one task due today
+def make_user(tmp_path, name, settings):
+	data_dir = tmp_path / name
+	data_dir.mkdir()
+	(data_dir / "settings.json").write_text(json.dumps(settings))
+	(data_dir / "Chores.txt").write_text(f"Sweep|{utodo_notifications.get_date().isoformat()}|\n")
+	return data_dir
+
+# a user whose digest fails in an unexpected way is logged and counted, and the others still get theirs
+def test_fan_out_survives_a_failing_user(tmp_path, monkeypatch, caplog):
+	monkeypatch.setattr(KeepingMailer, "sent", [])
+	monkeypatch.setattr(utodo_mailer.Mailer, "from_env", classmethod(lambda cls: KeepingMailer()))
+	good = make_user(tmp_path, "good", {"Email": "good@example.com"})
+	bad = make_user(tmp_path, "bad", {"Email": 5}) # not a list of addresses, a TypeError when read
+
+	with caplog.at_level(logging.ERROR):
+		assert utodo_notifications.fan_out([bad, good], workers=1) == 1
+	assert [msg["To"] for msg in KeepingMailer.sent] == ["good@example.com"]
+	assert "Sweep" in KeepingMailer.sent[0].as_string()
+	assert f"Could not build digest for {bad}: TypeError" in caplog.text
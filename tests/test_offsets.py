@@ -0,0 +1,69 @@
+# Tests for the line-offset index in utodo_offsets.
+
+import os
+
+import utodo_offsets
+
+LINES = ["Sweep|2030-01-01|", "Dust|2030-01-02|Shelves too", "Mop|2030-01-03|"]
+
+# count the times an offset file is written, from here on
+def count_saves(monkeypatch):
+	saves = []
+	save_offsets = utodo_offsets.save_offsets
+	def counting(list_name, data, stat):
+		saves.append(list_name)
+		save_offsets(list_name, data, stat)
+	monkeypatch.setattr(utodo_offsets, "save_offsets", counting)
+	return saves
+
+def test_index_describes_the_list_file(data_dir, write_list):
+	write_list("Chores", LINES)
+	index = utodo_offsets.get_offsets("Chores")
+	assert index.count == 3
+	assert [index.offset(num) for num in range(4)] == [0, 18, 46, 62]
+	assert list(index.task_ids()) == [utodo_offsets.line_id(line) for line in LINES]
+	assert utodo_offsets.read_lines("Chores", index, 1, 2) == LINES[1:]
+	assert utodo_offsets.get_offsets("Chores") is index # kept mapped while the list file is unchanged
+
+def test_saved_index_is_reused(data_dir, write_list, monkeypatch):
+	write_list("Chores", LINES)
+	utodo_offsets.get_offsets("Chores")
+	utodo_offsets.close_all()
+
+	saves = count_saves(monkeypatch)
+	assert utodo_offsets.get_offsets("Chores").count == 3
+	assert saves == []
+
+# an edit that keeps the file's size still moves its mtime, and the index is built again
+def test_edited_list_invalidates_the_index(data_dir, write_list, monkeypatch):
+	write_list("Chores", LINES)
+	stale = utodo_offsets.get_offsets("Chores")
+	saves = count_saves(monkeypatch)
+
+	write_list("Chores", ["Sweep|2030-01-09|"] + LINES[1:])
+	path = data_dir / "Chores.txt"
+	os.utime(path, ns=(stale.mtime_ns + 10**9, stale.mtime_ns + 10**9))
+	assert utodo_offsets.read_lines("Chores", stale, 0, 0) is None # changed since the index was checked
+
+	index = utodo_offsets.get_offsets("Chores")
+	assert saves == ["Chores"]
+	assert index.mtime_ns == path.stat().st_mtime_ns
+	assert utodo_offsets.read_lines("Chores", index, 0, 0) == ["Sweep|2030-01-09|"]
+
+def test_truncated_index_is_rebuilt(data_dir, write_list, monkeypatch):
+	write_list("Chores", LINES)
+	utodo_offsets.get_offsets("Chores")
+	utodo_offsets.close_all()
+	path = utodo_offsets.offsets_path("Chores")
+	path.write_bytes(path.read_bytes()[:-8])
+
+	saves = count_saves(monkeypatch)
+	assert list(utodo_offsets.get_offsets("Chores").task_ids()) == [utodo_offsets.line_id(line) for line in LINES]
+	assert saves == ["Chores"]
+
+def test_deleted_list_forgets_its_index(data_dir, write_list):
+	write_list("Chores", LINES)
+	utodo_offsets.get_offsets("Chores")
+	(data_dir / "Chores.txt").unlink()
+	assert utodo_offsets.get_offsets("Chores") is None
+	assert not utodo_offsets.offsets_path("Chores").exists()
@@ -0,0 +1,79 @@
+# Tests for repeating tasks in utodo_recur.
+
+from datetime import date
+from itertools import islice
+
+import pytest
+
+from utodo_recur import Rule, line_rule, parse_spec
+
+@pytest.mark.parametrize("text, spec", [
+	("daily", (1, "day")),
+	("Weekly", (1, "week")),
+	(" monthly ", (1, "month")),
+	("yearly", (12, "month")),
+	("every 3 days", (3, "day")),
+	("every 2 weeks", (2, "week")),
+	("2 months", (2, "month")),
+	("every 2 years", (24, "month")),
+	("every week", (1, "week")),
+])
+def test_parse_spec(text, spec):
+	assert parse_spec(text) == spec
+
+@pytest.mark.parametrize("text", ["", "fortnightly", "every 0 days", "every -1 weeks", "every 2 hours", "every two weeks"])
+def test_parse_spec_rejects(text):
+	with pytest.raises(ValueError):
+		parse_spec(text)
+
+@pytest.mark.parametrize("text", [
+	"2025-12-16 every 1 month",
+	"2025-12-16 every 2 weeks done 2026-01-13",
+	"2025-12-16 every 1 month done 2026-01-16 except 2026-03-16,2026-05-16",
+])
+def test_rule_round_trips(text):
+	assert Rule.parse(text).to_text() == text
+
+@pytest.mark.parametrize("text", ["2025-12-16", "2025-12-16 every 0 days", "2025-02-30 every 1 day", "2025-12-16 every 1 year"])
+def test_rule_parse_rejects(text):
+	assert Rule.parse(text) is None
+
+def test_line_rule():
+	assert line_rule("Pay rent|2026-01-01 every 1 month|Flat") == Rule(date(2026, 1, 1), 1, "month")
+	assert line_rule("Pay rent|2026-01-01|Flat") is None
+	assert line_rule("Pay rent") is None
+
+# months without the start's day of the month fall on their last day, and later months go back to it
+def test_monthly_occurrences_keep_the_day():
+	rule = Rule(date(2026, 1, 31), 1, "month")
+	assert list(rule.occurrences(last=date(2026, 4, 30))) == [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)]
+	assert list(Rule(date(2024, 2, 29), 12, "month").occurrences(last=date(2028, 3, 1))) == \
+		[date(2024, 2, 29), date(2025, 2, 28), date(2026, 2, 28), date(2027, 2, 28), date(2028, 2, 29)]
+
+def test_occurrences_in_a_window():
+	rule = Rule(date(2026, 1, 1), 2, "week", exceptions={date(2026, 1, 29)})
+	assert list(rule.occurrences(date(2026, 1, 10), date(2026, 2, 28))) == [date(2026, 1, 15), date(2026, 2, 12), date(2026, 2, 26)]
+	assert list(islice(Rule(date(2026, 1, 1), 3, "day").occurrences(date(2030, 1, 1)), 2)) == [date(2030, 1, 1), date(2030, 1, 4)]
+	assert list(rule.occurrences(last=date(2025, 12, 31))) == []
+
+def test_next_due_skips_done_and_exceptions():
+	rule = Rule(date(2026, 1, 1), 1, "day", done=date(2026, 1, 3), exceptions={date(2026, 1, 4)})
+	assert rule.next_due() == date(2026, 1, 5)
+
+# completing the earliest occurrence moves "done", absorbing the exceptions right after it
+def test_complete_in_order():
+	rule = Rule(date(2026, 1, 1), 1, "week")
+	rule = rule.complete(date(2026, 1, 15)) # ahead of the earliest, so recorded as an exception
+	assert rule.to_text() == "2026-01-01 every 1 week except 2026-01-15"
+	assert rule.next_due() == date(2026, 1, 1)
+
+	rule = rule.complete(date(2026, 1, 1))
+	assert rule.to_text() == "2026-01-01 every 1 week done 2026-01-01 except 2026-01-15"
+	rule = rule.complete(date(2026, 1, 8))
+	assert rule.to_text() == "2026-01-01 every 1 week done 2026-01-15"
+	assert rule.next_due() == date(2026, 1, 22)
+
+def test_complete_leaves_the_rule_alone():
+	rule = Rule(date(2026, 1, 1), 1, "day")
+	rule.complete(date(2026, 1, 1))
+	assert rule.done is None
@@ -0,0 +1,54 @@
+# Tests for the text storage backend's write path in utodo_storage.
+
+from datetime import date
+
+import utodo_core
+import utodo_index
+import utodo_search
+
+# count the lists each index reads in full, from here on
+def count_reindexes(monkeypatch):
+	counts = {"due": 0, "search": 0}
+	def counting(name, add_list_entries):
+		def add(self, index, list_name, sig):
+			counts[name] += 1
+			add_list_entries(self, index, list_name, sig)
+		return add
+	monkeypatch.setattr(utodo_index.DueIndex, "add_list_entries", counting("due", utodo_index.DueIndex.add_list_entries))
+	monkeypatch.setattr(utodo_search.SearchIndex, "add_list_entries", counting("search", utodo_search.SearchIndex.add_list_entries))
+	return counts
+
+# a write from a fresh process patches the saved indexes instead of reading its list again
+def test_single_write_does_not_reindex(data_dir, write_list, monkeypatch):
+	write_list("Big", [f"Task {n}|2030-01-01|" for n in range(1000)])
+	utodo_index.get_index()
+	utodo_search.get_index()
+	utodo_core.use_data_dir(data_dir) # saves both indexes and forgets everything, like the end of a run
+
+	counts = count_reindexes(monkeypatch)
+	storage = utodo_core.storage()
+	storage.add_task("Big", "Fresh task|2030-01-02|")
+	storage.remove_task("Big", 1, "complete", "Task 0|2030-01-01|")
+	storage.edit_task("Big", 1, "Task 1 edited|2030-01-03|", "Task 1|2030-01-01|")
+	assert counts == {"due": 0, "search": 0}
+
+	utodo_core.use_data_dir(data_dir)
+	assert [line for day, list_name, line in utodo_index.list_run(utodo_index.get_index(), "Big")][-2:] == \
+		["Fresh task|2030-01-02|", "Task 1 edited|2030-01-03|"]
+	assert utodo_search.search("fresh") == [("Big", "Fresh task|2030-01-02|")]
+	assert counts == {"due": 0, "search": 0}
+
+# writes to a data directory whose indexes were never built leave building them to the first query
+def test_write_does_not_build_missing_indexes(data_dir, write_list, monkeypatch):
+	write_list("Big", [f"Task {n}|2030-01-01|" for n in range(1000)])
+
+	counts = count_reindexes(monkeypatch)
+	storage = utodo_core.storage()
+	storage.add_task("Big", "Fresh task|2030-01-02|")
+	storage.remove_task("Big", 1, "complete", "Task 0|2030-01-01|")
+	utodo_core.use_data_dir(data_dir)
+	assert counts == {"due": 0, "search": 0}
+	assert not (data_dir / ".utodo" / "due_index.json").exists()
+
+	assert storage.due_between(date(2030, 1, 2), date(2030, 1, 2)) == [("Big", "Fresh task|2030-01-02|")]
+	assert counts["due"] == 1
@@ -0,0 +1,70 @@
+# Tests for CSV and JSON lines import in utodo_transfer.
+
+import json
+
+import pytest
+
+import utodo
+import utodo_core
+import utodo_transfer
+
+# write lines to a file in the test's temporary directory and return its path
+@pytest.fixture
+def source(tmp_path):
+	def write(file_name, lines):
+		path = tmp_path / file_name
+		path.write_text("".join(f"{line}\n" for line in lines))
+		return path
+	return write
+
+# import a file, returning the error it stopped at and the tasks it left in "Chores"
+def import_file(path):
+	with pytest.raises(ValueError) as error:
+		utodo_transfer.import_records(utodo_transfer.read_records(path))
+	return str(error.value), utodo_core.storage().read_list("Chores")
+
+def test_import_csv_and_jsonl(data_dir, source):
+	csv_path = source("tasks.csv", ["list,name,due,description", "Chores,Sweep,2030-01-01,", "Chores,Dust,01/02/2030,Shelves"])
+	jsonl_path = source("tasks.jsonl", [
+		json.dumps({"list": "Chores", "name": "Mop", "due": "2030-01-03 every 1 week"}),
+		"",
+		json.dumps({"list": "Chores", "name": "Sweep", "due": "2030-01-01", "description": ""}),
+	])
+	assert utodo_transfer.import_records(utodo_transfer.read_records(csv_path)) == (2, 0)
+	assert utodo_transfer.import_records(utodo_transfer.read_records(jsonl_path)) == (1, 1)
+	assert utodo_core.storage().read_list("Chores") == ["Sweep|2030-01-01|", "Dust|2030-01-02|Shelves", "Mop|2030-01-03 every 1 week|"]
+
+# everything before a bad record is kept
+@pytest.mark.parametrize("record, error", [
+	('{"list": "Chores", "name": "Dust"', "line 2 is not valid JSON"),
+	('["Chores", "Dust", "2030-01-02"]', "record 2: expected an object with fields list, name, due, description"),
+	('{"name": "Dust", "due": "2030-01-02"}', "record 2: missing field 'list'"),
+	('{"list": "Chores", "name": 5, "due": "2030-01-02"}', "record 2: field 'name' must be text, not 5"),
+	('{"list": "Chores", "name": "Dust"}', "record 2: missing field 'due'"),
+	('{"list": "Chores", "name": "Dust", "due": null}', "record 2: missing field 'due'"),
+	('{"list": "Chores", "name": "Dust", "due": 20300102}', "record 2: due date must be text, not 20300102"),
+	('{"list": "Chores", "name": "Dust", "due": "2030-02-30"}', "record 2: time data '2030-02-30' does not match format"),
+	('{"list": "Chores", "name": "Dust|Polish", "due": "2030-01-02"}', "record 2: cannot store task 'Dust|Polish' in list 'Chores'"),
+	('{"list": " ", "name": "Dust", "due": "2030-01-02"}', "record 2: cannot store task 'Dust' in list ''"),
+])
+def test_malformed_jsonl(data_dir, source, record, error):
+	path = source("tasks.jsonl", [json.dumps({"list": "Chores", "name": "Sweep", "due": "2030-01-01"}), record])
+	message, tasks = import_file(path)
+	assert message.startswith(error)
+	assert tasks == ["Sweep|2030-01-01|"]
+
+@pytest.mark.parametrize("lines, error", [
+	(["list,name,due,description", "Chores,Sweep,2030-01-01,", "Chores,Dust"], "record 2: missing field 'due'"),
+	(["list,name,due,description", "Chores,Sweep,2030-01-01,", "Chores,Dust,tomorrow,"], "record 2: time data 'tomorrow' does not match format"),
+	(["list,name,description", "Chores,Sweep,"], "record 1: missing field 'due'"),
+])
+def test_malformed_csv(data_dir, source, lines, error):
+	utodo_core.storage().create_list("Chores")
+	message, tasks = import_file(source("tasks.csv", lines))
+	assert message.startswith(error)
+	assert tasks == (["Sweep|2030-01-01|"] if lines[0] == "list,name,due,description" else [])
+
+def test_import_command_reports_bad_records(data_dir, source, capsys):
+	path = source("tasks.jsonl", [json.dumps({"list": "Chores", "name": "Sweep", "due": "2030-01-01"}), "{"])
+	assert utodo.run_command(["import", "--from", str(path)]) == 1
+	assert capsys.readouterr().err.startswith("Import stopped at a bad record: line 2 is not valid JSON")
@@ -1,61 +1,52 @@
 import sys
-import os
-import json
+import argparse
+import itertools
 import subprocess
 import logging
-from datetime import datetime
-from pathlib import Path
+from datetime import datetime, date, timedelta
 
-# set up log config
+import utodo_core
+import utodo_journal
+import utodo_metrics
+import utodo_transfer
+from utodo_core import storage
+from utodo_recur import Rule, parse_spec
+from utodo_task import Task, parse_due
 
-logging.basicConfig(filename='utodo.log', 
-                    level=logging.INFO, 
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+# The menus and commands below are a shell over utodo_core, which holds the lists, tasks and settings
 
-# return the number of to-do lists stored
-def get_num_lists():
-
-	num_lists = 0
-
-	directory = Path("data")
+# number of tasks shown on each page of a to-do list
+PAGE_SIZE = 20
 
-	# iterate through files in data subdirectory and count them
-	for file in directory.iterdir():
-		if file.is_file() and file.suffix == ".txt":
-			num_lists += 1
+# number of search results shown before asking for a narrower search
+SEARCH_LIMIT = 50
 
-	return num_lists
+# return the number of to-do lists stored
+def get_num_lists():
+	return utodo_core.num_lists()
 
 # return the number of tasks in to-do list passed as arg list_num
 def get_num_tasks(list_name):
-
-	line_count = 0
-	with open(f"data/{list_name.replace(' ', '_')}.txt", "r") as file: # open file with name given
-		line_count = sum(1 for line in file) # sum the lines
-	return line_count
+	return utodo_core.num_tasks(list_name)
 
 # return a list of to-do lists
 def get_lists():
-	directory = Path("data")
-
-	# iterates through the files in the subdirectory /data and stores in list tdlists
-	i = 1
-	tdlists = []
-	for file in directory.iterdir():
-		if file.is_file() and file.suffix == ".txt":
-			tdlists.append(file.stem.replace('_', ' '))
-			i += 1
-	return tdlists
+	return utodo_core.list_names()
 
-# return a dictionary of tasks in a to-do list
+# return a dictionary of tasks in a to-do list, as Task records keyed by position
 def get_tasks(list_name):
-	tasks = {}
-	i = 1
-	with open(f"data/{list_name.replace(' ', '_')}.txt", "r") as file: # reads every line in the to-do list's file
-		for line in file.read().splitlines():
-			tasks[f"{i}"] = line # set each entry in dict
-			i += 1
-	return tasks
+	return {f"{i}": task for i, task in enumerate(utodo_core.read_tasks(list_name), 1)}
+
+# return a single task of a to-do list as a Task record
+# Args: list_name string with whitespace, ie. "Sample List"; task_num integer matching task pos in memory
+def get_task(list_name, task_num):
+	return utodo_core.get_task(list_name, task_num)
+
+# returns a task's due date for display, with how often it repeats for a repeating task
+def due_label(task):
+	if task.recurring:
+		return f"{task.next_due}, repeats {task.due.describe()}"
+	return task.due_text or "not set"
 
 # displays navigation footer 
 # Args: True=display main menu navigation msg, False=no main menu navigation msg
@@ -70,6 +61,8 @@ def display_main_menu():
 	print("[1] View to-do lists")
 	print("[2] Create new to-do list")
 	print("[3] Notification settings")
+	print("[4] Search tasks")
+	print("[5] Agenda - what's due next across every list")
 	print("\n---------------------------------")
 	display_nav_footer(False)
 
@@ -84,14 +77,13 @@ def display_lists():
 
 		print("\n----------- TO-DO LISTS -----------\n")
 
-		directory = Path("data")
-
-		# iterates through the files in the subdirectory /data and prints their names
+		# iterates through the cataloged to-do lists and prints their names and task counts
 
 		tdlists = get_lists()
 		i = 1
 		for list in tdlists:
-			print(f"[{i}] {list}")
+			num_tasks = get_num_tasks(list)
+			print(f"[{i}] {list} ({num_tasks} {'task' if num_tasks == 1 else 'tasks'})")
 
 			i += 1
 
@@ -99,44 +91,108 @@ def display_lists():
 
 	display_nav_footer(True)
 
-# displays tasks for to-do list
-# Args: list_name string with whitespace, ie. "Sample List"
-def display_tasks(list_name):
-
-	if get_num_tasks(list_name) == 0:
-		print(f"\n----------- {list_name} -----------\n")
+# returns how a to-do list is being browsed: which page, whether sorted by due date, and the due date filter
+def new_list_view():
+	return {"page": 1, "by_due": False, "first": None, "last": None, "tasks": None}
+
+# returns the tasks on the current page of a list view as [(task number, Task), ...], and the number of pages
+# In list order only the page's tasks are read; sorted or filtered, the list is sorted once and kept in the view
+# Args: list_name string with whitespace, ie. "Sample List"; view dict from new_list_view
+def get_page(list_name, view):
+	sorted_view = view["by_due"] or view["first"] is not None or view["last"] is not None
+	if sorted_view and view["tasks"] is None:
+		view["tasks"] = utodo_core.tasks_by_due(list_name, view["first"], view["last"])
+	num_tasks = len(view["tasks"]) if sorted_view else get_num_tasks(list_name)
+
+	num_pages = max(1, -(-num_tasks // PAGE_SIZE))
+	view["page"] = min(max(view["page"], 1), num_pages)
+	start = (view["page"] - 1) * PAGE_SIZE
+	if sorted_view:
+		return view["tasks"][start:start + PAGE_SIZE], num_pages
+	return utodo_core.read_page(list_name, start, PAGE_SIZE), num_pages
+
+# displays a page of tasks for to-do list
+# Args: list_name string with whitespace, ie. "Sample List"; view dict from new_list_view, None for the first page
+def display_tasks(list_name, view=None):
+	view = view or new_list_view()
+	filtered = view["first"] is not None or view["last"] is not None
+
+	print(f"\n----------- {list_name} -----------\n")
+	page, num_pages = get_page(list_name, view)
+	if not page and filtered:
+		print("\tNo tasks due in that range.")
+	elif not page:
 		print("\tNo active tasks in this to-do list.")
-		print("\n------------------------------------\n")
 	else:
-
-		print(f"\n----------- {list_name} -----------\n")
-
-		# iterates through tasks and prints them
-		tasks = get_tasks(list_name)
-		i = 1
-		for task in tasks.values():
-			task_name = task.split('|')[0] # gets everything in the string before the first '|' char... the task name
-			print(f"[{i}] {task_name}")
-			i += 1
-
-		print("\n------------------------------------\n")
-
+		# prints the tasks on this page - numbers are positions in the list, whatever the order shown
+		for task_num, task in page:
+			if view["by_due"] or filtered:
+				print(f"[{task_num}] {task.name} (due {due_label(task)})")
+			else:
+				print(f"[{task_num}] {task.name}")
+
+		print(f"\nPage {view['page']} of {num_pages}")
+	print("\n------------------------------------\n")
+
+	if num_pages > 1:
+		print("Type 'N' or 'P' for the next or previous page, 'G' and a number to jump to a page (ie. G3)")
+	print("Type 'S' to show list order" if view["by_due"] else "Type 'S' to sort by due date")
+	print("Type 'F' to clear the due date filter" if filtered else "Type 'F' to filter by due date")
 	print("Type 'C' to create a new task")
 	print("Type 'D' to delete the entire to-do list (Irreversible!)")
 	display_nav_footer(True)
 
+# displays the tasks matching a search, across every to-do list
+# Args: query string of words, ie. "credit stat"; first/last datetime.date objects or None
+def display_search_results(query, first=None, last=None):
+	results = utodo_core.search_tasks(query, first, last)
+
+	print(f"\n----------- SEARCH: {query} -----------\n")
+	if not results:
+		print("\tNo tasks found.")
+	for list_name, task in results[:SEARCH_LIMIT]:
+		print(f"{list_name}: {task.name} (due {due_label(task)})")
+	if len(results) > SEARCH_LIMIT:
+		print(f"\n... and {len(results) - SEARCH_LIMIT} more. Add words or a date range to narrow the search.")
+	print("\n------------------------------------\n")
+
+# displays what is due next across every to-do list, after the tasks that are already overdue
+# Upcoming tasks are shown a page at a time, merged from every list only as far as the page needs
+def display_agenda():
+	today = date.today()
+
+	print("\n------------- AGENDA -------------\n")
+	overdue = list(itertools.islice(utodo_core.agenda(None, today - timedelta(days=1)), PAGE_SIZE + 1))
+	print("Overdue:")
+	if not overdue:
+		print("\tNothing overdue!")
+	for day, list_name, line, task in overdue[:PAGE_SIZE]:
+		print(f"  {day.strftime('%m/%d/%Y')}  {list_name}: {task.name}")
+	if len(overdue) > PAGE_SIZE:
+		print("  ... and more. Open their lists to catch up.")
+
+	print("\nComing up:")
+	upcoming = utodo_core.agenda(today)
+	while True:
+		page = list(itertools.islice(upcoming, PAGE_SIZE))
+		if not page:
+			print("\tNothing else due.")
+		for day, list_name, line, task in page:
+			print(f"  {day.strftime('%m/%d/%Y')}  {list_name}: {task.name}")
+		if len(page) < PAGE_SIZE or input("\nType 'N' to see more, or anything else to return to the main menu: ").lower() != "n":
+			break
+	print("\n----------------------------------\n")
+
 # displays a specific task's details within a to-do list
 # Args: list_name string with whitespace, ie. "Sample List"; task_num integer matching task pos in memory
 def display_task(list_name, task_num):
-	# get the tasks for that list, get task data and split into strings
-	tasks = get_tasks(list_name)
-	task_details = tasks.get(str(task_num)).split('|')
-	task_details[2].strip()
+	# get the task from that list
+	task = get_task(list_name, task_num)
 
 	# print task information
-	print(f"------------ {task_details[0]} ------------")
-	print(f"Description: {task_details[2]}")
-	print(f"Due date: {task_details[1]}")
+	print(f"------------ {task.name} ------------")
+	print(f"Description: {task.description or ''}")
+	print(f"Due date: {due_label(task) if task.recurring else task.due_text}")
 	print("----------------------------------------\n")
 
 # parses input for a date in MM/DD/YYYY format
@@ -145,12 +201,67 @@ def get_valid_date():
 		user_input = input()
 		try:
 			# Try to parse this input according to the format specified...
-			date = datetime.strptime(user_input, "%m/%d/%Y").date()
+			date = parse_due(user_input)
 			print("Valid date entered.")
 			return date
 		except ValueError:
 			print("Invalid format! Please enter a date in format MM/DD/YYYY")
 
+# parses input for how often a task repeats, returning (every, unit) or None if left blank
+def get_valid_repeat():
+	while True:
+		user_input = input().strip()
+		if user_input == "":
+			return None
+		try:
+			return parse_spec(user_input)
+		except ValueError:
+			print("Invalid repeat! Type daily, weekly, monthly, yearly or every N days/weeks/months/years, or leave it blank")
+
+# parses input for an optional date in MM/DD/YYYY format, returning None if left blank
+# Args: prompt string shown before the input
+def get_optional_date(prompt):
+	while True:
+		user_input = input(prompt).strip()
+		if user_input == "":
+			return None
+		try:
+			return parse_due(user_input)
+		except ValueError:
+			print("Invalid format! Please enter a date in format MM/DD/YYYY")
+
+# handles the paging, sorting and filtering options of the task menu
+# Returns True if option was one of them and the page should be shown again
+# Args: view dict from new_list_view; option the user's input
+def browse_list(view, option):
+	option = option.strip().lower()
+	match option[:1]:
+		case "n" if option == "n":
+			view["page"] += 1
+		case "p" if option == "p":
+			view["page"] -= 1
+		case "g":
+			page = option[1:].strip() or input("Go to page: ").strip()
+			if not page.isdigit():
+				print("Invalid page number.")
+			else:
+				view["page"] = int(page)
+		case "s" if option == "s":
+			view["by_due"] = not view["by_due"]
+			view["tasks"] = None
+			view["page"] = 1
+		case "f" if option == "f":
+			if view["first"] is not None or view["last"] is not None:
+				view["first"] = view["last"] = None
+			else:
+				view["first"] = get_optional_date("Show tasks due from (MM/DD/YYYY, blank for no start): ")
+				view["last"] = get_optional_date("Show tasks due until (MM/DD/YYYY, blank for no end): ")
+			view["tasks"] = None
+			view["page"] = 1
+		case _:
+			return False
+	return True
+
 # parses input for a time in HH:MM format
 def get_valid_time():
 	while True:
@@ -163,29 +274,17 @@ def get_valid_time():
 		except ValueError:
 			print("Invalid format! Please enter a time in format HH:MM")
 
-# writes the file for a new to-do list
+# creates a new, empty to-do list in storage and returns where it was saved
 # Args: list_name string with whitespace, ie. "Sample List"
 def create_new_list(list_name):
+	return storage().create_list(list_name)
 
-	# make the file path
-	file_name = list_name.replace(' ', '_')
-	file_path = f"data/{file_name}.txt"
-
-	# create the file with given file path
-	open(file_path, "w").close()
-	return file_path
-
-# deletes the file for a to-do list
+# deletes a to-do list from storage
 # Args: list_name string with whitespace, ie. "Sample List"
 def delete_list(list_name):
 
-	# make the file path
-	file_name = list_name.replace(' ', '_')
-	file_path = Path(f"data/{file_name}.txt")
-
-	# PERMANENTLY delete the file with given file path
-	if file_path.exists():
-		file_path.unlink(missing_ok=True) # if somehow an error is thrown, nothing happens and silent
+	# PERMANENTLY delete the list
+	if storage().delete_list(list_name):
 		print("File deleted successfully!")
 		return True
 	else:
@@ -204,14 +303,16 @@ def create_new_task(list_name):
 	print("|  Example:   11/02/2025   ---   \"November 2, 2025\"")
 	date = get_valid_date() # take input for a date and validate it
 	print(f"Due date set to {date}")
+	print("Does this task repeat? Type daily, weekly, monthly, yearly or every N days/weeks/months/years (leave blank if not)")
+	repeat = get_valid_repeat()
+	due = Rule(date, *repeat) if repeat else date
 	print("Give your new task a short description:")
 	description = input()
 
-	tasks = get_tasks(list_name)
-	task = f"{name}|{date}|{description}\n" # task as should appear in file
+	task = Task(name, due, description).to_line() # task as should appear in file
 
-	# Check to see if exact task already exists in the to-do list -- returns True if it finds a match
-	task_exists = any(task.strip() == t.strip() for t in tasks.values())
+	# Check to see if exact task already exists in the to-do list -- a hash lookup, not a scan of the list
+	task_exists = storage().has_task(list_name, task)
 
 	if task_exists:
 		print("This exact task already exists! Try again.")
@@ -219,57 +320,53 @@ def create_new_task(list_name):
 	else:
 		# display summary of task ...
 		print("You have successfully created a task! View your new task below:\n")
-		print(f"{name} | Due: {date} | {description}\n")
+		print(f"{name} | Due: {date}{f' (repeats {due.describe()})' if repeat else ''} | {description}\n")
 
 		# implement storing this data
 		print("Saving new task . . .")
 
-		# make the file path
-		file_name = list_name.replace(' ', '_')
-		file_path = f"data/{file_name}.txt"
-
-		# open the file and append new task to it
-		with open(file_path, "a") as list:
-			list.write(task)
+		# add the new task to the end of the list
+		storage().add_task(list_name, task)
 
 		print("Task saved! Returning to list menu.")
 
-# overwrites appropriate to-do list file without the specified task
-# Args: list_name string with whitespace, ie. "Sample List"; task_num integer matching task pos in memory
-def delete_task(list_name, task_num):
-
-	tasks = get_tasks(list_name)
-	task = tasks.get(str(task_num))
+# message for a change refused because another session changed the task first
+CHANGED_ELSEWHERE = "This task was changed or removed in another session in the meantime, so it was left alone."
 
-	# make file path
-	file_name = list_name.replace(' ', '_')
-	file_path = f"data/{file_name}.txt"
+# message for a task number that no longer exists because another session removed tasks from the list
+TASK_GONE = "That task is no longer in this list - it was removed in another session."
 
-	# open file and write its contents to an array
-	with open(file_path, "r") as list:
-		current_tasks = list.readlines()
+# removes the specified task from the appropriate to-do list
+# Args: list_name string with whitespace, ie. "Sample List"; task_num integer matching task pos in memory;
+#       op "delete" or "complete", recorded by the text storage's journal;
+#       old_task the task's line as it was shown, so a task changed in another session is not removed
+def delete_task(list_name, task_num, op="delete", old_task=None):
 
-	# overwrite the file without the task to be deleted
-	with open(file_path, "w") as new_list:
-		for line in current_tasks:
-			if task not in line:
-				new_list.write(line)
+	try:
+		storage().remove_task(list_name, task_num, op, old_task)
+	except LookupError:
+		print(CHANGED_ELSEWHERE)
+		return
 
 	print("Task removed!")
 
-# overwrites the file with new information for a given task
+# records new information for a given task
 # Args: list_name string with whitespace, ie. "Sample List"; task_num integer matching task pos in memory
 def edit_task(list_name, task_num):
 
 	# store current task data... will be written over in editing
-	tasks = get_tasks(list_name)
-	task_details = tasks.get(str(task_num)).split('|')
-	task_details[2].strip() # strips newline character from description
+	try:
+		old_task = utodo_core.task_line(list_name, task_num)
+	except IndexError:
+		print(TASK_GONE)
+		return
+	task = Task.from_line(old_task)
 
 	# these are still old values, but will be overwritten in editing
-	new_name = task_details[0]
-	new_date = task_details[1]
-	new_description = task_details[2]
+	new_name = task.name
+	new_date = task.due.start if task.recurring else (task.due if task.due is not None else "")
+	new_repeat = (task.due.every, task.due.unit) if task.recurring else None
+	new_description = task.description or ""
 
 	display_task(list_name, task_num)
 
@@ -279,6 +376,7 @@ def edit_task(list_name, task_num):
 		print("[1] Name")
 		print("[2] Due Date")
 		print("[3] Description")
+		print("[4] Repeat")
 		print("\nSelect an option. Type \"done\" when finished editing:")
 		option = input()
 
@@ -296,6 +394,10 @@ def edit_task(list_name, task_num):
 			case "3":
 				new_description = input("Enter a new description for this task:\n")
 				print(f"New task description set to: {new_description}")
+			case "4":
+				print("How often should this task repeat? Type daily, weekly, monthly, yearly or every N days/weeks/months/years (leave blank to stop repeating)")
+				new_repeat = get_valid_repeat()
+				print(f"Task set to repeat every {new_repeat[0]} {new_repeat[1]}(s)" if new_repeat else "Task set to not repeat")
 			case "done":
 				editing = False
 				print("Editing complete!")
@@ -308,23 +410,30 @@ def edit_task(list_name, task_num):
 			print(f"Due date: {new_date}")
 			print("----------------------------------------\n")
 
+	# a repeating task keeps its completed occurrences unless its start or repeat changed
+	new_due = new_date
+	if new_repeat is not None and isinstance(new_date, date):
+		unchanged = task.recurring and (new_date, new_repeat) == (task.due.start, (task.due.every, task.due.unit))
+		new_due = task.due if unchanged else Rule(new_date, *new_repeat)
+	elif new_repeat is not None:
+		print("A repeating task needs a valid due date - set one to make it repeat.")
+	elif task.recurring and new_date == task.due.start:
+		new_due = new_date = task.next_due # stopped repeating: due on the occurrence that was outstanding
 
 	# display summary of task ...
 	print("View the edited task below:\n")
-	print(f"{new_name} | Due: {new_date} | {new_description}\n")
+	print(f"{new_name} | Due: {new_date}{f' (repeats {new_due.describe()})' if isinstance(new_due, Rule) else ''} | {new_description}\n")
 	print("\nSaving task . . .\n")
 
-	# parse details and store in tasks
-	new_task = f"{new_name}|{new_date}|{new_description}" # task as should appear in file
-	tasks[str(task_num)] = new_task
-
-	# make file path
-	file_name = list_name.replace(' ', '_')
-	file_path = f"data/{file_name}.txt"
+	# parse details into the task line
+	new_task = Task(new_name, new_due, new_description).to_line() # task as should appear in file
 
-	# overwrite list file to store new edited data
-	with open(file_path, "w") as list:
-		list.writelines(f"{task}\n" for task in tasks.values())
+	# store the edited task in place of the old one, unless another session changed it while we edited
+	try:
+		storage().edit_task(list_name, task_num, new_task, old_task)
+	except LookupError:
+		print(CHANGED_ELSEWHERE)
+		return
 
 	print("Task saved! Returning to list menu.")
 
@@ -333,8 +442,18 @@ def edit_task(list_name, task_num):
 def view_task(list_name, task_num):
 
 	# eventually input data for task... for now placeholder data
+	try:
+		old_task = utodo_core.task_line(list_name, task_num)
+	except IndexError:
+		print(TASK_GONE)
+		return 'l'
 	display_task(list_name, task_num)
-	print("Type 'C' to complete/delete this task")
+	recurring = Task.from_line(old_task).recurring
+	if recurring:
+		print("Type 'C' to complete this occurrence of the task")
+		print("Type 'D' to delete this repeating task")
+	else:
+		print("Type 'C' to complete/delete this task")
 	print("Type 'E' to edit the details of this task")
 	print("Type 'L' to return to list menu")
 	display_nav_footer(True)
@@ -346,8 +465,19 @@ def view_task(list_name, task_num):
 
 		# check option
 		match option.lower():
+			case 'c' if recurring:
+				try:
+					task = utodo_core.complete_task(list_name, task_num, old_task) # records the occurrence as done, the task stays
+				except LookupError:
+					print(CHANGED_ELSEWHERE)
+					return
+				print(f"Occurrence completed! Next due {task.next_due}.")
+				return
 			case 'c':
-				delete_task(list_name, task_num)
+				delete_task(list_name, task_num, "complete", old_task)
+				return
+			case 'd' if recurring:
+				delete_task(list_name, task_num, old_task=old_task)
 				return
 			case 'e':
 				print("Editing task")
@@ -363,7 +493,13 @@ def view_task(list_name, task_num):
 				print("Invalid option.")
 
 # Attempts to run bash file utodo_cron_edit to automatically edit crontab
+# Skipped while the notification daemon runs, since it picks up the new time itself
+@utodo_metrics.timed("cron_edit")
 def call_cron_edit():
+	import utodo_daemon # only needed here, and slow to import with the email modules behind it
+	if utodo_daemon.daemon_running():
+		logging.info("Notification daemon is running, crontab left unchanged")
+		return
 	try:
     		result = subprocess.run(['/bin/bash', 'utodo_cron_edit'], capture_output=True, text=True, check=True)
     		if result.stderr:
@@ -373,16 +509,213 @@ def call_cron_edit():
     		logging.error(f"Error executing script: {e}")
     		logging.error(f"Stderr: {e.stderr}")
 
-# main program:
-running = True
-current_menu = "main" # by default, main menu
-
-# check if program has never run or data folder somehow doesn't exist... first time setup
-if not os.path.exists("data"):
+# parses a due date given on the command line, as YYYY-MM-DD or MM/DD/YYYY
+def parse_date_arg(text):
+	try:
+		return parse_due(text)
+	except ValueError:
+		raise argparse.ArgumentTypeError(f"invalid date '{text}' (use YYYY-MM-DD or MM/DD/YYYY)")
+
+# parses a span of days like "7d" or "2w" into a number of days
+def parse_span_arg(text):
+	units = {"d": 1, "w": 7}
+	if len(text) > 1 and text[-1] in units and text[:-1].isdigit():
+		return int(text[:-1]) * units[text[-1]]
+	if text.isdigit():
+		return int(text)
+	raise argparse.ArgumentTypeError(f"invalid span '{text}' (use a number of days like 7d or weeks like 2w)")
+
+# argparse type for --repeat: daily, weekly, monthly, yearly or "every N days/weeks/months/years"
+def parse_repeat_arg(text):
+	try:
+		return parse_spec(text)
+	except ValueError:
+		raise argparse.ArgumentTypeError(f"invalid repeat '{text}' (use daily, weekly, monthly, yearly or eg. 'every 2 weeks')")
+
+# prints one task line for scripts: id, list, name, due date and description separated by tabs
+# Args: list_name string; line the task as stored, which its id comes from; task the Task to show,
+#       ie. one occurrence of a repeating task, parsed from line if None
+def print_task_row(list_name, line, task=None):
+	task = task or Task.from_line(line)
+	print("\t".join([utodo_journal.task_id(line), list_name, task.name, task.due_text, task.description or ""]))
+
+# prints an error for the first of the named lists that does not exist, returning whether they all do
+# Args: list_names list of strings with whitespace, ie. ["Sample List"]
+def lists_exist(list_names):
+	known = set(get_lists())
+	for list_name in list_names:
+		if list_name not in known:
+			print(f'List "{list_name}" not found', file=sys.stderr)
+			return False
+	return True
+
+# utodo add LIST NAME --due DATE [--description TEXT]
+def command_add(args):
+	due = Rule(args.due, *args.repeat) if args.repeat else args.due
+	record = {"list": args.list, "name": args.name, "due": due, "description": args.description}
+	added, skipped = utodo_transfer.import_records([record])
+	if skipped:
+		print("This exact task already exists!")
+		return 1
+	print(f"Added task to {args.list}.")
+	return 0
+
+# utodo import --from FILE [--format csv|jsonl] - streams tasks in, skipping exact duplicates
+def command_import(args):
+	try:
+		added, skipped = utodo_transfer.import_records(utodo_transfer.read_records(args.source, args.format))
+	except ValueError as e:
+		print(f"Import stopped at a bad record: {e}", file=sys.stderr)
+		return 1
+	print(f"Imported {added} tasks ({skipped} duplicates skipped).", file=sys.stderr if args.source == "-" else sys.stdout)
+	return 0
+
+# utodo export --to FILE [--format csv|jsonl] [LIST ...] - streams tasks out
+def command_export(args):
+	if not lists_exist(args.lists):
+		return 1
+	count = utodo_transfer.write_records(utodo_transfer.export_records(args.lists), args.target, args.format)
+	print(f"Exported {count} tasks.", file=sys.stderr if args.target == "-" else sys.stdout)
+	return 0
+
+# utodo list [LIST ...] - prints every task with its id
+def command_list(args):
+	if not lists_exist(args.lists):
+		return 1
+	for list_name in args.lists or get_lists():
+		for task in storage().read_list(list_name):
+			print_task_row(list_name, task)
+	return 0
+
+# utodo search WORD [WORD ...] [--from DATE] [--to DATE] - prints tasks with words starting with every WORD
+def command_search(args):
+	for list_name, task in storage().search(" ".join(args.words), args.first, args.last):
+		print_task_row(list_name, task)
+	return 0
+
+# utodo agenda [--limit N] [--overdue] - prints the next tasks due across every list, in due-date order
+def command_agenda(args):
+	today = date.today()
+	if args.overdue:
+		for day, list_name, line, task in utodo_core.agenda(None, today - timedelta(days=1)):
+			print_task_row(list_name, line, task)
+	for day, list_name, line, task in itertools.islice(utodo_core.agenda(today), args.limit):
+		print_task_row(list_name, line, task)
+	return 0
+
+# utodo due --within SPAN [--overdue] - prints tasks due from today through the span
+def command_due(args):
+	today = date.today()
+	first = None if args.overdue else today
+	for list_name, line, task in utodo_core.due_occurrences(first, today + timedelta(days=args.within)):
+		print_task_row(list_name, line, task)
+	return 0
+
+# utodo complete ID [ID ...] [--list LIST] - completes tasks by the ids shown by list/due
+def command_complete(args):
+	if args.list and not lists_exist([args.list]):
+		return 1
+	remaining = set(args.ids)
+	for list_name in ([args.list] if args.list else get_lists()):
+		if not remaining:
+			break
+
+		# the list is locked from finding the tasks until they are completed, so no other session can move them
+		with storage().lock(list_name):
+			task_nums = []
+			for num, task in enumerate(storage().read_list(list_name), 1):
+				task_id = utodo_journal.task_id(task)
+				if task_id in remaining:
+					remaining.discard(task_id)
+					task_nums.append(num)
+
+			# a repeating task has its next occurrence completed and stays; the rest are removed together
+			repeating = [num for num in task_nums if utodo_core.get_task(list_name, num).recurring]
+			for num in repeating:
+				utodo_core.complete_task(list_name, num)
+			task_nums = [num for num in task_nums if num not in repeating]
+			if task_nums:
+				storage().remove_tasks(list_name, task_nums, "complete")
+		if task_nums or repeating:
+			completed = len(task_nums) + len(repeating)
+			print(f"Completed {completed} {'task' if completed == 1 else 'tasks'} in {list_name}.")
+
+	for task_id in sorted(remaining):
+		print(f"No task with id {task_id}.")
+	return 1 if remaining else 0
+
+# utodo dupes - prints tasks that share a name and due date across lists but differ in description
+def command_dupes(args):
+	groups = storage().near_duplicates()
+	for num, group in enumerate(groups):
+		if num:
+			print()
+		for list_name, task in group:
+			print_task_row(list_name, task)
+	return 0
+
+# runs a single non-interactive command and returns its exit status
+# Args: argv command line arguments after the program name
+def run_command(argv):
+	parser = argparse.ArgumentParser(prog="utodo", description="Unix To-Do List. Run with no arguments for the interactive menus.")
+	commands = parser.add_subparsers(dest="command", required=True)
+
+	add_parser = commands.add_parser("add", help="add a task to a list")
+	add_parser.add_argument("list")
+	add_parser.add_argument("name")
+	add_parser.add_argument("--due", required=True, type=parse_date_arg)
+	add_parser.add_argument("--description", default="")
+	add_parser.add_argument("--repeat", type=parse_repeat_arg, metavar="REPEAT", help="daily, weekly, monthly, yearly or eg. 'every 2 weeks'")
+	add_parser.set_defaults(run=command_add)
+
+	import_parser = commands.add_parser("import", help="add tasks in bulk from a CSV or JSON lines file")
+	import_parser.add_argument("--from", dest="source", required=True, metavar="FILE", help="'-' reads stdin")
+	import_parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+	import_parser.set_defaults(run=command_import)
+
+	export_parser = commands.add_parser("export", help="write tasks to a CSV or JSON lines file")
+	export_parser.add_argument("lists", nargs="*", metavar="LIST", help="default: every list")
+	export_parser.add_argument("--to", dest="target", required=True, metavar="FILE", help="'-' writes stdout")
+	export_parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+	export_parser.set_defaults(run=command_export)
+
+	list_parser = commands.add_parser("list", help="print tasks with their ids")
+	list_parser.add_argument("lists", nargs="*", metavar="LIST")
+	list_parser.set_defaults(run=command_list)
+
+	due_parser = commands.add_parser("due", help="print tasks due soon")
+	due_parser.add_argument("--within", default=0, type=parse_span_arg, metavar="SPAN", help="eg. 7d or 2w; default today only")
+	due_parser.add_argument("--overdue", action="store_true", help="include tasks that are already past due")
+	due_parser.set_defaults(run=command_due)
+
+	agenda_parser = commands.add_parser("agenda", help="print the next tasks due across every list")
+	agenda_parser.add_argument("--limit", type=int, default=PAGE_SIZE, metavar="N", help=f"how many upcoming tasks to print (default {PAGE_SIZE})")
+	agenda_parser.add_argument("--overdue", action="store_true", help="print every overdue task first")
+	agenda_parser.set_defaults(run=command_agenda)
+
+	complete_parser = commands.add_parser("complete", help="complete tasks by id")
+	complete_parser.add_argument("ids", nargs="+", metavar="ID")
+	complete_parser.add_argument("--list", help="only look in this list")
+	complete_parser.set_defaults(run=command_complete)
+
+	dupes_parser = commands.add_parser("dupes", help="print near-duplicate tasks across lists")
+	dupes_parser.set_defaults(run=command_dupes)
+
+	search_parser = commands.add_parser("search", help="print tasks whose name or description has words starting with WORDS")
+	search_parser.add_argument("words", nargs="+", metavar="WORD")
+	search_parser.add_argument("--from", dest="first", type=parse_date_arg, metavar="DATE", help="only tasks due on or after DATE")
+	search_parser.add_argument("--to", dest="last", type=parse_date_arg, metavar="DATE", help="only tasks due on or before DATE")
+	search_parser.set_defaults(run=command_search)
+
+	args = parser.parse_args(argv)
+	return args.run(args)
+
+# first time setup: makes the data directory and asks for notification settings
+def first_time_setup():
 
 	print("Program startup:")
 
-	os.makedirs("data") # make data directory
+	utodo_core.init_data_dir() # make data directory
 	print("- Data directory initialized.")
 
 	# eventually have it initialize the settings json file as well
@@ -401,8 +734,7 @@ if not os.path.exists("data"):
 		"Time": time
 	}
 
-	with open("data/settings.json", "w") as settings_file:
-		json.dump(settings_data, settings_file, indent=4)
+	utodo_core.write_settings(settings_data)
 
 	# Runs cron edit script to ensure cronjob is updated with new time information
 	call_cron_edit()
@@ -410,214 +742,244 @@ if not os.path.exists("data"):
 	print("\n- Notification settings initialized.\n")
 	print("Startup tasks complete!\n\n")
 
+# runs the interactive menus until the user quits
+def run_menu():
+
+	running = True
+	current_menu = "main" # by default, main menu
+
+	# main menu loop
+	while running:
+
+		if current_menu == "main":
+			display_main_menu()
+			option = input("Please select a menu option: ")
+			match option:
+				case "1":
+					current_menu = "lists"
+				case "2":
+					current_menu = "new"
+				case "3":
+					current_menu = "settings"
+					# call notification settings menu
+					print("Changing notification settings")
+				case "4":
+					current_menu = "search"
+				case "5":
+					display_agenda()
+				case "q" | "Q":
+					# quit program
+					print("Now closing program...")
+					running = False
+					sys.exit(0)
+				case _:
+					print("Invalid option. Please select menu option again.")
+
+		else:		# loop into inner menus
+			match current_menu:
+				case "lists":
+
+					# get the lists, display them, accept input
+					tdlists = get_lists()
+					display_lists()
+					list_choice = input("Select a list number or menu option to continue: ")
+
+					if list_choice.isdigit():
+						list_choice = int(list_choice)
+						if list_choice <= get_num_lists():	# user selected valid list - enter task menu
+
+							list_name = tdlists[list_choice - 1]
+
+							# display the tasks in the list a page at a time until the user picks something other than paging
+							view = new_list_view()
+							while True:
+								display_tasks(list_name, view)
+								task_choice = input("Select a task number or menu option to continue: ")
+								if not browse_list(view, task_choice):
+									break
+
+							if task_choice.isdigit(): # user selected a task to view
+								task_choice = int(task_choice)
+								if task_choice <= get_num_tasks(list_name):	# user selected valid task - enter edit menu
+									edit_result = view_task(list_name, task_choice)
+									if edit_result == 'l': # check for menu selection that was NOT editing/completing
+										print("Returning to list menu.")
+										continue
+									elif edit_result == 'm':
+										print("Returning to main menu.")
+										current_menu = "main"
+										continue
+									elif edit_result == 'q':
+										# quit program
+										print("Now closing program...")
+										running = False
+										sys.exit(0)
 
-# main menu loop
-while running:
+								else:
+									print(f"There are only {get_num_tasks(list_name)} tasks available to choose from.")
+									print("Please select a menu option.")
+
+							elif task_choice.lower() == 'c':	# user selected to create a task - enter create menu
+								create_new_task(list_name)
+
+							elif task_choice.lower() == 'd':	# user selected delete list
+								# confirm deletion
+								confirmation = input("Are you sure you want to delete this to-do list? This is an irreversible decision. (Y/N) ")
+								if confirmation.lower() == 'y':
+									if delete_list(list_name): # runs deletion function and returns True if successful
+										print("To-do list has successfully been deleted.")
+									else:
+										print("To-do list unable to be removed. Please try again.")
+									current_menu = "main"
+									continue
 
-	if current_menu == "main":
-		display_main_menu()
-		option = input("Please select a menu option: ")
-		match option:
-			case "1":
-				current_menu = "lists"
-			case "2":
-				current_menu = "new"
-			case "3":
-				current_menu = "settings"
-				# call notification settings menu
-				print("Changing notification settings")
-			case "q" | "Q":
-				# quit program
-				print("Now closing program...")
-				running = False
-				sys.exit(0)
-			case _:
-				print("Invalid option. Please select menu option again.")
+								elif confirmation.lower() == 'n':
+									# should make it to where it can loop back to show tasks again.. for now just to lists
+									print("Returning to list menu.")
+									continue
 
-	else:		# loop into inner menus
-		match current_menu:
-			case "lists":
+								else:
+									# should make it to where it can loop back to show tasks again... for now just to lists
+									print("That is not a valid option. Returning to list menu.")
+									current_menu = "lists"
+									continue
 
-				# get the lists, display them, accept input
-				tdlists = get_lists()
-				display_lists()
-				list_choice = input("Select a list number or menu option to continue: ")
+							elif task_choice.lower() == 'm':	# user selected return to main menu
+								current_menu = "main"
+								continue
 
-				if list_choice.isdigit():
-					list_choice = int(list_choice)
-					if list_choice <= get_num_lists():	# user selected valid list - enter task menu
+							elif task_choice.lower() == 'q':	# user selected to QUIT program
+								# quit program
+								print("Now closing program...")
+								running = False
+								sys.exit(0)
 
-						list_name = tdlists[list_choice - 1]
+							else:	# invalid option
+								print("Invalid option. Please select a task number or menu option.")
 
-						display_tasks(list_name) # display the tasks in the list
-						task_choice = input("Select a task number or menu option to continue: ")
+						else:	# user selected a list number that doesn't exist...
+							print(f"There are only {get_num_lists()} lists available to choose from.")
+							print("Please select a menu option.")
 
-						if task_choice.isdigit(): # user selected a task to view
-							task_choice = int(task_choice)
-							if task_choice <= get_num_tasks(list_name):	# user selected valid task - enter edit menu
-								edit_result = view_task(list_name, task_choice)
-								if edit_result == 'l': # check for menu selection that was NOT editing/completing
-									print("Returning to list menu.")
-									continue
-								elif edit_result == 'm':
-									print("Returning to main menu.")
-									current_menu = "main"
-									continue
-								elif edit_result == 'q':
-									# quit program
-									print("Now closing program...")
-									running = False
-									sys.exit(0)
-
-							else:
-								print(f"There are only {get_num_tasks(list_choice)} lists available to choose from.")
-								print("Please select a menu option.")
-
-						elif task_choice.lower() == 'c':	# user selected to create a task - enter create menu
-							create_new_task(list_name)
-
-						elif task_choice.lower() == 'd':	# user selected delete list
-							# confirm deletion
-							confirmation = input("Are you sure you want to delete this to-do list? This is an irreversible decision. (Y/N) ")
-							if confirmation.lower() == 'y':
-								if delete_list(list_name): # runs deletion function and returns True if successful
-									print("To-do list has successfully been deleted.")
-								else:
-									print("To-do list unable to be removed. Please try again.")
-								current_menu = "main"
-								continue
+					elif list_choice.lower() == 'm':	# user selected return to main menu
+						current_menu = "main"
+						continue
 
-							elif confirmation.lower() == 'n':
-								# should make it to where it can loop back to show tasks again.. for now just to lists
-								print("Returning to list menu.")
-								continue
+					elif list_choice.lower() == 'q':	# user selected to QUIT program
+						# quit program
+						print ("Now closing program...")
+						running = False
+						sys.exit(0)
 
-							else:
-								# should make it to where it can loop back to show tasks again... for now just to lists
-								print("That is not a valid option. Returning to list menu.")
-								current_menu = "lists"
-								continue
+					else:	# user selected an invalid option
+						print("Invalid option. Please select a menu option.")
 
-						elif task_choice.lower() == 'm':	# user selected return to main menu
-							current_menu = "main"
-							continue
+				case "new":
 
-						elif task_choice.lower() == 'q':	# user selected to QUIT program
-							# quit program
-							print("Now closing program...")
-							running = False
-							sys.exit(0)
+					print("Give your new to-do list a short name (Recommended: less than 50 characters)")
+					list_name = input()
 
-						else:	# invalid option
-							print("Invalid option. Please select a task number or menu option.")
+					# check to see if to-do list with that name already exists
+					tdlists = get_lists()
+					while list_name in tdlists:
+						print(f"A to-do list with the name {list_name} already exists!")
+						print("Give your new to-do list another short name (Recommended: less than 50 characters)")
+						list_name = input()
 
-					else:	# user selected a list number that doesn't exist...
-						print(f"There are only {get_num_lists()} lists available to choose from.")
-						print("Please select a menu option.")
+					# create the new list and store in data dir
+					list_file_path = create_new_list(list_name)
+					print(f"Created new to-do list named: {list_name}")
+					print(f"To-do list saved to {list_file_path}")
 
-				elif list_choice.lower() == 'm':	# user selected return to main menu
 					current_menu = "main"
-					continue
-
-				elif list_choice.lower() == 'q':	# user selected to QUIT program
-					# quit program
-					print ("Now closing program...")
-					running = False
-					sys.exit(0)
 
-				else:	# user selected an invalid option
-					print("Invalid option. Please select a menu option.")
+				case "search":
 
-			case "new":
+					query = input("Search for words in task names and descriptions: ")
+					first = get_optional_date("Only tasks due from (MM/DD/YYYY, blank for no start): ")
+					last = get_optional_date("Only tasks due until (MM/DD/YYYY, blank for no end): ")
+					display_search_results(query, first, last)
 
-				print("Give your new to-do list a short name (Recommended: less than 50 characters)")
-				list_name = input()
+					current_menu = "main"
 
-				# check to see if to-do list with that name already exists
-				tdlists = get_lists()
-				while list_name in tdlists:
-					print(f"A to-do list with the name {list_name} already exists!")
-					print("Give your new to-do list another short name (Recommended: less than 50 characters)")
-					list_name = input()
+				case "settings":
 
-				# create the new list and store in data dir
-				list_file_path = create_new_list(list_name)
-				print(f"Created new to-do list named: {list_name}")
-				print(f"To-do list saved to {list_file_path}")
+					# get settings values
+					settings_data = utodo_core.read_settings()
 
-				current_menu = "main"
+					current_email = settings_data["Email"]
+					current_time = settings_data["Time"]
 
-			case "settings":
+					print("\n---------- SETTINGS ----------\n")
+					print("Current settings:")
+					print(f"Email address: {current_email}")
+					print(f"Notification time: {current_time}")
+					print("\n------------------------------\n")
 
-				# get settings values
-				with open("data/settings.json", "r") as settings_file:
-					settings_data = json.load(settings_file)
+					print("[1] Change email address")
+					print("[2] Change notification time")
+					print("\n------------------------------\n")
+					display_nav_footer(True)
+					setting_choice = input("Choose a settings option: ")
+					match setting_choice.lower():
+						case "1":
 
-				current_email = settings_data["Email"]
-				current_time = settings_data["Time"]
+							current_menu = "main"
+							new_email = input("Set a new email address to use:\n")
 
-				print("\n---------- SETTINGS ----------\n")
-				print("Current settings:")
-				print(f"Email address: {current_email}")
-				print(f"Notification time: {current_time}")
-				print("\n------------------------------\n")
+							# edit the email data in the settings file
+							utodo_core.update_settings(Email=new_email)
 
-				print("[1] Change email address")
-				print("[2] Change notification time")
-				print("\n------------------------------\n")
-				display_nav_footer(True)
-				setting_choice = input("Choose a settings option: ")
-				match setting_choice.lower():
-					case "1":
+							print(f"New email set to: {new_email}")
 
-						current_menu = "main"
-						new_email = input("Set a new email address to use:\n")
+						case "2":
 
-						# open settings file and get its data
-						with open("data/settings.json", "r") as settings_file:
-							settings_data = json.load(settings_file)
+							current_menu = "main"
+							print("Please enter a new time in the format HH:MM")
+							print("  | Example format: 17:30   ---   5:30pm")
+							new_time = get_valid_time().strftime("%H:%M")
 
-						# edit the email data
-						settings_data["Email"] = new_email
+							# edit the time data in the settings file
+							utodo_core.update_settings(Time=new_time)
 
-						# rewrite settings file
-						with open("data/settings.json", "w") as settings_file:
-							json.dump(settings_data, settings_file, indent=4)
+							# Runs cron edit script to ensure cronjob is updated with new time
+							call_cron_edit()
 
-						print(f"New email set to: {new_email}")
+							print(f"New notification time set to {new_time}")
 
-					case "2":
+						case "m":	# user selected return to main menu
+							current_menu = "main"
+							continue
 
-						current_menu = "main"
-						print("Please enter a new time in the format HH:MM")
-						print("  | Example format: 17:30   ---   5:30pm")
-						new_time = get_valid_time().strftime("%H:%M")
+						case "q":	# user selected to QUIT program
+							# quit program
+							print("Now closing program...")
+							running = False
+							sys.exit(0)
 
-						# open settings file and get its data
-						with open("data/settings.json", "r") as settings_file:
-							settings_data = json.load(settings_file)
+						case _:	# user selected an invalid option
+							print("Invalid option. Please select a menu option.")
 
-						# edit the email data
-						settings_data["Time"] = new_time
+# main program:
+# Args: argv command line arguments after the program name; none starts the interactive menus
+#       A leading --profile runs the rest under cProfile and saves a report (see utodo_metrics)
+def main(argv):
 
-						# rewrite settings file
-						with open("data/settings.json", "w") as settings_file:
-							json.dump(settings_data, settings_file, indent=4)
+	# set up log config
+	utodo_core.setup_logging()
 
-						# Runs cron edit script to ensure cronjob is updated with new time
-						call_cron_edit()
+	if argv[:1] == ["--profile"]:
+		return utodo_metrics.profile(main, argv[1:])
 
-						print(f"New notification time set to {new_time}")
+	if argv:
+		utodo_core.init_data_dir()
+		sys.exit(run_command(argv))
 
-					case "m":	# user selected return to main menu
-						current_menu = "main"
-						continue
+	# check if program has never run or settings somehow don't exist... first time setup
+	if not utodo_core.has_settings():
+		first_time_setup()
 
-					case "q":	# user selected to QUIT program
-						# quit program
-						print("Now closing program...")
-						running = False
-						sys.exit(0)
+	run_menu()
 
-					case _:	# user selected an invalid option
-						print("Invalid option. Please select a menu option.")
+if __name__ == "__main__":
+	main(sys.argv[1:])
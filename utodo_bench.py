@@ -0,0 +1,260 @@
+# This file benchmarks the UTodo application's list, task and digest operations at scale.
+# It generates a synthetic data directory (lists of skewed sizes, due dates bunched around today
+# with a long tail), times each operation against it, and reports throughput and peak memory.
+# Results can be saved as a JSON baseline and compared against later runs to catch regressions.
+#
+# Usage:
+#   python utodo_bench.py --preset small medium              run scenarios, print a table
+#   python utodo_bench.py --lists 500 --tasks 200000          a custom scenario
+#   python utodo_bench.py --preset medium --save bench.json   save a baseline
+#   python utodo_bench.py --preset medium --compare bench.json  flag operations slower than the baseline
+
+import io
+import sys
+import itertools
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+from pathlib import Path
+
+import utodo
+import utodo_core
+import utodo_storage
+import utodo_notifications
+
+# named scenarios: (number of lists, number of tasks)
+PRESETS = {
+	"tiny": (1, 1000),
+	"small": (10, 10000),
+	"medium": (100, 100000),
+	"large": (1000, 1000000),
+	"wide": (100000, 100000),
+}
+
+# how many times each operation runs by default
+REPEAT = 20
+
+# an operation slower than the baseline by more than this factor is a regression
+THRESHOLD = 1.25
+
+# return a due date offset from today: most tasks are due within a few days, a few far out,
+# and a fifth are already overdue
+def skewed_offset(rng):
+	offset = min(int(rng.paretovariate(1.2)) - 1, 3650)
+	return -offset - 1 if rng.random() < 0.2 else offset
+
+# write a synthetic data directory
+# List sizes follow a Zipf-like curve, so a few lists hold most tasks, as real ones tend to
+# Args: data_dir directory to fill; num_lists, num_tasks sizes; seed for the random generator;
+#       storage "text" or "sqlite"
+def generate(data_dir, num_lists, num_tasks, seed=0, storage="text"):
+	rng = random.Random(seed)
+	data_dir = Path(data_dir)
+	data_dir.mkdir(parents=True, exist_ok=True)
+	today = date.today()
+
+	weights = [1 / (i + 1) for i in range(num_lists)]
+	sizes = [0] * num_lists
+	for i in rng.choices(range(num_lists), weights=weights, k=num_tasks):
+		sizes[i] += 1
+
+	for i, size in enumerate(sizes):
+		with open(data_dir / f"Bench_List_{i}.txt", "w") as list_file:
+			for n in range(size):
+				due = today + timedelta(days=skewed_offset(rng))
+				list_file.write(f"Task {n} of list {i}|{due.isoformat()}|Generated task number {n}\n")
+
+	settings = {"Email": "bench@example.com", "Time": "07:00"}
+	if storage == "sqlite":
+		settings["Storage"] = "sqlite"
+	with open(data_dir / "settings.json", "w") as settings_file:
+		json.dump(settings, settings_file, indent=4)
+
+	if storage == "sqlite":
+		utodo_storage.use_data_dir(data_dir)
+		utodo_storage.copy_lists(utodo_storage.TextBackend(), utodo_storage.SqliteBackend())
+		for list_file in data_dir.glob("*.txt"):
+			list_file.unlink()
+
+	return sizes
+
+# time an operation, then run it once more under tracemalloc for its peak memory
+# Args: call the operation; repeat number of timed runs; setup untimed preparation run before each call,
+#       returning the call's arguments
+def measure(call, repeat, setup=None):
+	times = []
+	for _ in range(repeat):
+		args = setup() if setup else ()
+		start = time.perf_counter()
+		call(*args)
+		times.append(time.perf_counter() - start)
+
+	args = setup() if setup else ()
+	tracemalloc.start()
+	call(*args)
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+
+	total = sum(times)
+	return {
+		"runs": repeat,
+		"mean_ms": round(total / repeat * 1000, 4),
+		"min_ms": round(min(times) * 1000, 4),
+		"max_ms": round(max(times) * 1000, 4),
+		"ops_per_s": round(repeat / total, 2) if total else None,
+		"peak_kb": peak // 1024,
+	}
+
+# forget everything cached in memory and on disk, so the next operation starts cold
+# This drops journals too, so it is only used before any operation that writes
+def go_cold(data_dir):
+	utodo_core.use_data_dir(data_dir)
+	shutil.rmtree(Path(data_dir) / ".utodo", ignore_errors=True)
+	return ()
+
+# forget what is cached in memory only, like a fresh process with the sidecar indexes on disk
+def go_indexed(data_dir):
+	utodo_core.use_data_dir(data_dir)
+	return ()
+
+# run every operation against a generated data directory
+# Returns {operation: measurements}
+def run_operations(data_dir, sizes, repeat, seed=0):
+	rng = random.Random(seed + 1)
+	quiet = io.StringIO() # the menu functions print as they go
+
+	# pick lists in proportion to their size, so big lists are exercised as often as users would
+	filled = [i for i, size in enumerate(sizes) if size > 0]
+	cum_weights = list(itertools.accumulate(sizes[i] for i in filled))
+	def pick_list():
+		i = rng.choices(filled, cum_weights=cum_weights)[0]
+		return f"Bench List {i}", i
+
+	def pick_task():
+		list_name, i = pick_list()
+		return list_name, rng.randint(1, utodo_core.num_tasks(list_name))
+
+	def new_task():
+		list_name, i = pick_list()
+		return list_name, f"New task {rng.random()}|{date.today().isoformat()}|Added by the benchmark"
+
+	def edit_target():
+		list_name, task_num = pick_task()
+		return list_name, task_num, f"Edited task {rng.random()}|{date.today().isoformat()}|Edited by the benchmark"
+
+	def delete_quietly(list_name, task_num):
+		with redirect_stdout(quiet):
+			utodo.delete_task(list_name, task_num)
+
+	def digest():
+		utodo_notifications.write_body(utodo_notifications.DIGEST_SECTIONS)
+
+	results = {}
+	results["digest_cold"] = measure(digest, max(1, repeat // 10), lambda: go_cold(data_dir))
+	results["digest_indexed"] = measure(digest, max(1, repeat // 10), lambda: go_indexed(data_dir))
+	results["digest_warm"] = measure(digest, repeat)
+	results["digest_week"] = measure(lambda: utodo_notifications.write_body(["overdue", "week"]), repeat)
+	results["get_lists"] = measure(utodo.get_lists, repeat)
+	results["get_tasks"] = measure(lambda list_name, i: utodo.get_tasks(list_name), repeat, pick_list)
+	results["get_task"] = measure(utodo.get_task, repeat, pick_task)
+	results["has_task"] = measure(lambda list_name, task: utodo_core.storage().has_task(list_name, task), repeat, new_task)
+	results["add_task"] = measure(lambda list_name, task: utodo_core.storage().add_task(list_name, task), repeat, new_task)
+	results["edit_task"] = measure(lambda list_name, task_num, task: utodo_core.storage().edit_task(list_name, task_num, task), repeat, edit_target)
+	results["delete_task"] = measure(delete_quietly, repeat, pick_task)
+	return results
+
+# generate one scenario, run it and clean up
+# Returns {"lists", "tasks", "storage", "generate_s", "operations"}
+def run_scenario(num_lists, num_tasks, repeat=REPEAT, seed=0, storage="text", keep=None):
+	data_dir = Path(keep) if keep else Path(tempfile.mkdtemp(prefix="utodo-bench-"))
+	try:
+		start = time.perf_counter()
+		sizes = generate(data_dir, num_lists, num_tasks, seed, storage)
+		generate_s = time.perf_counter() - start
+
+		operations = run_operations(data_dir, sizes, repeat, seed)
+		return {"lists": num_lists, "tasks": num_tasks, "storage": storage,
+			"generate_s": round(generate_s, 3), "operations": operations}
+	finally:
+		utodo_core.use_data_dir(utodo_storage.BASE_DIR / "data") # saves sidecars while the directory still exists
+		if not keep:
+			shutil.rmtree(data_dir, ignore_errors=True)
+
+# describe the machine and code a run was made on, saved alongside results
+def environment():
+	try:
+		commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=utodo_storage.BASE_DIR,
+			capture_output=True, text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		commit = None
+	return {"python": platform.python_version(), "platform": platform.platform(), "commit": commit,
+		"date": date.today().isoformat()}
+
+# print a scenario's results as a table, with the change from a baseline scenario if given
+def print_results(name, scenario, baseline=None, threshold=THRESHOLD):
+	print(f"\n{name}: {scenario['lists']} lists, {scenario['tasks']} tasks, {scenario['storage']} storage "
+		f"(generated in {scenario['generate_s']}s)")
+	print(f"  {'operation':<16}{'mean ms':>12}{'ops/s':>12}{'peak KB':>10}{'vs base':>10}")
+	regressions = []
+	for op, result in scenario["operations"].items():
+		change = ""
+		base = (baseline or {}).get("operations", {}).get(op)
+		if base and base["mean_ms"]:
+			ratio = result["mean_ms"] / base["mean_ms"]
+			change = f"{ratio:.2f}x"
+			if ratio > threshold:
+				change += " !"
+				regressions.append(op)
+		print(f"  {op:<16}{result['mean_ms']:>12.3f}{result['ops_per_s'] or 0:>12.1f}{result['peak_kb']:>10}{change:>10}")
+	return regressions
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Benchmark UTodo list, task and digest operations.")
+	parser.add_argument("--preset", nargs="+", choices=PRESETS, default=[], help="named scenarios to run")
+	parser.add_argument("--lists", type=int, help="number of lists for a custom scenario")
+	parser.add_argument("--tasks", type=int, help="number of tasks for a custom scenario")
+	parser.add_argument("--repeat", type=int, default=REPEAT, help="timed runs per operation")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--storage", choices=["text", "sqlite"], default="text")
+	parser.add_argument("--keep", metavar="DIR", help="generate into DIR and leave it there")
+	parser.add_argument("--save", metavar="FILE", help="write the results as a JSON baseline")
+	parser.add_argument("--compare", metavar="FILE", help="compare against a saved baseline")
+	parser.add_argument("--threshold", type=float, default=THRESHOLD, help="slowdown factor reported as a regression")
+	args = parser.parse_args()
+
+	scenarios = {name: PRESETS[name] for name in args.preset}
+	if args.lists or args.tasks:
+		scenarios[f"custom-{args.lists or 1}x{args.tasks or 1000}"] = (args.lists or 1, args.tasks or 1000)
+	if not scenarios:
+		scenarios["small"] = PRESETS["small"]
+
+	baseline = {}
+	if args.compare:
+		with open(args.compare, "r") as baseline_file:
+			baseline = json.load(baseline_file)
+
+	results = {"environment": environment(), "scenarios": {}}
+	regressions = []
+	for name, (num_lists, num_tasks) in scenarios.items():
+		scenario = run_scenario(num_lists, num_tasks, args.repeat, args.seed, args.storage, args.keep)
+		key = f"{name}-{args.storage}"
+		results["scenarios"][key] = scenario
+		found = print_results(key, scenario, baseline.get("scenarios", {}).get(key), args.threshold)
+		regressions += [f"{key}/{op}" for op in found]
+
+	if args.save:
+		with open(args.save, "w") as results_file:
+			json.dump(results, results_file, indent=4)
+		print(f"\nSaved results to {args.save}")
+
+	if regressions:
+		print(f"\nSlower than the baseline by more than {args.threshold}x: {', '.join(regressions)}")
+		sys.exit(1)
@@ -0,0 +1,168 @@
+# This file keeps a catalog of the to-do lists for the UTodo application.
+# The catalog is saved as a manifest and only rescanned when the data directory changes.
+# Like the indexes, changes are saved when the process exits rather than on every write.
+
+import atexit
+from pathlib import Path
+
+import utodo_journal
+import utodo_metrics
+import utodo_sidecar
+
+BASE_DIR = Path(__file__).parent
+DATA_DIR = BASE_DIR / "data"
+CATALOG_FILE = DATA_DIR / ".utodo" / "catalog.json"
+
+# Catalog layout:
+#   "dir_mtime": mtime of the data directory when the catalog was last checked
+#   "lists": {list name: {"tasks": number of tasks, "mtime": ns, "sig": list file/journal signature}}
+
+# catalog held for the rest of the process once loaded
+catalog = None
+# whether the catalog has changes not yet saved
+dirty = False
+
+# point this module at another data directory, forgetting the old directory's catalog
+# Args: data_dir path of a directory holding to-do list files
+def set_data_dir(data_dir):
+	global DATA_DIR, CATALOG_FILE, catalog
+
+	flush()
+	catalog = None
+	DATA_DIR = Path(data_dir)
+	CATALOG_FILE = DATA_DIR / ".utodo" / "catalog.json"
+
+# read the manifest as-is, or None if it is missing or unreadable
+def read_catalog():
+	return utodo_sidecar.read_json(CATALOG_FILE)
+
+# write the manifest atomically so a reader never sees a half-written file
+def save_catalog(new_catalog):
+	utodo_sidecar.save_json(CATALOG_FILE, new_catalog)
+
+# save the catalog if this process changed it, run automatically at exit
+def flush():
+	global dirty
+
+	if dirty and catalog is not None:
+		save_catalog(catalog)
+	dirty = False
+
+atexit.register(flush)
+
+# count the tasks in a list and describe it for the catalog
+def describe_list(list_name, sig):
+	num_tasks = len(utodo_journal.read_list(list_name))
+	return {"tasks": num_tasks, "mtime": sig[0], "sig": sig}
+
+# walk the data directory, only re-counting lists whose files changed
+@utodo_metrics.timed("dir_scan", target="catalog")
+def rescan(old_lists, dir_mtime):
+	lists = {}
+	for list_name in utodo_sidecar.list_names_on_disk():
+		sig = utodo_journal.list_signature(list_name)
+		entry = old_lists.get(list_name)
+		if entry is None or entry.get("sig") != sig:
+			entry = describe_list(list_name, sig)
+		lists[list_name] = entry
+	return {"dir_mtime": dir_mtime, "lists": lists}
+
+# return the directory mtime the catalog is checked against
+# data/.utodo is made first, since making it later would move the mtime and force a rescan next run
+def data_dir_mtime():
+	CATALOG_FILE.parent.mkdir(exist_ok=True)
+	return DATA_DIR.stat().st_mtime_ns
+
+# return the catalog, costing a single stat when the data directory has not changed
+def get_catalog():
+	global catalog, dirty
+
+	dir_mtime = data_dir_mtime()
+	if catalog is not None and catalog["dir_mtime"] == dir_mtime:
+		return catalog
+
+	saved = read_catalog()
+	if saved is not None and saved["dir_mtime"] == dir_mtime:
+		catalog = saved
+		return catalog
+
+	catalog = rescan(saved["lists"] if saved else {}, dir_mtime)
+	dirty = True
+	return catalog
+
+# refresh one list's entry after its file was written, created or deleted
+# Args: list_name string with whitespace, ie. "Sample List"
+def update_list(list_name):
+	global catalog, dirty
+
+	current = get_catalog()
+	if utodo_journal.list_path(list_name).exists():
+		current["lists"][list_name] = describe_list(list_name, utodo_journal.list_signature(list_name))
+	else:
+		current["lists"].pop(list_name, None)
+
+	# creating or deleting the file moved the directory mtime; this update already accounts for it
+	current["dir_mtime"] = data_dir_mtime()
+	catalog = current
+	dirty = True
+
+# bring a loaded catalog up to date with lists changed by other processes
+# Journal appends leave the data directory's mtime alone, so a long-running process asks for the
+# lists a watcher saw change; with no names every list file's signature is checked
+# Args: list_names names of lists that may have changed, or None if unknown
+def revalidate(list_names=None):
+	if catalog is None:
+		return # get_catalog checks the directory when it first runs
+	if list_names is None:
+		list_names = set(catalog["lists"])
+		list_names.update(utodo_sidecar.list_names_on_disk())
+
+	for list_name in list_names:
+		entry = catalog["lists"].get(list_name)
+		if not utodo_journal.list_path(list_name).exists():
+			if entry is not None:
+				update_list(list_name)
+		elif entry is None or entry.get("sig") != utodo_journal.list_signature(list_name):
+			update_list(list_name)
+
+# adjust one list's entry after a single task was added or removed, without re-counting it
+# Args: list_name string with whitespace; old_sig/new_sig list signatures before and after the change;
+#       delta change in the number of tasks
+def apply_change(list_name, old_sig, new_sig, delta):
+	global dirty
+
+	entry = get_catalog()["lists"].get(list_name)
+	if entry is None or entry.get("sig") != old_sig:
+		# the catalog was already behind this list, so count it again
+		update_list(list_name)
+		return
+
+	entry["tasks"] += delta
+	entry["mtime"] = new_sig[0]
+	entry["sig"] = new_sig
+	dirty = True
+
+# return the names of every to-do list
+def get_list_names():
+	return list(get_catalog()["lists"])
+
+# return the number of to-do lists
+def get_num_lists():
+	return len(get_catalog()["lists"])
+
+# return {"tasks", "mtime", "sig"} for a list, or None if it does not exist
+# The directory mtime does not move when another process appends to the list's journal, so the entry
+# is checked against the list's signature and the list counted again if it changed
+# Args: list_name string with whitespace, ie. "Sample List"
+def get_list_info(list_name):
+	entry = get_catalog()["lists"].get(list_name)
+	if entry is None:
+		return None
+	try:
+		sig = utodo_journal.list_signature(list_name)
+	except FileNotFoundError:
+		sig = None
+	if entry.get("sig") != sig:
+		update_list(list_name)
+		entry = catalog["lists"].get(list_name)
+	return entry
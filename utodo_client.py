@@ -0,0 +1,79 @@
+# This file is the thin client the `utodo` command runs for the UTodo application.
+# If the resident server (utodo_server.py) is running, the command is handed to it with this
+# terminal, so it starts with the lists already loaded; otherwise utodo.py runs in this process as
+# before. Handing a command over should cost little more than starting the interpreter, so only
+# built-in modules are imported here: _socket and _signal rather than socket and signal, which pull
+# in enum, and plain text rather than json, which pulls in re - together they took longer than the
+# command itself.
+#
+# Protocol, over the Unix domain socket data/.utodo/utodo.sock:
+#   request  the working directory and each argument, separated by NUL bytes, sent along with
+#            this process's stdin, stdout and stderr as SCM_RIGHTS file descriptors
+#   replies  "pid N\n" once a child process has taken the command, then "status N\n" when it is done
+
+import os
+import sys
+import _signal
+import _socket
+
+SOCKET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", ".utodo", "utodo.sock")
+
+# read one reply line from the server, or return None if it closed the connection first
+def read_reply(conn, buffer):
+	while b"\n" not in buffer:
+		data = conn.recv(4096)
+		if not data:
+			return None
+		buffer += data
+	line, _, rest = bytes(buffer).partition(b"\n")
+	buffer[:] = rest
+	return line.decode().split(" ", 1)
+
+# hand a command to the server and wait for it to finish
+# Returns the command's exit status, or None if no server took it
+# Args: argv command line arguments after the program name
+def run_remote(argv):
+	if not hasattr(_socket, "AF_UNIX") or not hasattr(_socket, "SCM_RIGHTS"):
+		return None
+	conn = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+	buffer = bytearray()
+	try:
+		conn.connect(SOCKET_FILE)
+		request = b"\0".join(os.fsencode(arg) for arg in [os.getcwd()] + argv)
+		fds = b"".join(fd.to_bytes(4, sys.byteorder) for fd in (0, 1, 2)) # as C ints
+		conn.sendmsg([request], [(_socket.SOL_SOCKET, _socket.SCM_RIGHTS, fds)])
+		reply = read_reply(conn, buffer)
+		pid = int(reply[1])
+	except (OSError, TypeError, IndexError, ValueError):
+		conn.close()
+		return None # not running, or gone before it took the command
+
+	# the command runs in the server's process, so pass on what the terminal sends this one
+	def forward(sig, frame):
+		try:
+			os.kill(pid, sig)
+		except OSError:
+			pass
+	def suspend(sig, frame):
+		forward(_signal.SIGSTOP, frame)
+		os.kill(os.getpid(), _signal.SIGSTOP)
+		forward(_signal.SIGCONT, frame) # carries on here once the shell resumes this process
+	for sig in (_signal.SIGINT, _signal.SIGTERM, _signal.SIGHUP, _signal.SIGQUIT):
+		_signal.signal(sig, forward)
+	_signal.signal(_signal.SIGTSTP, suspend)
+
+	try:
+		reply = read_reply(conn, buffer)
+	finally:
+		conn.close()
+	if reply is None or reply[0] != "status":
+		return 1 # the command was killed before it could report
+	return int(reply[1])
+
+if __name__ == "__main__":
+	status = run_remote(sys.argv[1:])
+	if status is None:
+		import utodo
+		utodo.main(sys.argv[1:])
+		status = 0
+	sys.exit(status)
@@ -0,0 +1,204 @@
+# This file is the core library of the UTodo application: to-do lists and tasks, parsing,
+# due-date queries and settings, in one place for the menus, the command line, the notifier
+# and the daemon. Importing it has no side effects - nothing is printed, sent, logged or read
+# from .env until a function asks for it - so each entry point only pays for what it uses.
+
+import os
+import json
+import heapq
+import itertools
+from datetime import date
+from pathlib import Path
+
+import utodo_storage
+from utodo_task import Task
+
+BASE_DIR = Path(__file__).parent
+ENV_FILE = BASE_DIR / ".env"
+LOG_FILE = "utodo.log"
+
+# Lists and tasks
+
+# returns where to-do lists are kept - text files or SQLite, per the "Storage" setting
+def storage():
+	return utodo_storage.get_backend()
+
+# switch to another data directory, ie. another user's
+# Args: data_dir path of a directory holding settings.json and to-do list files
+def use_data_dir(data_dir):
+	utodo_storage.use_data_dir(data_dir)
+
+# make the data directory in use if it does not exist yet
+def init_data_dir():
+	utodo_storage.DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+# return the names of every to-do list
+def list_names():
+	return storage().list_names()
+
+# return the number of to-do lists
+def num_lists():
+	return storage().num_lists()
+
+# return the number of tasks in a to-do list
+# Args: list_name string with whitespace, ie. "Sample List"
+def num_tasks(list_name):
+	return storage().num_tasks(list_name)
+
+# return the tasks of a to-do list as Task records, in order
+# Args: list_name string with whitespace, ie. "Sample List"
+def read_tasks(list_name):
+	return [Task.from_line(line) for line in storage().read_list(list_name)]
+
+# return a single task of a to-do list as a Task record
+# Args: list_name string with whitespace, ie. "Sample List"; task_num 1-based position in the list
+# Only that task's line is read, through the list file's offset index when stored as text
+def get_task(list_name, task_num):
+	return Task.from_line(task_line(list_name, task_num))
+
+# return the line of a single task of a to-do list, as stored
+# Args: list_name string with whitespace, ie. "Sample List"; task_num 1-based position in the list
+def task_line(list_name, task_num):
+	lines = storage().read_range(list_name, task_num - 1, task_num) if task_num > 0 else []
+	if not lines:
+		raise IndexError(f"{list_name} has no task {task_num}")
+	return lines[0]
+
+# return one page of a to-do list as [(task number, Task), ...], without reading the tasks after it
+# Args: list_name string with whitespace, ie. "Sample List"; start 0-based position of the first task;
+#       count number of tasks on the page
+def read_page(list_name, start, count):
+	lines = storage().read_range(list_name, start, start + count)
+	return [(task_num, Task.from_line(line)) for task_num, line in enumerate(lines, start + 1)]
+
+# Queries
+
+# return the tasks of a to-do list in due-date order as [(task number, Task), ...]
+# A repeating task sorts by its first outstanding occurrence in the range. Tasks without a valid
+# due date come last, in list order; giving first and/or last keeps only tasks due in that range, inclusive
+# Args: list_name string with whitespace, ie. "Sample List"; first/last datetime.date objects or None
+def tasks_by_due(list_name, first=None, last=None):
+	tasks = []
+	for task_num, task in enumerate(read_tasks(list_name), 1):
+		due = task.due_in(first, last)
+		if due is not None or (first is None and last is None):
+			tasks.append((due or date.max, task_num, task))
+	tasks.sort(key=lambda item: item[0]) # stable, so ties keep list order
+	return [(task_num, task) for due, task_num, task in tasks]
+
+# return [(list name, task line, Task), ...] for tasks due between first and last, inclusive, by due date
+# A repeating task appears once per outstanding occurrence in the range, as a Task due that day, with
+# the line it is stored as; only those occurrences are worked out. With no last date it appears once,
+# for its next occurrence.
+# Args: first/last datetime.date objects, None leaves that end of the range open
+def due_occurrences(first, last):
+	found = [(list_name, line, Task.from_line(line)) for list_name, line in storage().due_between(first, last)]
+	for list_name, line in storage().recurring_tasks():
+		task = Task.from_line(line)
+		days = task.due.occurrences(first, last)
+		if last is None:
+			days = itertools.islice(days, 1)
+		found.extend((list_name, line, task.occurrence(day)) for day in days)
+	found.sort(key=lambda hit: hit[2].due) # stable, so the storage order of same-day tasks is kept
+	return found
+
+# yield (due date, list name, task line) for each outstanding occurrence of a repeating task in a range
+def occurrence_run(list_name, line, rule, first, last):
+	for day in rule.occurrences(first, last):
+		yield day, list_name, line
+
+# yield (due date, list name, task line, Task) for tasks due between first and last across every list,
+# in due-date order, lazily
+# Each list's dated tasks come from storage as a run already sorted by due date, and each repeating task
+# is a run of its occurrences; a heapq k-way merge takes the earliest head at each step, so reading the
+# next 20 items touches little more than the head of each run instead of sorting every task.
+# Same-day tasks keep list order. A repeating task's Task is the occurrence, due that day.
+# With no last date a repeating task's occurrences never run out, so take only as many items as needed.
+# Args: first/last datetime.date objects, None leaves that end of the range open
+def agenda(first=None, last=None):
+	store = storage()
+	runs = store.due_runs(first, last)
+	for list_name, line in store.recurring_tasks():
+		runs.append(occurrence_run(list_name, line, Task.from_line(line).due, first, last))
+
+	for day, list_name, line in heapq.merge(*runs, key=lambda item: item[0]):
+		task = Task.from_line(line)
+		yield day, list_name, line, task.occurrence(day) if task.recurring else task
+
+# return [(list name, Task), ...] for tasks due between first and last, inclusive, by due date
+# Args: first/last datetime.date objects, None leaves that end of the range open
+def due_tasks(first, last):
+	return [(list_name, task) for list_name, line, task in due_occurrences(first, last)]
+
+# complete a task: a repeating task has its next occurrence completed, any other task is removed
+# Returns the updated Task of a repeating task, None if the task was removed
+# Args: list_name string with whitespace, ie. "Sample List"; task_num 1-based position in the list;
+#       old_task the task's line as shown to the user, so a task another session changed is not completed
+# Raises LookupError if another session changed or removed the task
+def complete_task(list_name, task_num, old_task=None):
+	with storage().lock(list_name):
+		line = old_task if old_task is not None else task_line(list_name, task_num)
+		task = Task.from_line(line)
+		if not task.recurring:
+			storage().remove_task(list_name, task_num, "complete", line)
+			return None
+		task.due = task.due.complete(task.next_due)
+		storage().edit_task(list_name, task_num, task.to_line(), line)
+		return task
+
+# return [(list name, Task), ...] for tasks with a word starting with every word of the query,
+# due between first and last if given, ordered by due date
+# Args: query string of words, ie. "credit stat"; first/last datetime.date objects or None
+def search_tasks(query, first=None, last=None):
+	return [(list_name, Task.from_line(line)) for list_name, line in storage().search(query, first, last)]
+
+# Settings
+
+# return the settings of the data directory in use, ie. {"Email": ..., "Time": "HH:MM"}
+# Raises OSError if there are no settings yet and ValueError if they are not valid JSON
+def read_settings():
+	with open(utodo_storage.SETTINGS_FILE, "r") as settings_file:
+		return json.load(settings_file)
+
+# replace the settings of the data directory in use
+def write_settings(settings):
+	with open(utodo_storage.SETTINGS_FILE, "w") as settings_file:
+		json.dump(settings, settings_file, indent=4)
+
+# check whether the data directory in use has been set up
+def has_settings():
+	return utodo_storage.SETTINGS_FILE.exists()
+
+# change some settings, keeping the rest
+def update_settings(**changes):
+	settings = read_settings()
+	settings.update(changes)
+	write_settings(settings)
+
+# return the addresses digests go to
+# "Email" may hold one address, several separated by commas, or a list of addresses
+def email_addresses(settings=None):
+	addresses = (settings or read_settings())["Email"]
+	if isinstance(addresses, str):
+		addresses = addresses.split(",")
+	return [address.strip() for address in addresses if address.strip()]
+
+# Environment
+
+# read KEY=value lines from the .env file into the environment, skipping blanks and comments
+def load_env(path=ENV_FILE):
+	if not Path(path).exists():
+		return
+	with open(path) as env_file:
+		for line in env_file:
+			if line.strip() == "" or line.strip().startswith("#"):
+				continue
+			key, value = line.strip().split("=", 1) # split on the first '='
+			os.environ[key] = value
+
+# send log records to utodo.log, as every entry point does
+def setup_logging():
+	import logging # only entry points log, so the core does not pay for the import
+	logging.basicConfig(filename=LOG_FILE,
+	                    level=logging.INFO,
+	                    format='%(asctime)s - %(levelname)s - %(message)s')
@@ -0,0 +1,216 @@
+# This file runs the UTodo notification daemon, a long-running replacement for the cron job.
+# One asyncio process watches each user's settings.json, keeps their lists' indexes loaded
+# between digests, and sends every digest that comes due without spawning anything.
+# Before each digest only the lists a file watcher saw change are re-read.
+#
+# Schedule settings in settings.json:
+#   "Time": "HH:MM"                     when the digest of every list is sent
+#   "ListTimes": {"List Name": "HH:MM"} optional; these lists get their own digest at their own time
+#
+# Run `python utodo_daemon.py` for this install's data directory, or add --users DIR [DIR ...]
+# (or --users-from FILE) to serve several users' data directories from one process.
+
+import os
+import sys
+import json
+import signal
+import asyncio
+import logging
+import argparse
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+import utodo_core
+import utodo_index
+import utodo_mailer
+import utodo_metrics
+import utodo_storage
+import utodo_watch
+import utodo_notifications
+
+BASE_DIR = Path(__file__).parent
+DATA_DIR = BASE_DIR / "data"
+PID_FILE = DATA_DIR / ".utodo" / "daemon.pid"
+
+# seconds between checks of the settings files
+POLL_INTERVAL = 30
+
+# parse a "HH:MM" setting
+def parse_time(text):
+	hours, minutes = text.split(":")
+	return time(int(hours), int(minutes))
+
+# build a user's notification jobs from their settings
+# Args: data_dir the user's data directory; settings the parsed settings.json
+# Returns [job, ...] where a job is {"key", "data_dir", "time", "lists", "exclude"}:
+#   "lists" names the lists the digest covers, None for every list not in "exclude"
+def make_jobs(data_dir, settings):
+	list_times = settings.get("ListTimes", {})
+	jobs = [{"data_dir": data_dir, "time": parse_time(settings["Time"]), "lists": None, "exclude": sorted(list_times)}]
+
+	by_time = {}
+	for list_name, list_time in list_times.items():
+		by_time.setdefault(list_time, []).append(list_name)
+	for list_time, list_names in sorted(by_time.items()):
+		jobs.append({"data_dir": data_dir, "time": parse_time(list_time), "lists": sorted(list_names), "exclude": []})
+
+	for job in jobs:
+		job["key"] = (data_dir, job["time"], tuple(job["lists"] or ()))
+	return jobs
+
+# return the next time a job fires after now
+def next_run(job, now):
+	run = datetime.combine(now.date(), job["time"])
+	return run if run > now else run + timedelta(days=1)
+
+# check whether a daemon is already serving this install, going by its pid file
+def daemon_running():
+	try:
+		pid = int(PID_FILE.read_text())
+		os.kill(pid, 0)
+	except (OSError, ValueError):
+		return False
+	return True
+
+class Daemon:
+
+	def __init__(self, data_dirs, poll_interval=POLL_INTERVAL):
+		self.data_dirs = [str(Path(data_dir).resolve()) for data_dir in data_dirs]
+		self.poll_interval = poll_interval
+		self.settings_mtimes = {} # {data dir: mtime of settings.json when its jobs were built}
+		self.jobs = {}            # {data dir: [job, ...]}
+		self.next_runs = {}       # {job key: datetime it fires next}
+		self.watchers = {data_dir: utodo_watch.watch(data_dir) for data_dir in self.data_dirs}
+		self.current_dir = str(utodo_storage.DATA_DIR.resolve()) # data directory the storage modules point at
+		self.stopping = asyncio.Event()
+
+	# reload the jobs of every user whose settings.json changed since it was last read
+	def refresh(self, now):
+		for data_dir in self.data_dirs:
+			settings_file = Path(data_dir) / "settings.json"
+			try:
+				mtime = settings_file.stat().st_mtime_ns
+				if self.settings_mtimes.get(data_dir) == mtime:
+					continue
+				with open(settings_file, "r") as file:
+					jobs = make_jobs(data_dir, json.load(file))
+			except (OSError, ValueError, KeyError) as e:
+				if self.settings_mtimes.get(data_dir, 0) is not None: # log once per breakage, not every poll
+					logging.error(f"Daemon cannot read settings for {data_dir}: {e}")
+				self.settings_mtimes[data_dir] = None
+				continue
+
+			self.settings_mtimes[data_dir] = mtime
+			self.jobs[data_dir] = jobs
+			for job in jobs:
+				# a job whose time was already passed today waits for tomorrow, like cron would
+				self.next_runs.setdefault(job["key"], next_run(job, now))
+				if self.next_runs[job["key"]].time() != job["time"]:
+					self.next_runs[job["key"]] = next_run(job, now)
+			logging.info(f"Daemon scheduled {len(jobs)} digests for {data_dir}: "
+				+ ", ".join(job["time"].strftime("%H:%M") for job in jobs))
+
+	# return every job whose time has come
+	def due_jobs(self, now):
+		return [job for jobs in self.jobs.values() for job in jobs if self.next_runs[job["key"]] <= now]
+
+	# seconds until the next job fires, or None if nothing is scheduled
+	def seconds_until_next(self, now):
+		runs = [self.next_runs[job["key"]] for jobs in self.jobs.values() for job in jobs]
+		return max((min(runs) - now).total_seconds(), 0) if runs else None
+
+	# point the storage modules at a user's data directory, leaving them warm if it is already current
+	# A warm index is brought up to date by re-reading just the lists changed since the last digest
+	def use_data_dir(self, data_dir):
+		changed = self.watchers[data_dir].changed()
+		if data_dir != self.current_dir:
+			utodo_core.use_data_dir(data_dir) # the index reloads and checks every list anyway
+			self.current_dir = data_dir
+		else:
+			utodo_index.revalidate(changed)
+
+	# yield the messages for a batch of jobs, building each digest from the user's loaded indexes
+	def job_messages(self, jobs):
+		for job in jobs:
+			try:
+				self.use_data_dir(job["data_dir"])
+				list_names = job["lists"]
+				if list_names is None:
+					list_names = [name for name in utodo_core.list_names() if name not in job["exclude"]]
+				body = utodo_notifications.write_body(list_names=list_names)
+				addresses = utodo_notifications.get_email_address()
+			except Exception as e: # whatever went wrong for one user, the others still get their digests
+				logging.error(f"Daemon could not build digest for {job['data_dir']}: {e!r}")
+				continue
+			for address in addresses:
+				yield utodo_mailer.build_message(utodo_notifications.get_sender(), address,
+					utodo_notifications.get_subject(), body)
+
+	# build and send a batch of digests over one SMTP session
+	def send_digests(self, jobs):
+		with utodo_mailer.Mailer.from_env() as mailer:
+			mailer.send_all(self.job_messages(jobs))
+
+	# fire jobs as they come due until stopped
+	async def run(self):
+		while not self.stopping.is_set():
+			now = datetime.now()
+			self.refresh(now)
+
+			due = self.due_jobs(now)
+			if due:
+				for job in due:
+					self.next_runs[job["key"]] = next_run(job, now)
+				# SMTP and file reads block, so they run off the event loop
+				await asyncio.to_thread(self.send_digests, due)
+				utodo_metrics.flush() # a long-running process reports after every batch, not just at exit
+				continue
+
+			wait = self.seconds_until_next(datetime.now())
+			wait = self.poll_interval if wait is None else min(wait, self.poll_interval)
+			try:
+				await asyncio.wait_for(self.stopping.wait(), timeout=wait)
+			except asyncio.TimeoutError:
+				pass
+
+	def stop(self):
+		self.stopping.set()
+
+# run a daemon for the given data directories until SIGINT or SIGTERM
+async def serve(data_dirs, poll_interval=POLL_INTERVAL):
+	daemon = Daemon(data_dirs, poll_interval)
+	loop = asyncio.get_running_loop()
+	for sig in (signal.SIGINT, signal.SIGTERM):
+		loop.add_signal_handler(sig, daemon.stop)
+
+	PID_FILE.parent.mkdir(parents=True, exist_ok=True)
+	PID_FILE.write_text(str(os.getpid()))
+	logging.info(f"Notification daemon started for {len(daemon.data_dirs)} users")
+	try:
+		await daemon.run()
+	finally:
+		for watcher in daemon.watchers.values():
+			watcher.close()
+		PID_FILE.unlink(missing_ok=True)
+		logging.info("Notification daemon stopped")
+
+if __name__ == "__main__":
+	utodo_core.load_env()
+	utodo_core.setup_logging()
+
+	parser = argparse.ArgumentParser(description="Send UTodo digest emails on schedule without cron.")
+	parser.add_argument("--users", nargs="+", default=[], metavar="DIR", help="user data directories to serve")
+	parser.add_argument("--users-from", metavar="FILE", help="file listing user data directories, one per line")
+	parser.add_argument("--poll", type=float, default=POLL_INTERVAL, metavar="SECONDS", help="how often to check settings files")
+	parser.add_argument("--profile", action="store_true", help="save a cProfile report when the daemon stops")
+	args = parser.parse_args()
+
+	if daemon_running():
+		print(f"A notification daemon is already running (see {PID_FILE}).")
+		sys.exit(1)
+
+	data_dirs = args.users + (utodo_notifications.read_user_dirs(args.users_from) if args.users_from else [])
+	if args.profile:
+		utodo_metrics.profile(asyncio.run, serve(data_dirs or [DATA_DIR], args.poll))
+	else:
+		asyncio.run(serve(data_dirs or [DATA_DIR], args.poll))
@@ -0,0 +1,161 @@
+# This file keeps a persisted set of content hashes for each to-do list in the UTodo application.
+# Checking whether a task already exists is a set lookup instead of a scan of the list, and
+# a second hash of each task's name and due date finds near-duplicates across every list in one pass.
+
+import os
+import atexit
+import hashlib
+from array import array
+from pathlib import Path
+
+import utodo_journal
+import utodo_metrics
+
+BASE_DIR = Path(__file__).parent
+DATA_DIR = BASE_DIR / "data"
+HASHES_DIR = DATA_DIR / ".utodo" / "hashes"
+
+# Hash file layout: an array of unsigned 64-bit integers
+#   the list's signature (3 values), then a (task hash, name/date hash) pair per task
+
+# hash sets loaded by this process: {list name: {"sig": signature, "hashes": {task hash: name/date hash}}}
+loaded = {}
+
+# lists whose hash sets changed since they were saved
+dirty = set()
+
+# return a 64-bit hash of some text
+def hash_text(text):
+	return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
+
+# return the hash used to spot exact duplicate tasks
+def task_hash(task):
+	return hash_text(task.strip())
+
+# return the hash of a task's name and due date, shared by near-duplicates
+def key_hash(task):
+	fields = task.strip().split('|')
+	return hash_text(f"{fields[0]}|{fields[1] if len(fields) > 1 else ''}")
+
+# returns the path of the hash file for a to-do list
+def hashes_path(list_name):
+	return HASHES_DIR / f"{list_name.replace(' ', '_')}.bin"
+
+# read a list's hash file, or None if it is missing or was written for another version of the list
+def read_hashes(list_name, sig):
+	values = array("Q")
+	try:
+		with open(hashes_path(list_name), "rb") as hash_file:
+			values.frombytes(hash_file.read())
+	except (OSError, ValueError):
+		return None
+	if list(values[:3]) != sig:
+		return None
+	return dict(zip(values[3::2], values[4::2]))
+
+# write a list's hash file atomically
+def save_hashes(list_name):
+	entry = loaded.get(list_name)
+	if entry is None:
+		return
+	HASHES_DIR.mkdir(parents=True, exist_ok=True)
+	values = array("Q", entry["sig"])
+	for pair in entry["hashes"].items():
+		values.extend(pair)
+	path = hashes_path(list_name)
+	tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+	with open(tmp_path, "wb") as tmp_file:
+		values.tofile(tmp_file)
+	os.replace(tmp_path, path)
+
+# save every hash set this process changed, run automatically at exit
+def flush_hashes():
+	for list_name in list(dirty):
+		if utodo_journal.list_path(list_name).exists():
+			save_hashes(list_name)
+	dirty.clear()
+
+atexit.register(flush_hashes)
+
+# point this module at another data directory, saving and forgetting the old directory's hash sets
+# Args: data_dir path of a directory holding to-do list files
+def set_data_dir(data_dir):
+	global DATA_DIR, HASHES_DIR
+
+	flush_hashes()
+	loaded.clear()
+	DATA_DIR = Path(data_dir)
+	HASHES_DIR = DATA_DIR / ".utodo" / "hashes"
+
+# return {task hash: name/date hash} for a list, loading or rebuilding it if the list changed
+# Args: list_name string with whitespace, ie. "Sample List"
+def get_hashes(list_name):
+	sig = utodo_journal.list_signature(list_name)
+	entry = loaded.get(list_name)
+	if entry is not None and entry["sig"] == sig:
+		return entry["hashes"]
+
+	hashes = read_hashes(list_name, sig)
+	if hashes is None:
+		utodo_metrics.count("hash_rebuilds")
+		hashes = {task_hash(line): key_hash(line) for line in utodo_journal.read_list(list_name)}
+		dirty.add(list_name)
+	loaded[list_name] = {"sig": sig, "hashes": hashes}
+	return hashes
+
+# check whether an exact copy of a task is already in a list
+# Args: list_name string with whitespace, ie. "Sample List"; task line to look for;
+#       trust_loaded skips checking the list's signature when its hash set is already loaded,
+#       for callers that made every change to the list since
+def contains(list_name, task, trust_loaded=False):
+	entry = loaded.get(list_name)
+	hashes = entry["hashes"] if trust_loaded and entry is not None else get_hashes(list_name)
+	return task_hash(task) in hashes
+
+# update a list's hash set for changed tasks without re-reading the list
+# Args: list_name string with whitespace; old_sig/new_sig list signatures before and after the change;
+#       removed/added lists of task lines the change took out of or put into the list
+def apply_change(list_name, old_sig, new_sig, removed, added):
+	entry = loaded.get(list_name)
+	if entry is None or entry["sig"] != old_sig:
+		loaded.pop(list_name, None) # not loaded or already behind - rebuilt on next use
+		return
+
+	for line in removed:
+		entry["hashes"].pop(task_hash(line), None)
+	for line in added:
+		entry["hashes"][task_hash(line)] = key_hash(line)
+	entry["sig"] = new_sig
+	dirty.add(list_name)
+
+# forget a list's hash set after the whole list was rewritten or deleted
+# Args: list_name string with whitespace, ie. "Sample List"
+def forget_list(list_name):
+	loaded.pop(list_name, None)
+	dirty.discard(list_name)
+	if not utodo_journal.list_path(list_name).exists():
+		hashes_path(list_name).unlink(missing_ok=True)
+
+# find tasks that share a name and due date but differ in description, across lists
+# Only the persisted hashes are scanned; lists are read just to show the tasks that matched.
+# Args: list_names names of the lists to check
+# Returns [[(list name, task line), ...], ...], one group per name and due date
+def find_near_duplicates(list_names):
+	by_key = {} # {name/date hash: [(list name, task hash), ...]}
+	for list_name in list_names:
+		for full, key in get_hashes(list_name).items():
+			by_key.setdefault(key, []).append((list_name, full))
+
+	# a name and due date held by tasks with more than one distinct hash
+	wanted = {}
+	for key, hits in by_key.items():
+		if len({full for list_name, full in hits}) > 1:
+			for list_name, full in hits:
+				wanted.setdefault(list_name, set()).add(full)
+
+	groups = {}
+	for list_name, fulls in wanted.items():
+		for line in utodo_journal.read_list(list_name):
+			if task_hash(line) in fulls:
+				groups.setdefault(key_hash(line), []).append((list_name, line))
+	return list(groups.values())
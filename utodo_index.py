@@ -0,0 +1,142 @@
+# This file keeps an on-disk index of tasks by due date for the UTodo application.
+# The index lets "what's due" queries skip re-reading every to-do list.
+
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+
+import utodo_journal
+import utodo_recur
+import utodo_sidecar
+
+# Index layout:
+#   "version": DueIndex.version, an index of another version is built again
+#   "lists": {list name: {"sig": list file/journal signature, "dates": [due dates with tasks], "recurring": count}}
+#   "dates": {"YYYY-MM-DD": [[list name, task line], ...]}
+#   "recurring": [[list name, task line], ...] for repeating tasks, expanded only when a window is queried
+
+# return the due date of a task line as "YYYY-MM-DD", or None if it has no valid date
+def task_day(line):
+	try:
+		return date.fromisoformat(line.split('|')[1]).isoformat() # stored dates are always ISO
+	except (IndexError, ValueError):
+		return None # malformed line, nothing to index
+
+# The due-date index. It is built the first time a due-date query needs it; once saved, every change to
+# a list is recorded in it, so a digest built later finds it current and only lists changed by hand are
+# read again.
+class DueIndex(utodo_sidecar.ListIndex):
+	file_name = "due_index.json"
+	target = "index"
+
+	def empty(self):
+		return {"version": self.version, "lists": {}, "dates": {}, "recurring": []}
+
+	def drop_list_entries(self, index, list_name):
+		entry = index["lists"].pop(list_name, None)
+		if entry is None:
+			return
+		if entry.get("recurring"):
+			index["recurring"] = [hit for hit in index["recurring"] if hit[0] != list_name]
+		for day in entry["dates"]:
+			remaining = [hit for hit in index["dates"].get(day, []) if hit[0] != list_name]
+			if remaining:
+				index["dates"][day] = remaining
+			else:
+				index["dates"].pop(day, None)
+
+	def add_list_entries(self, index, list_name, sig):
+		dates = set()
+		recurring = 0
+		for line in utodo_journal.read_list(list_name):
+			day = task_day(line)
+			if day is None:
+				if utodo_recur.line_rule(line) is not None:
+					index["recurring"].append([list_name, line])
+					recurring += 1
+				continue
+			index["dates"].setdefault(day, []).append([list_name, line])
+			dates.add(day)
+		index["lists"][list_name] = {"sig": sig, "dates": sorted(dates), "recurring": recurring}
+
+	def apply_entries(self, index, entry, list_name, removed, added):
+		for line in removed:
+			day = task_day(line)
+			if day is None:
+				if [list_name, line] in index["recurring"]:
+					index["recurring"].remove([list_name, line])
+					entry["recurring"] -= 1
+				continue
+			bucket = index["dates"].get(day, [])
+			if [list_name, line] in bucket:
+				bucket.remove([list_name, line])
+			if not bucket:
+				index["dates"].pop(day, None)
+			if day in entry["dates"] and not any(hit[0] == list_name for hit in bucket):
+				entry["dates"].remove(day)
+
+		for line in added:
+			day = task_day(line)
+			if day is None:
+				if utodo_recur.line_rule(line) is not None:
+					index["recurring"].append([list_name, line])
+					entry["recurring"] += 1
+				continue
+			index["dates"].setdefault(day, []).append([list_name, line])
+			if day not in entry["dates"]:
+				insort(entry["dates"], day)
+
+# the due-date index of the data directory in use, and the operations other modules call on it
+due_index = DueIndex()
+get_index = due_index.get
+flush_index = due_index.flush
+set_data_dir = due_index.set_data_dir
+update_list = due_index.update_list
+remove_list = due_index.remove_list
+revalidate = due_index.revalidate
+apply_change = due_index.apply_change
+
+# return the names of every indexed list
+def get_list_names(index):
+	return list(index["lists"])
+
+# yield (due date, list name, task line) for one list's tasks due between first and last, inclusive,
+# in due-date order - a sorted run for utodo_core.agenda to merge. Only the list's own due dates are
+# visited, from the first one in range, and only as far as the caller reads.
+# Args: list_name string with whitespace; first/last datetime.date objects, None leaves that end open;
+#       grouped dict shared by the runs of one agenda, filled with {due date: {list name: [task lines]}}
+#       for the dates read so far, so each date's tasks are split by list once rather than once per list
+def list_run(index, list_name, first=None, last=None, grouped=None):
+	entry = index["lists"].get(list_name)
+	if entry is None:
+		return
+	if grouped is None:
+		grouped = {}
+	days = entry["dates"]
+	start = 0 if first is None else bisect_left(days, first.isoformat())
+	stop = len(days) if last is None else bisect_right(days, last.isoformat())
+	for i in range(start, stop):
+		day = days[i]
+		by_list = grouped.get(day)
+		if by_list is None:
+			by_list = grouped[day] = {}
+			for hit_list, line in index["dates"].get(day, []):
+				by_list.setdefault(hit_list, []).append(line)
+		due = date.fromisoformat(day)
+		for line in by_list.get(list_name, ()):
+			yield due, list_name, line
+
+# return [(list name, task line), ...] for every repeating task
+def recurring(index):
+	return [(list_name, line) for list_name, line in index["recurring"]]
+
+# return [(list name, task line), ...] for tasks due between first and last, inclusive
+# Args: first/last datetime.date objects, None leaves that end of the range open
+def due_between(index, first, last):
+	days = sorted(index["dates"]) # one key per distinct due date, far fewer than tasks
+	start = 0 if first is None else bisect_left(days, first.isoformat())
+	stop = len(days) if last is None else bisect_right(days, last.isoformat())
+
+	hits = []
+	for day in days[start:stop]:
+		hits.extend((list_name, line) for list_name, line in index["dates"][day])
+	return hits
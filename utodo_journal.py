@@ -0,0 +1,423 @@
+# This file manages the write-ahead journal for to-do lists in the UTodo application.
+# Task changes are appended to a per-list journal instead of rewriting the list file,
+# and the journal is periodically compacted back into the list file with an atomic rename.
+
+import os
+import json
+import time
+import atexit
+import zlib
+import hashlib
+from pathlib import Path
+
+import utodo_lock
+import utodo_metrics
+import utodo_offsets
+
+BASE_DIR = Path(__file__).parent
+DATA_DIR = BASE_DIR / "data"
+JOURNAL_DIR = DATA_DIR / ".utodo" / "journal"
+
+# number of journal entries that triggers compaction into the list file, and for big lists
+# the size of the journal relative to the list file that does
+COMPACT_THRESHOLD = 64
+COMPACT_RATIO = 0.5
+
+# fsync after this many appends, or once this many seconds have passed since the last fsync
+FSYNC_BATCH = 8
+FSYNC_INTERVAL = 2.0
+
+# times a reader tries for a snapshot without the list's lock before waiting on it
+SNAPSHOT_RETRIES = 3
+
+# Journal layout (one JSON object per line):
+#   {"base": crc32 of the list file the entries apply to}
+#   {"op": "add", "task": line}  or  {"op": "add", "tasks": [line, ...]} for a batch
+#   {"op": "edit", "id": task id, "task": line}
+#   {"op": "delete" | "complete", "id": task id}    (a tombstone, dropped at compaction)
+# Task ids come from task_id(), so an entry always names the same task however the list shifts.
+
+# journals held open by this process: {list name: {"file", "entries", "base_lines", "unsynced", "synced_at"}}
+# "entries" counts task changes, so a batch add of 1000 tasks counts as 1000
+open_journals = {}
+
+# returns the path of the file for a to-do list
+# Args: list_name string with whitespace, ie. "Sample List"
+def list_path(list_name):
+	return DATA_DIR / f"{list_name.replace(' ', '_')}.txt"
+
+# returns the path of the journal for a to-do list
+def journal_path(list_name):
+	return JOURNAL_DIR / f"{list_name.replace(' ', '_')}.log"
+
+# return the stable id of a task, derived from its line in the list file
+# The id is 64 bits, so distinct tasks do not share one even across millions of lines - at 32 bits a
+# 100k-task list already had pairs that did, and a tombstone for one removed the other. Exact duplicate
+# lines do share an id, and an entry naming it applies to the last of them.
+def task_id(task):
+	return hashlib.blake2b(task.encode(), digest_size=8).hexdigest()
+
+# read the list file, returning its lines and a checksum of its contents
+# Args: file the list file if the caller already opened it
+def read_snapshot(list_name, file=None):
+	try:
+		with utodo_metrics.timer("file_read", kind="list"):
+			if file is None:
+				with open(list_path(list_name), "rb") as file:
+					data = file.read()
+			else:
+				data = file.read()
+	except FileNotFoundError:
+		return [], 0
+	utodo_metrics.count("bytes_read", len(data), kind="list")
+	with utodo_metrics.timer("parse", kind="list"):
+		return data.decode().splitlines(), zlib.crc32(data)
+
+# read the journal entries that still apply to a snapshot with the given checksum
+# Args: journal the list's journal file if the caller already opened it
+def read_entries(list_name, base, journal=None):
+	try:
+		with utodo_metrics.timer("file_read", kind="journal"):
+			if journal is None:
+				with open(journal_path(list_name), "r") as journal:
+					lines = journal.read().splitlines()
+			else:
+				lines = journal.read().splitlines()
+	except FileNotFoundError:
+		return []
+
+	entries = []
+	for line in lines:
+		try:
+			entries.append(json.loads(line))
+		except ValueError:
+			break # torn write from a crash - nothing after it was acknowledged
+
+	# a journal for a different snapshot was already compacted into the list file
+	if not entries or entries[0].get("base") != base:
+		return []
+	return entries[1:]
+
+# open a list file and its journal as one consistent snapshot, without taking the list's lock
+# Compaction renames a new list file into place and only then removes the journal, so a journal opened
+# after the list file belongs to it - or to an older list file, and its base no longer matches - unless
+# the list file was replaced in between. Appends after the journal is opened are simply not seen.
+# Returns (list file, journal), either None if missing, or None if the list file was replaced meanwhile
+def open_snapshot(list_name):
+	path = list_path(list_name)
+	try:
+		file = open(path, "rb")
+	except FileNotFoundError:
+		file = None
+	try:
+		journal = open(journal_path(list_name), "r")
+	except FileNotFoundError:
+		journal = None
+
+	if file is None and not path.exists() or file is not None and same_file(file, path):
+		return file, journal
+	for opened in (file, journal):
+		if opened is not None:
+			opened.close()
+	return None
+
+# return the current lines of a to-do list: the list file plus any journaled changes
+# The list is read as it was at one moment, even while another process compacts it, and readers only
+# wait on the list's lock if it is replaced under them several times in a row
+# Args: list_name string with whitespace, ie. "Sample List"
+def read_list(list_name):
+	for attempt in range(SNAPSHOT_RETRIES):
+		files = open_snapshot(list_name)
+		if files is not None:
+			break
+		utodo_metrics.count("snapshot_retries")
+	else:
+		with utodo_lock.shared(list_name):
+			files = open_snapshot(list_name)
+
+	file, journal = files
+	try:
+		lines, base = read_snapshot(list_name, file) if file is not None else ([], 0)
+		entries = read_entries(list_name, base, journal) if journal is not None else []
+	finally:
+		for opened in files:
+			if opened is not None:
+				opened.close()
+	with utodo_metrics.timer("parse", kind="journal_replay"):
+		return replay(lines, entries)
+
+# apply journal entries to the snapshot lines, in order
+# Tombstoned tasks are blanked in place and skipped at the end, so each entry costs O(1)
+def replay(lines, entries):
+	lines = list(lines)
+	positions = None # {task id: [positions]}, only built once an entry needs to find a task
+
+	for entry in entries:
+		if entry["op"] == "add":
+			for task in entry["tasks"] if "tasks" in entry else [entry["task"]]:
+				if positions is not None:
+					positions.setdefault(task_id(task), []).append(len(lines))
+				lines.append(task)
+			continue
+
+		if positions is None:
+			positions = {}
+			for i, line in enumerate(lines):
+				if line is not None:
+					positions.setdefault(task_id(line), []).append(i)
+
+		found = positions.get(entry["id"])
+		if not found:
+			continue # task already gone, ie. completed in another session
+		i = found.pop()
+		if entry["op"] == "edit":
+			lines[i] = entry["task"]
+			positions.setdefault(task_id(entry["task"]), []).append(i)
+		else: # "delete" or "complete"
+			lines[i] = None
+
+	return [line for line in lines if line is not None] if positions is not None else lines
+
+# apply journal entries to the line numbers of a list file, as replay does to its lines
+# Added and edited tasks become their lines. A task named by an entry is looked up in the offset
+# index's ids the first time it is named, so the list file's other lines are never read or hashed.
+# Args: index utodo_offsets.Offsets of the list file; entries journal entries for it
+def replay_numbers(index, entries):
+	items = list(range(index.count))
+	ids = None
+	positions = {} # {task id: [positions]} for tasks entries have named, in the order replay keeps them
+	pending = {} # {task id: [positions]} of journal lines whose task has not been named yet
+
+	def place(task, i):
+		tid = task_id(task)
+		(positions[tid] if tid in positions else pending.setdefault(tid, [])).append(i)
+
+	for entry in entries:
+		if entry["op"] == "add":
+			for task in entry["tasks"] if "tasks" in entry else [entry["task"]]:
+				place(task, len(items))
+				items.append(task)
+			continue
+
+		found = positions.get(entry["id"])
+		if found is None:
+			if ids is None:
+				ids = index.task_ids()
+			wanted = int(entry["id"], 16)
+			found = []
+			try:
+				i = ids.index(wanted)
+				while True:
+					found.append(i)
+					i = ids.index(wanted, i + 1)
+			except ValueError:
+				pass
+			found += pending.pop(entry["id"], [])
+			positions[entry["id"]] = found
+		if not found:
+			continue # task already gone, ie. completed in another session
+		i = found.pop()
+		if entry["op"] == "edit":
+			items[i] = entry["task"]
+			place(entry["task"], i)
+		else: # "delete" or "complete"
+			items[i] = None
+
+	return [item for item in items if item is not None]
+
+# return lines start..stop (0-based, stop excluded) of a list, reading only those lines of the list file
+# The offset index says where each line starts; journaled changes are replayed over line numbers
+# instead of lines, so the rest of the list file is never read
+# Args: list_name string with whitespace, ie. "Sample List"; start, stop positions as for a slice
+def read_range(list_name, start, stop):
+	index = utodo_offsets.get_offsets(list_name)
+	if index is None:
+		return []
+
+	entries = read_entries(list_name, index.crc)
+	if entries:
+		items = replay_numbers(index, entries)[start:stop]
+	else:
+		items = range(index.count)[start:stop]
+
+	nums = [item for item in items if isinstance(item, int)] # in file order, replay keeps it
+	if not nums:
+		return list(items)
+	lines = utodo_offsets.read_lines(list_name, index, nums[0], nums[-1])
+	if lines is None:
+		return read_list(list_name)[start:stop] # the list file was replaced while we looked
+	return [lines[item - nums[0]] if isinstance(item, int) else item for item in items]
+
+# return a value that changes whenever the list file or its journal changes
+# Args: list_name string with whitespace, ie. "Sample List"
+def list_signature(list_name):
+	stat = list_path(list_name).stat()
+	try:
+		journal_size = journal_path(list_name).stat().st_size
+	except FileNotFoundError:
+		journal_size = 0
+	return [stat.st_mtime_ns, stat.st_size, journal_size]
+
+# fsync a journal if enough appends or time have built up since the last one
+def sync_journal(list_name, force=False):
+	state = open_journals.get(list_name)
+	if state is None or state["unsynced"] == 0:
+		return
+	if force or state["unsynced"] >= FSYNC_BATCH or time.monotonic() - state["synced_at"] >= FSYNC_INTERVAL:
+		with utodo_metrics.timer("fsync", kind="journal"):
+			os.fsync(state["file"].fileno())
+		state["unsynced"] = 0
+		state["synced_at"] = time.monotonic()
+
+# flush and close a journal file held open by this process
+def close_journal(list_name):
+	sync_journal(list_name, force=True)
+	state = open_journals.pop(list_name, None)
+	if state is not None:
+		state["file"].close()
+
+# flush and close every open journal, run automatically at exit
+def close_all():
+	for list_name in list(open_journals):
+		close_journal(list_name)
+
+atexit.register(close_all)
+
+# point this module at another data directory, closing the journals opened under the old one
+# Args: data_dir path of a directory holding to-do list files
+def set_data_dir(data_dir):
+	global DATA_DIR, JOURNAL_DIR
+
+	close_all()
+	utodo_offsets.set_data_dir(data_dir)
+	utodo_lock.set_data_dir(data_dir)
+	DATA_DIR = Path(data_dir)
+	JOURNAL_DIR = DATA_DIR / ".utodo" / "journal"
+
+# open a list's journal for appending, starting it over if it is missing or stale
+def open_journal(list_name):
+	JOURNAL_DIR.mkdir(parents=True, exist_ok=True)
+	path = journal_path(list_name)
+	index = utodo_offsets.get_offsets(list_name)
+	base_lines, base = (index.count, index.crc) if index is not None else (0, 0)
+
+	journal = open(path, "a+")
+	journal.seek(0)
+	text = journal.read()
+	try:
+		current = json.loads(text.partition("\n")[0]).get("base") == base
+	except ValueError:
+		current = False
+
+	if current:
+		if not text.endswith("\n"):
+			# drop a torn entry left by a crash so new entries start on a clean line
+			journal.truncate(text.rfind("\n") + 1)
+		num_entries = count_changes(read_entries(list_name, base))
+	else:
+		# new journal, or a leftover one that was already compacted into the list file
+		journal.truncate(0)
+		journal.write(json.dumps({"base": base}) + "\n")
+		journal.flush()
+		os.fsync(journal.fileno())
+		num_entries = 0
+
+	state = {"file": journal, "entries": num_entries, "base_lines": base_lines, "unsynced": 0, "synced_at": time.monotonic()}
+	open_journals[list_name] = state
+	return state
+
+# check an open journal file is still the one at path
+def same_file(file, path):
+	try:
+		return os.path.samestat(os.fstat(file.fileno()), path.stat())
+	except FileNotFoundError:
+		return False
+
+# return the open journal state for a list, opening or reopening the journal file as needed
+def current_journal(list_name):
+	state = open_journals.get(list_name)
+	if state is not None and not same_file(state["file"], journal_path(list_name)):
+		# another process compacted the list and removed this journal - start on the new one
+		state["file"].close()
+		del open_journals[list_name]
+		state = None
+	if state is None:
+		state = open_journal(list_name)
+	return state
+
+# append one change to a list's journal, compacting once the journal grows large
+# Args: list_name string with whitespace, ie. "Sample List"; entry dict in the journal layout above
+def append(list_name, entry):
+	append_many(list_name, [entry])
+
+# append several changes to a list's journal in a single write, holding the list's lock
+# Args: list_name string with whitespace, ie. "Sample List"; entries list of dicts in the journal layout above
+def append_many(list_name, entries):
+	if not entries:
+		return
+	with utodo_lock.exclusive(list_name):
+		state = current_journal(list_name)
+
+		state["file"].write("".join(json.dumps(entry) + "\n" for entry in entries))
+		state["file"].flush() # visible to other readers right away; fsync is batched
+		state["entries"] += count_changes(entries)
+		state["unsynced"] += len(entries)
+		utodo_metrics.count("journal_appends", len(entries))
+		sync_journal(list_name)
+
+		# compact once the journal is large next to the list file, so rewriting a big list is paid for
+		# by at least as many appends - a bulk import does not rewrite the whole list on every batch
+		if state["entries"] >= max(COMPACT_THRESHOLD, state["base_lines"] * COMPACT_RATIO):
+			compact(list_name)
+
+# return the number of task changes in journal entries, counting each task of a batch add
+def count_changes(entries):
+	return sum(len(entry["tasks"]) if "tasks" in entry else 1 for entry in entries)
+
+# return the number of task changes waiting in a list's journal
+# Args: list_name string with whitespace, ie. "Sample List"
+def count_entries(list_name):
+	index = utodo_offsets.get_offsets(list_name)
+	return count_changes(read_entries(list_name, index.crc)) if index is not None else 0
+
+# write lines to a list file atomically: temp file, fsync, then rename over the old file
+# Args: list_name string with whitespace, ie. "Sample List"; lines list of task strings
+@utodo_metrics.timed("rewrite", kind="list")
+def write_snapshot(list_name, lines):
+	path = list_path(list_name)
+	tmp_path = path.with_suffix(".txt.tmp")
+	data = "".join(f"{line}\n" for line in lines).encode()
+	with utodo_lock.exclusive(list_name):
+		with open(tmp_path, "wb") as tmp_file:
+			tmp_file.write(data)
+			tmp_file.flush()
+			os.fsync(tmp_file.fileno())
+		os.replace(tmp_path, path)
+
+		# make the rename itself durable
+		dir_fd = os.open(DATA_DIR, os.O_RDONLY)
+		try:
+			os.fsync(dir_fd)
+		finally:
+			os.close(dir_fd)
+
+		utodo_offsets.save_offsets(list_name, data, path.stat())
+
+# fold a list's journal into its list file and start a fresh journal
+# Readers keep reading without the lock: the rename swaps in the new list file whole
+# Args: list_name string with whitespace, ie. "Sample List"
+def compact(list_name):
+	with utodo_lock.exclusive(list_name):
+		close_journal(list_name)
+		lines = read_list(list_name)
+		write_snapshot(list_name, lines)
+		# if we crash before this unlink, the old journal's base no longer matches and is ignored
+		journal_path(list_name).unlink(missing_ok=True)
+
+# drop a list's journal, used when the list itself is deleted
+# Args: list_name string with whitespace, ie. "Sample List"
+def discard(list_name):
+	state = open_journals.pop(list_name, None)
+	if state is not None:
+		state["file"].close()
+	journal_path(list_name).unlink(missing_ok=True)
@@ -0,0 +1,107 @@
+# This file provides advisory locks on to-do lists for the UTodo application.
+# Every change to a list - a journal append, a compaction, an edit that reads a task and then writes
+# it - holds the list's lock exclusively, so two sessions can never interleave their writes.
+# Readers do not need the lock: utodo_journal.read_list opens the list file and its journal as one
+# consistent snapshot, so the notifier never waits on an interactive edit. The shared mode is there for
+# a reader that has to wait, ie. when a snapshot keeps being replaced under it.
+#
+# Locks are fcntl.flock locks on data/.utodo/locks/<list>.lock rather than on the list file itself,
+# which compaction replaces with a rename. Lock files are never removed: a process could be waiting on
+# one, and a lock taken on a removed file would not exclude anybody.
+# On platforms without fcntl the locks do nothing.
+
+import time
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+	import fcntl
+except ImportError: # Windows
+	fcntl = None
+
+import utodo_metrics
+
+BASE_DIR = Path(__file__).parent
+DATA_DIR = BASE_DIR / "data"
+LOCK_DIR = DATA_DIR / ".utodo" / "locks"
+
+# locks held by each thread: {list name: [lock file, mode, depth]}
+# A lock is taken once however deeply its holders nest, ie. an edit that triggers a compaction. Each
+# thread opens its own lock file, and flock locks of separate opens exclude each other even in one process.
+local = threading.local()
+
+# set to a list to collect how long each lock took to get, in seconds, contended or not (see utodo_stress)
+waits = None
+
+# returns the path of the lock file for a to-do list
+# Args: list_name string with whitespace, ie. "Sample List"
+def lock_path(list_name):
+	return LOCK_DIR / f"{list_name.replace(' ', '_')}.lock"
+
+# take a list's lock, waiting for other processes only if they hold it in a conflicting mode
+# Args: list_name string with whitespace; mode "shared" or "exclusive"
+def acquire(list_name, mode):
+	held = getattr(local, "held", None)
+	if held is None:
+		held = local.held = {}
+	lock = held.get(list_name)
+	if lock is not None:
+		if mode == "exclusive" and lock[1] == "shared":
+			raise RuntimeError(f"{list_name} is locked shared and cannot be upgraded")
+		lock[2] += 1
+		return
+
+	LOCK_DIR.mkdir(parents=True, exist_ok=True)
+	lock_file = open(lock_path(list_name), "a+b")
+	operation = fcntl.LOCK_EX if mode == "exclusive" else fcntl.LOCK_SH
+	start = time.perf_counter()
+	try:
+		fcntl.flock(lock_file.fileno(), operation | fcntl.LOCK_NB)
+	except BlockingIOError:
+		utodo_metrics.count("lock_contended", mode=mode)
+		with utodo_metrics.timer("lock_wait", mode=mode):
+			fcntl.flock(lock_file.fileno(), operation)
+	except OSError:
+		lock_file.close()
+		raise
+	if waits is not None:
+		waits.append(time.perf_counter() - start)
+	held[list_name] = [lock_file, mode, 1]
+
+# release one hold on a list's lock, unlocking it when its outermost holder is done
+def release(list_name):
+	lock = local.held[list_name]
+	lock[2] -= 1
+	if lock[2] == 0:
+		del local.held[list_name]
+		fcntl.flock(lock[0].fileno(), fcntl.LOCK_UN)
+		lock[0].close()
+
+# hold a list's lock for a block: with utodo_lock.exclusive("Sample List"): ...
+@contextmanager
+def locked(list_name, mode):
+	if fcntl is None:
+		yield
+		return
+	acquire(list_name, mode)
+	try:
+		yield
+	finally:
+		release(list_name)
+
+# hold a list's lock exclusively, for changing the list
+def exclusive(list_name):
+	return locked(list_name, "exclusive")
+
+# hold a list's lock shared with other readers, keeping writers out
+def shared(list_name):
+	return locked(list_name, "shared")
+
+# point this module at another data directory
+# Args: data_dir path of a directory holding to-do list files
+def set_data_dir(data_dir):
+	global DATA_DIR, LOCK_DIR
+
+	DATA_DIR = Path(data_dir)
+	LOCK_DIR = DATA_DIR / ".utodo" / "locks"
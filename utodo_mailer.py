@@ -0,0 +1,155 @@
+# This file delivers email for the UTodo application over one reused SMTP session.
+# A Mailer logs in once and sends every queued message through the same connection,
+# reconnecting and retrying with backoff when the server drops it or fails temporarily.
+#
+# Server settings come from the environment (or .env), defaulting to Gmail over SSL:
+#   SMTP_HOST, SMTP_PORT, SMTP_SECURITY ("ssl", "starttls" or "none")
+#   EMAIL_ADDRESS, EMAIL_PW - the sending account, logged in to only over an encrypted session
+# For local testing run `python -m aiosmtpd -n -l localhost:1025` and set
+#   SMTP_HOST=localhost SMTP_PORT=1025 SMTP_SECURITY=none
+
+import os
+import time
+import smtplib
+import logging
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+import utodo_metrics
+
+DEFAULT_HOST = "smtp.gmail.com"
+DEFAULT_PORTS = {"ssl": 465, "starttls": 587, "none": 25}
+
+# attempts per message, and the delay before the first retry (doubled after each failure)
+MAX_ATTEMPTS = 4
+RETRY_DELAY = 1.0
+
+# seconds to wait on the server before giving up on a connection
+TIMEOUT = 30
+
+# errors that mean the session itself is gone and a new one is needed
+def is_disconnect(error):
+	if isinstance(error, smtplib.SMTPResponseException):
+		return error.smtp_code == 421 # service closing the channel
+	return isinstance(error, (smtplib.SMTPServerDisconnected, OSError))
+
+# errors worth another attempt: dropped connections and temporary (4xx) server replies
+def is_temporary(error):
+	if isinstance(error, (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)):
+		return True
+	if isinstance(error, smtplib.SMTPRecipientsRefused):
+		return all(400 <= code < 500 for code, reply in error.recipients.values())
+	code = getattr(error, "smtp_code", None)
+	return code is not None and 400 <= code < 500
+
+# build a plain text email
+# Args: sender address; to_email one address or a list of them; subject and body strings
+def build_message(sender, to_email, subject, body):
+	msg = MIMEMultipart()
+	msg["From"] = sender
+	msg["To"] = to_email if isinstance(to_email, str) else ", ".join(to_email)
+	msg["Subject"] = subject
+	msg.attach(MIMEText(body, "plain"))
+	return msg
+
+class Mailer:
+
+	def __init__(self, host=DEFAULT_HOST, port=None, security="ssl", username=None, password=None,
+			max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY):
+		if security not in DEFAULT_PORTS:
+			raise ValueError(f"unknown SMTP security {security!r} (use ssl, starttls or none)")
+		self.host = host
+		self.port = port or DEFAULT_PORTS[security]
+		self.security = security
+		self.username = username
+		self.password = password
+		self.max_attempts = max_attempts
+		self.retry_delay = retry_delay
+		self.server = None # the open session, connected on first send
+
+	# return a Mailer configured from the SMTP_* and EMAIL_* environment variables
+	@classmethod
+	def from_env(cls):
+		security = os.getenv("SMTP_SECURITY", "ssl").lower()
+		port = os.getenv("SMTP_PORT")
+		return cls(host=os.getenv("SMTP_HOST", DEFAULT_HOST), port=int(port) if port else None, security=security,
+			username=os.getenv("EMAIL_ADDRESS"), password=os.getenv("EMAIL_PW"))
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+	# open and log in to a new session
+	def connect(self):
+		server = None
+		try:
+			with utodo_metrics.timer("smtp_connect", security=self.security):
+				if self.security == "ssl":
+					server = smtplib.SMTP_SSL(self.host, self.port, timeout=TIMEOUT)
+				else:
+					server = smtplib.SMTP(self.host, self.port, timeout=TIMEOUT)
+					if self.security == "starttls":
+						server.starttls()
+			if self.password and self.security != "none": # never send the password in the clear
+				with utodo_metrics.timer("smtp_login"):
+					server.login(self.username, self.password)
+		except BaseException:
+			if server is not None:
+				server.close() # or every failed attempt, and so every retry, leaves a socket open
+			raise
+		self.server = server
+		logging.info(f"Connected to SMTP server {self.host}:{self.port}")
+
+	# end the session, quietly if the server already went away
+	def close(self):
+		if self.server is None:
+			return
+		try:
+			self.server.quit()
+		except (smtplib.SMTPException, OSError):
+			self.server.close()
+		self.server = None
+
+	# send one message over the open session, reconnecting and retrying temporary failures
+	# Args: msg email.message.Message with From/To/Subject set
+	def send(self, msg):
+		delay = self.retry_delay
+		for attempt in range(1, self.max_attempts + 1):
+			try:
+				if self.server is None:
+					self.connect()
+				with utodo_metrics.timer("smtp_send"):
+					self.server.send_message(msg)
+				utodo_metrics.count("emails", result="sent")
+				return
+			except (smtplib.SMTPException, OSError) as e:
+				if not is_temporary(e) or attempt == self.max_attempts:
+					raise
+				logging.warning(f"Sending to {msg['To']} failed ({e}), retry {attempt} in {delay:g}s")
+				utodo_metrics.count("smtp_retries")
+				if is_disconnect(e):
+					self.close() # start a new session on the next attempt
+				time.sleep(delay)
+				delay *= 2
+
+	# send many messages through the one session
+	# A message that still fails after its retries is logged and skipped so the rest go out
+	# Args: messages iterable of email.message.Message objects
+	# Returns [(message, error), ...] for the messages that could not be sent
+	def send_all(self, messages):
+		failed = []
+		sent = 0
+		for msg in messages:
+			try:
+				self.send(msg)
+				sent += 1
+			except (smtplib.SMTPException, OSError) as e:
+				logging.error(f"Could not send email to {msg['To']}: {e}")
+				utodo_metrics.count("emails", result="failed")
+				failed.append((msg, e))
+				if is_disconnect(e):
+					self.close()
+		logging.info(f"Sent {sent} of {sent + len(failed)} emails")
+		return failed
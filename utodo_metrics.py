@@ -0,0 +1,165 @@
+# This file collects opt-in timing and counter metrics for the UTodo application.
+# Hot paths (file reads, parses, rewrites, directory scans, SMTP, cron edits) are wrapped in
+# timers and counters that cost next to nothing unless metrics are switched on:
+#   UTODO_METRICS=log        a JSON summary line per run is written to utodo.log
+#   UTODO_METRICS=prom       a Prometheus textfile is written to data/.utodo/utodo_<program>.prom
+#   UTODO_METRICS=log,prom   both; UTODO_METRICS_DIR changes where textfiles go
+# Every entry point also takes --profile to write a cProfile report for one run.
+
+import os
+import sys
+import json
+import time
+import atexit
+import logging
+from contextlib import nullcontext
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent
+METRICS_DIR = Path(os.getenv("UTODO_METRICS_DIR", BASE_DIR / "data" / ".utodo"))
+
+# outputs switched on for this process, from UTODO_METRICS
+modes = {mode.strip() for mode in os.getenv("UTODO_METRICS", "").split(",") if mode.strip()}
+
+# timers: {(name, labels): [count, total seconds, max seconds]}; counters: {(name, labels): value}
+# labels is a sorted tuple of (key, value) pairs so it can be a dict key
+timers = {}
+counters = {}
+
+# shared do-nothing timer handed out while metrics are off
+NULL_TIMER = nullcontext()
+
+# the name metrics are reported under: the running script, ie. "utodo" or "utodo_notifications"
+def program_name():
+	return Path(sys.argv[0]).stem or "python"
+
+class Timer:
+	__slots__ = ("key", "start")
+
+	def __init__(self, key):
+		self.key = key
+
+	def __enter__(self):
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, *exc_info):
+		elapsed = time.perf_counter() - self.start
+		stats = timers.get(self.key)
+		if stats is None:
+			timers[self.key] = [1, elapsed, elapsed]
+		else:
+			stats[0] += 1
+			stats[1] += elapsed
+			if elapsed > stats[2]:
+				stats[2] = elapsed
+
+# time a block: with utodo_metrics.timer("file_read", kind="list"): ...
+def timer(name, **labels):
+	if not modes:
+		return NULL_TIMER
+	return Timer((name, tuple(sorted(labels.items()))))
+
+# add to a counter
+def count(name, amount=1, **labels):
+	if modes:
+		key = (name, tuple(sorted(labels.items())))
+		counters[key] = counters.get(key, 0) + amount
+
+# decorator timing every call of a function under a metric name
+def timed(name, **labels):
+	def decorate(func):
+		def wrapper(*args, **kwargs):
+			if not modes:
+				return func(*args, **kwargs)
+			with timer(name, **labels):
+				return func(*args, **kwargs)
+		wrapper.__name__ = func.__name__
+		wrapper.__wrapped__ = func
+		return wrapper
+	return decorate
+
+# switch outputs on from code, ie. for a command line flag
+# Args: new_modes iterable of "log" and/or "prom"
+def enable(new_modes):
+	modes.update(new_modes)
+
+# return everything collected so far as plain data
+def snapshot():
+	return {
+		"timers": [{"name": name, "labels": dict(labels), "count": stats[0],
+			"total_s": round(stats[1], 6), "max_s": round(stats[2], 6)} for (name, labels), stats in sorted(timers.items())],
+		"counters": [{"name": name, "labels": dict(labels), "value": value}
+			for (name, labels), value in sorted(counters.items())],
+	}
+
+# format labels for Prometheus, ie. {kind="list",program="utodo"}
+def prometheus_labels(labels):
+	parts = []
+	for key, value in labels:
+		value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+		parts.append(f'{key}="{value}"')
+	return "{" + ",".join(parts) + "}"
+
+# return the collected metrics in the Prometheus text exposition format
+def prometheus_text():
+	program = ("program", program_name())
+	lines = []
+	seen = set()
+	for (name, labels), (calls, total, longest) in sorted(timers.items()):
+		labels = prometheus_labels(sorted(labels + (program,)))
+		if name not in seen:
+			lines.append(f"# TYPE utodo_{name}_seconds summary")
+			seen.add(name)
+		lines.append(f"utodo_{name}_seconds_count{labels} {calls}")
+		lines.append(f"utodo_{name}_seconds_sum{labels} {total:.6f}")
+		lines.append(f"utodo_{name}_seconds_max{labels} {longest:.6f}")
+	for (name, labels), value in sorted(counters.items()):
+		if name not in seen:
+			lines.append(f"# TYPE utodo_{name}_total counter")
+			seen.add(name)
+		lines.append(f"utodo_{name}_total{prometheus_labels(sorted(labels + (program,)))} {value}")
+	return "\n".join(lines) + "\n"
+
+# write the Prometheus textfile atomically, so a collector never reads half of it
+def write_prometheus(path=None):
+	path = Path(path or METRICS_DIR / f"utodo_{program_name()}.prom")
+	path.parent.mkdir(parents=True, exist_ok=True)
+	tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+	with open(tmp_path, "w") as tmp_file:
+		tmp_file.write(prometheus_text())
+	os.replace(tmp_path, path)
+
+# write what was collected to the outputs switched on, run automatically at exit
+def flush():
+	if not modes or not (timers or counters):
+		return
+	if "log" in modes:
+		logging.info("metrics " + json.dumps({"program": program_name(), "pid": os.getpid(), **snapshot()}))
+	if "prom" in modes:
+		try:
+			write_prometheus()
+		except OSError as e:
+			logging.error(f"Could not write metrics textfile: {e}")
+
+atexit.register(flush)
+
+# run a function under cProfile, saving the stats and logging the 25 most expensive calls
+# Args: call function to run; args its arguments
+# Returns whatever the function returns; the report is written even if it raises (or exits)
+def profile(call, *args):
+	import cProfile
+	import pstats
+	import io
+
+	profiler = cProfile.Profile()
+	try:
+		return profiler.runcall(call, *args)
+	finally:
+		METRICS_DIR.mkdir(parents=True, exist_ok=True)
+		path = METRICS_DIR / f"profile_{program_name()}_{time.strftime('%Y%m%d_%H%M%S')}.prof"
+		profiler.dump_stats(path)
+		report = io.StringIO()
+		pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(25)
+		logging.info(f"Profile saved to {path}\n{report.getvalue()}")
+		print(f"Profile saved to {path} (view with: python -m pstats {path})", file=sys.stderr)
@@ -1,48 +1,32 @@
 # This file manages sending email notifications for the UTodo application.
 # Created 11/14/2025 and written by Landon Tidwell for CS-2351.
+#
+# Run with no arguments to send the digest for this install's data directory, or with
+# --users DIR [DIR ...] / --users-from FILE to send one digest per user data directory.
+# Users' digests are built in parallel across processes and sent over a single SMTP session.
+#
+# Importing this file has no side effects: .env and logging are only set up by the main program,
+# so the daemon and tests can reuse the digest functions.
 
 import os
-import smtplib
-import json
+import sys
 import logging
-from datetime import date, timedelta, datetime
-from pathlib import Path
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-
-# Load credentials from environment variables
-BASE_DIR = Path(__file__).parent
-ENV_FILE = BASE_DIR / ".env"
-
-# Read the .env file and extract the environment variables
-if ENV_FILE.exists():
-	with open(ENV_FILE) as f:
-		for line in f:
-			# Skip empty lines or comments
-			if line.strip() == "" or line.strip().startswith("#"):
-				continue
-			# Split on the first '='
-			key, value = line.strip().split("=", 1)
-			os.environ[key] = value  # store in environment variables
-
-# Store environment variables now that accessible by cron
-EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS")
-EMAIL_PASSWORD = os.getenv("EMAIL_PW")
-
-
-# set up log config
-
-logging.basicConfig(filename='utodo.log',
-                    level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
-
-# Get the email address from the settings json file
-def get_email_address():
+import argparse
+from datetime import date, timedelta
+
+import utodo_core
+import utodo_mailer
+import utodo_metrics
+
+# Get the account emails are sent from, loaded from .env by the main program so it is accessible by cron
+def get_sender():
 
-	with open(f"{BASE_DIR}/data/settings.json", "r") as settings_file:
-		settings_data = json.load(settings_file)
+	return os.getenv("EMAIL_ADDRESS")
 
-	return settings_data["Email"]
+# Get the email addresses from the settings json file of the data directory in use
+def get_email_address():
+
+	return utodo_core.email_addresses()
 
 # Get the current date in MM/DD format
 def get_date():
@@ -56,115 +40,175 @@ def get_next_date():
 	tomorrow = date.today() + timedelta(days=1)
 	return tomorrow
 
-# Get to-do lists and form body of string
-def write_body():
+# Build the due-date windows the digest can report on
+# Each window is (heading, message when empty, first due date, last due date); None leaves that end open
+def get_windows():
 
-	today = get_date().strftime("%m/%d")
-	body_intro = ["Here is today's to-do list summary!\n\n",
-		f"\t[ Tasks Due Today   {today} ]\n"]
+	today = get_date()
+	tomorrow = get_next_date()
+	week_end = today + timedelta(days=6)
 
-	directory = Path(f"{BASE_DIR}/data")
+	return {
+		"overdue": ("Overdue Tasks", "No overdue tasks!", None, today - timedelta(days=1)),
+		"today": (f"Tasks Due Today   {today.strftime('%m/%d')}", "No tasks due today! All caught up!", today, today),
+		"tomorrow": (f"Tasks Due Tomorrow   {tomorrow.strftime('%m/%d')}", "No tasks due tomorrow! All caught up!", tomorrow, tomorrow),
+		"week": (f"Tasks Due This Week   {today.strftime('%m/%d')} - {week_end.strftime('%m/%d')}", "No tasks due this week! All caught up!", today, week_end)
+	}
 
-	# Loop through to check for tasks due today
-	tdlists = []
-	tasks = []
-	for file in directory.iterdir():
+# Look up the tasks in each window through the storage backend's due-date index
+# Returns {window key: [(list name, [Task, ...]), ...]} with every list included
+# Args: list_names lists to report on, every list if None
+def collect_due_tasks(windows, list_names=None):
 
-		# checks to make sure file is a text file (a to-do list)
-		if file.is_file() and file.suffix == ".txt":
-			none_due = True
-			combined_tasks = ""
-			tdlists.append(f"\n\t<> {file.stem.replace('_', ' ')}:\n") # add to to-do list array
+	if list_names is None:
+		list_names = utodo_core.list_names()
+	digest = {}
 
-			with open(f"{directory}/{file.stem}.txt", "r") as file: # open to-do list file
+	for key, (heading, empty, first, last) in windows.items():
+		found = {list_name: [] for list_name in list_names}
+		for list_name, task in utodo_core.due_tasks(first, last):
+			if list_name in found:
+				found[list_name].append(task)
+		digest[key] = list(found.items())
 
-				for line in file.read().splitlines():
+	return digest
 
-					task = line.split('|') # split by the | characters in data file
-					task_date = datetime.strptime(task[1], "%Y-%m-%d").date()
+# Sections included in the emailed digest, in order
+DIGEST_SECTIONS = ["today", "tomorrow"]
 
-					# check if task date is the same as today
-					if task_date == get_date():
-						none_due = False
-						combined_tasks += f"\t- {task[0]} - {task[2]}\n"
-			if none_due:
-				tasks.append("\t\tNo tasks due today! All caught up!\n")
-			else:
-				tasks.append(combined_tasks)
-
-	body_today = []
-	i = 0
-	for list in tdlists:
-		body_today.append(list)
-		body_today.append(tasks[i])
-		i += 1
-
-	# Same exact thing but for tasks due tomorrow
-	tdlists = []
-	tasks = []
-	for file in directory.iterdir():
-
-		# checks to make sure file is a text file (a to-do list)
-		if file.is_file() and file.suffix == ".txt":
-			none_due = True
-			combined_tasks = ""
-			tdlists.append(f"\n\t<> {file.stem.replace('_', ' ')}:\n") # add to to-do list array
-
-			with open(f"{directory}/{file.stem}.txt", "r") as file: # open to-do list file
-
-				for line in file.read().splitlines():
-
-					task = line.split('|') # split by the | characters in data file
-					task_date = datetime.strptime(task[1], "%Y-%m-%d").date()
-
-					# check if task date is the same as today
-					if task_date == get_next_date():
-						none_due = False
-						combined_tasks += f"\t- {task[0]} - {task[2]}\n"
-			if none_due:
-				tasks.append("\t\tNo tasks due today! All caught up!\n")
+# Get to-do lists and form body of string
+# Args: sections digest sections in order; list_names lists to include, every list if None
+@utodo_metrics.timed("digest")
+def write_body(sections=DIGEST_SECTIONS, list_names=None):
+
+	all_windows = get_windows()
+	windows = {key: all_windows[key] for key in sections}
+	digest = collect_due_tasks(windows, list_names)
+
+	body = ["Here is today's to-do list summary!\n\n"]
+
+	for i, key in enumerate(sections):
+		heading, empty = windows[key][0], windows[key][1]
+		if i > 0:
+			body.append("\n\n\n")
+		body.append(f"\t[ {heading} ]\n")
+
+		for list_name, tasks in digest[key]:
+			body.append(f"\n\t<> {list_name}:\n")
+			if tasks:
+				for task in tasks:
+					body.append(f"\t- {task.name} - {task.description or ''}\n")
 			else:
-				tasks.append(combined_tasks)
-
-	body_tomorrow = []
-	i = 0
-	tomorrow = get_next_date().strftime("%m/%d")
-	body_tomorrow.append(f"\n\n\n\t[ Tasks Due Tomorrow   {tomorrow} ]\n")
-	for list in tdlists:
-		body_tomorrow.append(list)
-		body_tomorrow.append(tasks[i])
-		i += 1
+				body.append(f"\t\t{empty}\n")
 
 	# Body conclusion
-	body_conclusion = ["\n\nLet's have a productive day today!\n",
-		"Be sure to log in and complete your tasks as necessary.\n"]
+	body.append("\n\nLet's have a productive day today!\n")
+	body.append("Be sure to log in and complete your tasks as necessary.\n")
 
-	# Combine body
-	body = body_intro + body_today + body_tomorrow + body_conclusion
-	combined_string = "".join(body)
-	return combined_string
+	return "".join(body)
 
-def send_email(to_email, subject, body):
-	msg = MIMEMultipart()
-	msg["From"] = EMAIL_ADDRESS
-	msg["To"] = to_email
-	msg["Subject"] = subject
-	msg.attach(MIMEText(body, "plain"))
+# Send one email to each address through a single SMTP session
+# Args: to_email one address or a list of them; subject and body strings;
+#       mailer an open utodo_mailer.Mailer to reuse, a new one from the environment if None
+# Returns the addresses that could not be sent to
+def send_email(to_email, subject, body, mailer=None):
+	addresses = [to_email] if isinstance(to_email, str) else to_email
+	messages = (utodo_mailer.build_message(get_sender(), address, subject, body) for address in addresses)
 
-    	# Gmail SMTP server
-	with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-		server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-		server.send_message(msg)
+	if mailer is not None:
+		failed = mailer.send_all(messages)
+	else:
+		with utodo_mailer.Mailer.from_env() as mailer:
+			failed = mailer.send_all(messages)
 
-	logging.info("Email sent successfully using Gmail App Password!")
+	if not failed:
+		logging.info("Email sent successfully!")
+	return [msg["To"] for msg, error in failed]
 
-# Main program
+# Subject line of today's digest
+def get_subject():
+
+	return f"Unix To-Do: Summary for {get_date().strftime('%m/%d')}"
 
-# invokes send_email to connect to the gmail servers and send an email through the unixtodolist@gmail.com account
-today = get_date().strftime("%m/%d")
+# Build one user's digest, run inside a worker process
+# Args: data_dir the user's data directory, holding their settings.json and to-do lists
+# Returns (data_dir, [addresses], subject, body)
+def build_user_digest(data_dir):
 
-send_email(
-	to_email=get_email_address(),
-	subject=f"Unix To-Do: Summary for {today}",
-	body=write_body()
-)
+	utodo_core.use_data_dir(data_dir)
+	return data_dir, get_email_address(), get_subject(), write_body()
+
+# Build every user's digest in parallel and send them as they finish through one delivery queue
+# Args: data_dirs user data directories; workers number of processes, one per core if None
+# Returns the number of users whose digest could not be built or sent
+def fan_out(data_dirs, workers=None):
+
+	from concurrent.futures import ProcessPoolExecutor, as_completed # only the fan-out needs a process pool
+
+	failures = 0
+
+	with ProcessPoolExecutor(max_workers=workers) as pool:
+		futures = {pool.submit(build_user_digest, str(data_dir)): data_dir for data_dir in data_dirs}
+
+		# the delivery queue: finished digests, in the order the workers complete them
+		def finished_messages():
+			nonlocal failures
+			for future in as_completed(futures):
+				try:
+					data_dir, addresses, subject, body = future.result()
+				except Exception as e: # whatever went wrong for one user, the others still get their digests
+					logging.error(f"Could not build digest for {futures[future]}: {e!r}")
+					failures += 1
+					continue
+				for address in addresses:
+					yield utodo_mailer.build_message(get_sender(), address, subject, body)
+
+		with utodo_mailer.Mailer.from_env() as mailer:
+			failed = mailer.send_all(finished_messages())
+		failures += len(failed) # after sending, which also counts digests that could not be built
+
+	logging.info(f"Digests sent for {len(futures)} users, {failures} failures")
+	return failures
+
+# Read user data directories from a file, one per line
+def read_user_dirs(path):
+
+	with open(path, "r") as users_file:
+		return [line.strip() for line in users_file if line.strip() and not line.strip().startswith("#")]
+
+# Main program
+# Args: args parsed command line arguments
+# Returns the exit status
+def main(args):
+
+	data_dirs = args.users + (read_user_dirs(args.users_from) if args.users_from else [])
+	if data_dirs:
+		return 1 if fan_out(data_dirs, args.workers) else 0
+
+	import utodo_daemon
+	if utodo_daemon.daemon_running():
+		# a leftover cron entry - the daemon already sends this install's digest
+		logging.info("Notification daemon is running, skipping scheduled digest")
+		return 0
+
+	# invokes send_email to connect to the gmail servers and send an email through the unixtodolist@gmail.com account
+	failed = send_email(
+		to_email=get_email_address(),
+		subject=get_subject(),
+		body=write_body()
+	)
+	return 1 if failed else 0
+
+if __name__ == "__main__":
+	# Load credentials from the .env file and set up log config
+	utodo_core.load_env()
+	utodo_core.setup_logging()
+
+	parser = argparse.ArgumentParser(description="Send the UTodo digest email.")
+	parser.add_argument("--users", nargs="+", default=[], metavar="DIR", help="user data directories to send digests for")
+	parser.add_argument("--users-from", metavar="FILE", help="file listing user data directories, one per line")
+	parser.add_argument("--workers", type=int, help="processes building digests (default: one per core)")
+	parser.add_argument("--profile", action="store_true", help="save a cProfile report of this run")
+	args = parser.parse_args()
+
+	sys.exit(utodo_metrics.profile(main, args) if args.profile else main(args))
@@ -0,0 +1,173 @@
+# This file keeps a line-offset index for each to-do list file in the UTodo application.
+# It records where every line of the list file starts, so a task can be read by seeking straight
+# to its bytes instead of reading and splitting the whole file - task 90000 costs what task 1 does.
+# The index is written whenever the list file is, and read through mmap so only the entries used are touched.
+
+import os
+import mmap
+import zlib
+import struct
+import hashlib
+from array import array
+from pathlib import Path
+
+import utodo_journal # which imports this module too; only its functions are used, once both are loaded
+import utodo_metrics
+
+BASE_DIR = Path(__file__).parent
+OFFSETS_DIR = BASE_DIR / "data" / ".utodo" / "offsets"
+
+# Offset file layout, little-endian:
+#   header: list file mtime_ns, list file size, crc32 of the list file, number of lines (4 x uint64)
+#   the byte offset each line starts at, then the size of the file (lines + 1 x uint64)
+#   the id of each line's task, as utodo_journal.task_id gives it in hex (lines x uint64)
+HEADER = struct.Struct("<QQQQ")
+OFFSET = struct.Struct("<Q")
+
+# offset files mapped by this process: {list name: Offsets}
+opened = {}
+
+# returns the path of the offset file for a to-do list
+def offsets_path(list_name):
+	return OFFSETS_DIR / f"{list_name.replace(' ', '_')}.bin"
+
+# return the id of a task line as an integer - utodo_journal.task_id is the same value in hex
+def line_id(line):
+	return int.from_bytes(hashlib.blake2b(line.encode(), digest_size=8).digest(), "big")
+
+# The offset index of one list file, read from its mapped offset file
+class Offsets:
+	__slots__ = ("file", "map", "mtime_ns", "size", "crc", "count")
+
+	def __init__(self, path):
+		self.file = open(path, "rb")
+		try:
+			self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+			self.mtime_ns, self.size, self.crc, self.count = HEADER.unpack_from(self.map)
+			if len(self.map) != HEADER.size + OFFSET.size * (self.count + 1) + OFFSET.size * self.count:
+				self.map.close()
+				raise ValueError(f"{path} is truncated")
+		except (OSError, ValueError, struct.error):
+			self.file.close()
+			raise
+
+	# check the index was written for the list file as it is now
+	# Args: stat os.stat_result of the list file
+	def matches(self, stat):
+		return self.mtime_ns == stat.st_mtime_ns and self.size == stat.st_size
+
+	# return the byte offset line num (0-based) starts at; num == count gives the end of the file
+	def offset(self, num):
+		return OFFSET.unpack_from(self.map, HEADER.size + OFFSET.size * num)[0]
+
+	# return the id of every line's task, as integers
+	def task_ids(self):
+		start = HEADER.size + OFFSET.size * (self.count + 1)
+		ids = array("Q")
+		ids.frombytes(self.map[start:start + OFFSET.size * self.count])
+		return ids
+
+	def close(self):
+		self.map.close()
+		self.file.close()
+
+# write a list file's offset file atomically
+# Args: list_name string with whitespace; data the bytes of the list file;
+#       stat os.stat_result of the list file holding those bytes
+def save_offsets(list_name, data, stat):
+	text = data.decode()
+	offsets = array("Q", [0])
+	position = 0
+	for line in text.splitlines(keepends=True): # split as utodo_journal.read_snapshot does
+		position += len(line.encode())
+		offsets.append(position)
+	ids = array("Q", (line_id(line) for line in text.splitlines()))
+
+	OFFSETS_DIR.mkdir(parents=True, exist_ok=True)
+	path = offsets_path(list_name)
+	tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+	with open(tmp_path, "wb") as tmp_file:
+		tmp_file.write(HEADER.pack(stat.st_mtime_ns, stat.st_size, zlib.crc32(data), len(ids)))
+		offsets.tofile(tmp_file)
+		ids.tofile(tmp_file)
+	os.replace(tmp_path, path)
+
+	index = opened.pop(list_name, None)
+	if index is not None:
+		index.close()
+
+# return the offset index of a list file, rebuilding it with one read of the file if it is missing or stale
+# Returns None if the list file does not exist
+# Args: list_name string with whitespace, ie. "Sample List"
+def get_offsets(list_name):
+	try:
+		stat = utodo_journal.list_path(list_name).stat()
+	except FileNotFoundError:
+		forget_list(list_name)
+		return None
+
+	index = opened.get(list_name)
+	if index is not None and index.matches(stat):
+		return index
+
+	try:
+		index = Offsets(offsets_path(list_name))
+	except (OSError, ValueError):
+		index = None
+	if index is None or not index.matches(stat):
+		if index is not None:
+			index.close()
+		utodo_metrics.count("offset_rebuilds")
+		try:
+			with open(utodo_journal.list_path(list_name), "rb") as list_file:
+				data = list_file.read()
+				stat = os.fstat(list_file.fileno())
+		except FileNotFoundError:
+			return None
+		save_offsets(list_name, data, stat)
+		index = Offsets(offsets_path(list_name))
+
+	old = opened.pop(list_name, None)
+	if old is not None:
+		old.close()
+	opened[list_name] = index
+	return index
+
+# read lines first..last (0-based, inclusive) of a list file with a single read of their bytes
+# Returns None if the list file changed since the index was checked
+# Args: list_name string with whitespace; index Offsets of the list file
+def read_lines(list_name, index, first, last):
+	start = index.offset(first)
+	end = index.offset(last + 1)
+	try:
+		with open(utodo_journal.list_path(list_name), "rb") as list_file:
+			if not index.matches(os.fstat(list_file.fileno())):
+				return None
+			with utodo_metrics.timer("file_read", kind="range"):
+				data = os.pread(list_file.fileno(), end - start, start)
+	except FileNotFoundError:
+		return None
+	utodo_metrics.count("bytes_read", len(data), kind="range")
+	return data.decode().splitlines()
+
+# close and forget a list's offset index, removing its offset file if the list itself is gone
+# Args: list_name string with whitespace, ie. "Sample List"
+def forget_list(list_name):
+	index = opened.pop(list_name, None)
+	if index is not None:
+		index.close()
+	if not utodo_journal.list_path(list_name).exists():
+		offsets_path(list_name).unlink(missing_ok=True)
+
+# close every mapped offset file
+def close_all():
+	for list_name in list(opened):
+		opened.pop(list_name).close()
+
+# point this module at another data directory
+# Args: data_dir path of a directory holding to-do list files
+def set_data_dir(data_dir):
+	global OFFSETS_DIR
+
+	close_all()
+	OFFSETS_DIR = Path(data_dir) / ".utodo" / "offsets"
@@ -0,0 +1,147 @@
+# This file defines repeating tasks for the UTodo application.
+# A repeating task is stored once, with a rule in place of its due date:
+#   "Phone payment|2025-12-16 every 1 month done 2026-01-16 except 2026-03-16|$32"
+# Its occurrences are worked out from the rule only for the dates asked about, so a task due every day
+# for years costs one line. Completing an occurrence moves "done" past it, or records it as an exception
+# if earlier occurrences are still outstanding.
+
+import re
+import calendar
+from datetime import date, timedelta
+
+# "START every N UNIT[s] [done DATE] [except DATE,DATE,...]", dates as YYYY-MM-DD
+RULE = re.compile(r"(\d{4}-\d{2}-\d{2}) every (\d+) (day|week|month)s?(?: done (\d{4}-\d{2}-\d{2}))?(?: except ([\d,-]+))?")
+
+# how users describe a repeat: "daily", "weekly", "monthly", "yearly" or "every N days/weeks/months/years"
+SPEC = re.compile(r"(?:every\s+)?(\d+\s*)?(day|week|month|year)s?")
+ALIASES = {"daily": "every 1 day", "weekly": "every 1 week", "monthly": "every 1 month", "yearly": "every 1 year"}
+
+# return (every, unit) for a repeat typed by a user, ie. "weekly" or "every 2 weeks"
+# Raises ValueError for anything else
+def parse_spec(text):
+	text = ALIASES.get(text.strip().lower(), text.strip().lower())
+	match = SPEC.fullmatch(text)
+	if match is None or match.group(1) is not None and int(match.group(1)) < 1:
+		raise ValueError(f"invalid repeat {text!r}")
+	every = int(match.group(1) or 1)
+	if match.group(2) == "year":
+		return every * 12, "month"
+	return every, match.group(2)
+
+# return the date a number of months after day, on the given day of the month or the month's last day
+def add_months(day, months, day_of_month):
+	year, month = divmod(day.month - 1 + months, 12)
+	year += day.year
+	return date(year, month + 1, min(day_of_month, calendar.monthrange(year, month + 1)[1]))
+
+class Rule:
+	__slots__ = ("start", "every", "unit", "done", "exceptions")
+
+	# Args: start datetime.date of the first occurrence; every, unit how far apart occurrences are,
+	#       ie. 2, "week"; done datetime.date through which every occurrence is complete, or None;
+	#       exceptions set of later datetime.date occurrences that are complete
+	def __init__(self, start, every, unit, done=None, exceptions=()):
+		self.start = start
+		self.every = every
+		self.unit = unit
+		self.done = done
+		self.exceptions = set(exceptions)
+
+	# parse a rule as stored in a task's due date field, or return None if the text is not a rule
+	@classmethod
+	def parse(cls, text):
+		match = RULE.fullmatch(text)
+		if match is None:
+			return None
+		try:
+			start = date.fromisoformat(match.group(1))
+			done = date.fromisoformat(match.group(4)) if match.group(4) else None
+			exceptions = [date.fromisoformat(day) for day in match.group(5).split(",")] if match.group(5) else []
+		except ValueError:
+			return None
+		if int(match.group(2)) < 1:
+			return None
+		return cls(start, int(match.group(2)), match.group(3), done, exceptions)
+
+	# the rule as it is stored in a task's due date field
+	def to_text(self):
+		text = f"{self.start.isoformat()} every {self.every} {self.unit}{'' if self.every == 1 else 's'}"
+		if self.done is not None:
+			text += f" done {self.done.isoformat()}"
+		if self.exceptions:
+			text += " except " + ",".join(day.isoformat() for day in sorted(self.exceptions))
+		return text
+
+	# how often the task repeats, ie. "every 2 weeks"
+	def describe(self):
+		return f"every {self.unit}" if self.every == 1 else f"every {self.every} {self.unit}s"
+
+	# return the date of occurrence k, counting from 0 at the start date
+	def nth(self, k):
+		if self.unit == "month":
+			return add_months(self.start, k * self.every, self.start.day)
+		return self.start + timedelta(days=k * self.every * (7 if self.unit == "week" else 1))
+
+	# return the number of the first occurrence on or after day, without stepping through earlier ones
+	def first_from(self, day):
+		if day <= self.start:
+			return 0
+		if self.unit == "month":
+			months = (day.year - self.start.year) * 12 + day.month - self.start.month
+			k = max(0, months // self.every)
+		else:
+			k = (day - self.start).days // (self.every * (7 if self.unit == "week" else 1))
+		while self.nth(k) < day:
+			k += 1
+		return k
+
+	# yield the outstanding occurrences between first and last, inclusive, in order
+	# Only the dates asked for are worked out; with no last date the generator never ends, so
+	# callers take what they need from it
+	# Args: first/last datetime.date objects, None leaves that end of the range open
+	def occurrences(self, first=None, last=None):
+		k = 0 if first is None else self.first_from(first)
+		if self.done is not None:
+			k = max(k, self.first_from(self.done + timedelta(days=1)))
+		while True:
+			day = self.nth(k)
+			if last is not None and day > last:
+				return
+			if day not in self.exceptions:
+				yield day
+			k += 1
+
+	# return the earliest occurrence not yet completed
+	def next_due(self):
+		return next(self.occurrences())
+
+	# return a copy of the rule with the occurrence on day completed
+	# Completing the earliest outstanding occurrence moves "done" past it and past any exceptions that
+	# follow it, so the rule does not grow as occurrences are completed in order
+	def complete(self, day):
+		rule = Rule(self.start, self.every, self.unit, self.done, self.exceptions)
+		if day != self.next_due():
+			rule.exceptions.add(day)
+			return rule
+
+		rule.done = day
+		k = rule.first_from(day + timedelta(days=1))
+		while rule.nth(k) in rule.exceptions:
+			rule.done = rule.nth(k)
+			k += 1
+		rule.exceptions = {later for later in rule.exceptions if later > rule.done}
+		return rule
+
+	def __eq__(self, other):
+		return isinstance(other, Rule) and self.to_text() == other.to_text()
+
+	def __hash__(self):
+		return hash(self.to_text())
+
+	def __repr__(self):
+		return f"Rule({self.to_text()!r})"
+
+# return the rule of a task line, or None if the task does not repeat
+def line_rule(line):
+	fields = line.split('|', 2)
+	return Rule.parse(fields[1]) if len(fields) > 1 and " every " in fields[1] else None
@@ -0,0 +1,186 @@
+# This file keeps an on-disk inverted index of the words in every task for the UTodo application.
+# Each word of a task's name and description points at the lists and tasks it appears in, so a search
+# looks up a few words instead of reading every to-do list.
+
+import re
+from bisect import bisect_left, insort
+from datetime import date
+
+import utodo_journal
+import utodo_recur
+import utodo_sidecar
+from utodo_task import parse_iso
+
+# Index layout:
+#   "version": SearchIndex.version, an index of another version is built again
+#   "lists": {list name: {"sig": list file/journal signature, "tasks": {task id: task line},
+#                         "copies": {task id: number of copies} for lines the list holds more than once}}
+#   "terms": {word: {list name: [task ids]}}
+# Task ids come from utodo_journal.task_id, so a task line is stored once however many words it has.
+
+# what counts as a word: runs of letters, digits and underscores, compared in lower case
+WORD = re.compile(r"\w+")
+
+# the words of the loaded index in sorted order for prefix lookups, and the index they are for
+# (built on the first search)
+sorted_terms = None
+sorted_index = None
+
+# return the words of a task's name and description - its due date is searched by range, not by word
+def task_terms(line):
+	fields = line.split('|', 2)
+	text = fields[0] if len(fields) < 3 else f"{fields[0]} {fields[2]}"
+	return set(WORD.findall(text.lower()))
+
+# return the words of a search query, each matched as the start of a word
+def query_terms(query):
+	return list(dict.fromkeys(WORD.findall(query.lower())))
+
+# check whether a task has a word starting with every query word
+def matches(line, terms):
+	words = task_terms(line)
+	return all(any(word.startswith(term) for word in words) for term in terms)
+
+# check whether a task is due between first and last, inclusive - a repeating task if any outstanding
+# occurrence is; a task without a valid date is only kept when there is no range
+# Args: first/last datetime.date objects, None leaves that end of the range open
+def due_in_range(line, first, last):
+	if first is None and last is None:
+		return True
+	fields = line.split('|', 2)
+	due = parse_iso(fields[1]) if len(fields) > 1 else None
+	if isinstance(due, str):
+		rule = utodo_recur.line_rule(line)
+		return rule is not None and next(rule.occurrences(first, last), None) is not None
+	return isinstance(due, date) and (first is None or due >= first) and (last is None or due <= last)
+
+# order search hits by due date (undated last, repeating tasks by their next occurrence), then list, then task
+def sort_hits(hits):
+	def key(hit):
+		fields = hit[1].split('|', 2)
+		if len(fields) > 1 and isinstance(parse_iso(fields[1]), date):
+			return (fields[1], hit[0], hit[1]) # ISO dates sort as text
+		rule = utodo_recur.line_rule(hit[1])
+		return (rule.next_due().isoformat() if rule is not None else "~", hit[0], hit[1])
+	return sorted(hits, key=key)
+
+# add a task line to a list's postings
+def add_task_entries(index, list_name, line):
+	tid = utodo_journal.task_id(line)
+	entry = index["lists"][list_name]
+	if tid in entry["tasks"]:
+		# an exact duplicate: indexed once, and counted so removing one copy keeps the task searchable
+		entry["copies"][tid] = entry["copies"].get(tid, 1) + 1
+		return
+	entry["tasks"][tid] = line
+	for term in task_terms(line):
+		postings = index["terms"].get(term)
+		if postings is None:
+			postings = index["terms"][term] = {}
+			if index is sorted_index:
+				insort(sorted_terms, term)
+		postings.setdefault(list_name, []).append(tid)
+
+# remove a task line from a list's postings
+def drop_task_entries(index, list_name, line):
+	tid = utodo_journal.task_id(line)
+	entry = index["lists"][list_name]
+	copies = entry["copies"].get(tid)
+	if copies is not None:
+		if copies > 2:
+			entry["copies"][tid] = copies - 1
+		else:
+			del entry["copies"][tid]
+		return # another copy is still in the list
+	if entry["tasks"].pop(tid, None) is None:
+		return
+	for term in task_terms(line):
+		postings = index["terms"].get(term, {})
+		ids = postings.get(list_name, [])
+		if tid in ids:
+			ids.remove(tid)
+		if not ids:
+			postings.pop(list_name, None)
+		if not postings:
+			index["terms"].pop(term, None)
+			if index is sorted_index:
+				i = bisect_left(sorted_terms, term)
+				if i < len(sorted_terms) and sorted_terms[i] == term:
+					del sorted_terms[i]
+
+# The search index. Only a process that has searched keeps it up to date as it changes lists; one that
+# never searches leaves the file alone, and the lists it changed are read again when the index is next loaded.
+class SearchIndex(utodo_sidecar.ListIndex):
+	file_name = "search_index.json"
+	version = 2
+	target = "search"
+
+	def empty(self):
+		return {"version": self.version, "lists": {}, "terms": {}}
+
+	def drop_list_entries(self, index, list_name):
+		entry = index["lists"].get(list_name)
+		if entry is None:
+			return
+		entry["copies"].clear()
+		for line in list(entry["tasks"].values()):
+			drop_task_entries(index, list_name, line)
+		del index["lists"][list_name]
+
+	def add_list_entries(self, index, list_name, sig):
+		index["lists"][list_name] = {"sig": sig, "tasks": {}, "copies": {}}
+		for line in utodo_journal.read_list(list_name):
+			add_task_entries(index, list_name, line)
+
+	def apply_entries(self, index, entry, list_name, removed, added):
+		for line in removed:
+			drop_task_entries(index, list_name, line)
+		for line in added:
+			add_task_entries(index, list_name, line)
+
+# the search index of the data directory in use, and the operations other modules call on it
+search_index = SearchIndex()
+get_index = search_index.get
+flush_index = search_index.flush
+set_data_dir = search_index.set_data_dir
+update_list = search_index.update_list
+remove_list = search_index.remove_list
+revalidate = search_index.revalidate
+apply_change = search_index.apply_change
+
+# return the indexed words starting with a prefix
+def prefix_terms(prefix):
+	global sorted_terms, sorted_index
+
+	index = get_index()
+	if sorted_index is not index:
+		sorted_terms = sorted(index["terms"])
+		sorted_index = index
+	start = bisect_left(sorted_terms, prefix)
+	stop = bisect_left(sorted_terms, prefix + "\U0010ffff")
+	return sorted_terms[start:stop]
+
+# return [(list name, task line), ...] for tasks with a word starting with every word of the query,
+# due between first and last if given, ordered by due date
+# Args: query string of words, ie. "credit stat"; first/last datetime.date objects or None
+def search(query, first=None, last=None):
+	terms = query_terms(query)
+	if not terms:
+		return []
+	index = get_index()
+
+	# count each word's hits without collecting them, then collect only the rarest word's hits and
+	# check the few tasks found for the other words - a common word never has its hits gathered
+	words = {term: prefix_terms(term) for term in terms}
+	sizes = {term: sum(len(ids) for word in words[term] for ids in index["terms"][word].values()) for term in terms}
+	rarest = min(terms, key=sizes.get)
+	if sizes[rarest] == 0:
+		return []
+
+	hits = set()
+	for word in words[rarest]:
+		for list_name, ids in index["terms"][word].items():
+			tasks = index["lists"][list_name]["tasks"]
+			hits.update((list_name, tasks[tid]) for tid in ids)
+	others = [term for term in terms if term != rarest]
+	return sort_hits([hit for hit in hits if (not others or matches(hit[1], others)) and due_in_range(hit[1], first, last)])
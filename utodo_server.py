@@ -0,0 +1,254 @@
+# This file runs the resident UTodo server, which keeps this install's lists parsed between commands.
+# Every run of `utodo` otherwise pays for starting Python, importing the application, setting up
+# logging and loading the catalog and indexes before it can print anything. The server does all of
+# that once, then listens on a Unix domain socket for utodo_client.py.
+#
+# For each command the client sends its arguments, working directory and its stdin, stdout and
+# stderr (passed as file descriptors, see utodo_client.py for the protocol), and the server forks.
+# The child inherits everything already loaded, runs the command exactly as utodo.py would - menus
+# included, reading and writing the client's terminal - and reports its exit status back. Changes a
+# command makes are seen by the server through the file watcher, and only the lists that changed are
+# parsed again.
+#
+# Run `python utodo_server.py` to start it, and `python utodo_server.py --stop` to stop it.
+# Restart it after updating UTodo, since it keeps running the code it started with.
+
+import os
+import sys
+import signal
+import socket
+import logging
+import argparse
+import selectors
+import threading
+from pathlib import Path
+
+import utodo
+import utodo_catalog
+import utodo_core
+import utodo_index
+import utodo_journal
+import utodo_metrics
+import utodo_search
+import utodo_storage
+import utodo_watch
+
+BASE_DIR = Path(__file__).parent
+DATA_DIR = BASE_DIR / "data"
+SOCKET_FILE = DATA_DIR / ".utodo" / "utodo.sock"
+PID_FILE = DATA_DIR / ".utodo" / "server.pid"
+
+# largest request a client may send, in bytes
+MAX_REQUEST = 1 << 20
+
+# check whether a server is already running for this install, going by its pid file
+def server_running():
+	try:
+		pid = int(PID_FILE.read_text())
+		os.kill(pid, 0)
+	except (OSError, ValueError):
+		return False
+	return True
+
+# check a connection comes from a process of the user running the server, where the platform says
+def same_user(conn):
+	if not hasattr(socket, "SO_PEERCRED"):
+		return True # the socket file's permissions still keep other users out
+	creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, 12)
+	return int.from_bytes(creds[4:8], sys.byteorder) == os.getuid()
+
+# run one command in a forked child, on the client's stdin, stdout and stderr, and exit with its status
+# Never returns.
+# Args: conn connection to the client; fds the client's stdin, stdout and stderr;
+#       cwd the client's working directory; argv the command line arguments after the program name
+def run_child(conn, fds, cwd, argv):
+	status = 1
+	try:
+		os.setsid() # off the server's terminal, so reading the client's never stops the child
+		signal.signal(signal.SIGINT, signal.default_int_handler) # Ctrl-C, passed on by the client
+		signal.signal(signal.SIGTERM, signal.SIG_DFL)
+		for target, fd in enumerate(fds):
+			os.dup2(fd, target)
+			os.close(fd)
+		sys.stdin = open(0, "r", closefd=False)
+		sys.stdout = open(1, "w", buffering=1 if os.isatty(1) else -1, closefd=False)
+		sys.stderr = open(2, "w", buffering=1, closefd=False)
+		os.chdir(cwd)
+		sys.argv = [str(BASE_DIR / "utodo.py")] + argv
+
+		# a SQLite connection must not be shared with the parent after a fork
+		if isinstance(utodo_storage.backend, utodo_storage.SqliteBackend):
+			utodo_storage.backend = None
+
+		# the client going away, ie. its terminal closing, ends the command too
+		def watch_client():
+			if not conn.recv(1):
+				os._exit(128 + signal.SIGHUP)
+		threading.Thread(target=watch_client, daemon=True).start()
+		conn.sendall(f"pid {os.getpid()}\n".encode())
+
+		try:
+			utodo.main(argv)
+			status = 0
+		except SystemExit as e:
+			status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+			if isinstance(e.code, str):
+				print(e.code, file=sys.stderr)
+		except BaseException:
+			import traceback
+			traceback.print_exc()
+	finally:
+		# save what the command changed, as the end of a utodo.py run would
+		utodo_storage.save_all()
+		utodo_metrics.flush()
+		try:
+			sys.stdout.flush()
+			sys.stderr.flush()
+			conn.sendall(f"status {status}\n".encode())
+		except OSError:
+			pass
+		os._exit(status)
+
+class Server:
+
+	def __init__(self):
+		self.watcher = utodo_watch.watch(DATA_DIR)
+		self.children = set()
+		self.stopping = False
+
+	# parse every list and load the indexes, so later commands find them ready
+	# A step at a time: run takes commands in between, so a client never waits for the whole of it,
+	# and a command forked before the end loads what it is missing itself
+	def warm(self):
+		store = utodo_core.storage()
+		for list_name in store.list_names():
+			store.read_list(list_name)
+			yield
+		if isinstance(store, utodo_storage.TextBackend):
+			utodo_index.get_index()
+			yield
+			utodo_search.get_index()
+		logging.info(f"UTodo server loaded {utodo_core.num_lists()} lists")
+
+	# re-read the lists changed since the last look, by this server's commands or anybody else
+	def refresh(self):
+		changed = self.watcher.changed()
+		if changed is not None and not changed:
+			return
+		utodo_catalog.revalidate(changed)
+		utodo_index.revalidate(changed)
+		utodo_search.revalidate(changed)
+
+		store = utodo_core.storage()
+		if not isinstance(store, utodo_storage.TextBackend):
+			return
+		for list_name in store.list_names() if changed is None else changed:
+			if utodo_journal.list_path(list_name).exists():
+				store.read_list(list_name) # re-read only if its signature moved
+			else:
+				store.list_cache.pop(list_name, None)
+
+	# collect finished children, returning how many there were
+	def reap(self):
+		finished = 0
+		for pid in list(self.children):
+			try:
+				done, status = os.waitpid(pid, os.WNOHANG)
+			except ChildProcessError:
+				done = pid
+			if done:
+				self.children.discard(pid)
+				finished += 1
+		return finished
+
+	# take one client's command and fork a child to run it
+	def handle(self, conn):
+		with conn:
+			if not same_user(conn):
+				logging.warning("UTodo server refused a connection from another user")
+				return
+			# the working directory and arguments, NUL-separated, with the client's stdin, stdout and stderr
+			data, fds, flags, address = socket.recv_fds(conn, MAX_REQUEST, 3)
+			if len(fds) != 3 or not data:
+				logging.error(f"UTodo server got a bad request with {len(fds)} file descriptors")
+				for fd in fds:
+					os.close(fd)
+				return
+			cwd, *argv = [os.fsdecode(arg) for arg in data.split(b"\0")]
+
+			self.refresh()
+			sys.stdout.flush()
+			sys.stderr.flush()
+			pid = os.fork()
+			if pid == 0:
+				self.listener.close()
+				run_child(conn, fds, cwd, argv)
+			for fd in fds:
+				os.close(fd)
+			self.children.add(pid)
+
+	# serve commands until SIGINT or SIGTERM, warming up while none are waiting
+	def run(self):
+		SOCKET_FILE.parent.mkdir(parents=True, exist_ok=True)
+		SOCKET_FILE.unlink(missing_ok=True) # left by a server that did not stop cleanly
+		self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		old_umask = os.umask(0o177) # the socket is created readable and writable by this user only
+		try:
+			self.listener.bind(str(SOCKET_FILE))
+		finally:
+			os.umask(old_umask)
+		self.listener.listen(16)
+
+		selector = selectors.DefaultSelector()
+		selector.register(self.listener, selectors.EVENT_READ)
+		PID_FILE.write_text(str(os.getpid()))
+		logging.info(f"UTodo server listening on {SOCKET_FILE}")
+		warming = self.warm()
+		try:
+			while not self.stopping:
+				ready = selector.select(timeout=0 if warming else 1.0)
+				if self.reap():
+					self.refresh() # catch up on what the commands changed while waiting for the next one
+				if ready:
+					conn, address = self.listener.accept()
+					self.handle(conn)
+				elif warming:
+					try:
+						next(warming)
+					except StopIteration:
+						warming = None
+		finally:
+			selector.close()
+			self.listener.close()
+			SOCKET_FILE.unlink(missing_ok=True)
+			PID_FILE.unlink(missing_ok=True)
+			self.watcher.close()
+			logging.info("UTodo server stopped")
+
+	def stop(self, *args):
+		self.stopping = True
+
+if __name__ == "__main__":
+	utodo_core.load_env()
+	utodo_core.setup_logging()
+
+	parser = argparse.ArgumentParser(description="Keep UTodo loaded so `utodo` commands start instantly.")
+	parser.add_argument("--stop", action="store_true", help="stop the running server")
+	args = parser.parse_args()
+
+	if args.stop:
+		if not server_running():
+			print("No UTodo server is running.")
+			sys.exit(1)
+		os.kill(int(PID_FILE.read_text()), signal.SIGTERM)
+		sys.exit(0)
+
+	if server_running():
+		print(f"A UTodo server is already running (see {PID_FILE}).")
+		sys.exit(1)
+
+	utodo_core.init_data_dir()
+	server = Server()
+	for sig in (signal.SIGINT, signal.SIGTERM):
+		signal.signal(sig, server.stop)
+	server.run()
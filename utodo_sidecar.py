@@ -0,0 +1,178 @@
+# This file holds what the UTodo application's sidecar files under data/.utodo have in common.
+# The due-date index and the search index are each one JSON file with an entry per list, and an entry is
+# trusted only while its list's signature (see utodo_journal.list_signature) is the one recorded with it,
+# so a list changed by another process is read again when the index is next loaded or revalidated.
+
+import os
+import json
+import atexit
+from pathlib import Path
+
+import utodo_journal
+import utodo_metrics
+
+# return the names of the lists in the data directory, going by their files
+def list_names_on_disk():
+	return [file.stem.replace('_', ' ') for file in utodo_journal.DATA_DIR.iterdir() if file.is_file() and file.suffix == ".txt"]
+
+# read a JSON sidecar file as-is, or None if it is missing or unreadable
+def read_json(path):
+	try:
+		with open(path, "r") as sidecar_file:
+			return json.load(sidecar_file)
+	except (OSError, ValueError):
+		return None
+
+# write a JSON sidecar file atomically so a reader never sees a half-written file
+def save_json(path, value):
+	path.parent.mkdir(exist_ok=True)
+	tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+	with open(tmp_path, "w") as tmp_file:
+		json.dump(value, tmp_file)
+	os.replace(tmp_path, path)
+
+# An index with an entry per list, {"version": ..., "lists": {list name: {"sig": signature, ...}}, ...},
+# saved as one JSON file. Subclasses say what a list's entries are; loading, saving and keeping the
+# entries in step with the lists' signatures are done here.
+# Changes are saved when the process exits; a crash only costs reading the lists that moved again.
+class ListIndex:
+	file_name = None # name of the index file in data/.utodo
+	version = 1 # stored in the file - an index saved with another version is built again
+	target = None # label of the index's metrics
+
+	def __init__(self):
+		self.current = None # index loaded by this process
+		self.dirty = False # whether it has changes not yet saved
+		self.path = utodo_journal.DATA_DIR / ".utodo" / self.file_name
+		atexit.register(self.flush)
+
+	# return an index holding no lists
+	def empty(self):
+		return {"version": self.version, "lists": {}}
+
+	# read one list and add its entries to the index, including index["lists"][list_name] with its sig
+	def add_list_entries(self, index, list_name, sig):
+		raise NotImplementedError
+
+	# remove every entry a list has in the index, including index["lists"][list_name]
+	def drop_list_entries(self, index, list_name):
+		raise NotImplementedError
+
+	# update a list's entries for changed tasks; entry is index["lists"][list_name], its sig is set afterwards
+	def apply_entries(self, index, entry, list_name, removed, added):
+		raise NotImplementedError
+
+	# read the index file as-is, or an empty index if it is missing, unreadable or of another version
+	def read(self):
+		index = read_json(self.path)
+		if not isinstance(index, dict) or index.get("version") != self.version:
+			return self.empty()
+		return index
+
+	# load the index, re-reading only the lists whose signatures changed since it was saved
+	def load(self):
+		with utodo_metrics.timer("dir_scan", target=self.target):
+			index = self.read()
+			changed = False
+
+			seen = set()
+			for list_name in list_names_on_disk():
+				seen.add(list_name)
+				sig = utodo_journal.list_signature(list_name)
+				entry = index["lists"].get(list_name)
+				if entry is None or entry.get("sig") != sig:
+					self.drop_list_entries(index, list_name)
+					self.add_list_entries(index, list_name, sig)
+					utodo_metrics.count("lists_reindexed", target=self.target)
+					changed = True
+
+			# forget lists whose files were deleted
+			for list_name in [name for name in index["lists"] if name not in seen]:
+				self.drop_list_entries(index, list_name)
+				changed = True
+
+			if changed:
+				save_json(self.path, index)
+		self.current = index
+		return index
+
+	# return the index this process already loaded, loading it on first use
+	def get(self):
+		return self.current if self.current is not None else self.load()
+
+	# save the index if this process changed it, run automatically at exit
+	def flush(self):
+		if self.dirty and self.current is not None:
+			save_json(self.path, self.current)
+		self.dirty = False
+
+	# point the index at another data directory, saving and forgetting the old directory's index
+	# Args: data_dir path of a directory holding to-do list files
+	def set_data_dir(self, data_dir):
+		self.flush()
+		self.current = None
+		self.path = Path(data_dir) / ".utodo" / self.file_name
+
+	# load a saved index ahead of a change to a list, while the list still has the signature the index
+	# recorded for it - apply_change then patches the list's entry instead of reading the list again
+	# An index never saved is left to be built when something first queries it
+	def before_change(self):
+		if self.current is None and self.path.exists():
+			self.load()
+
+	# re-read a single list after it has been written
+	# Args: list_name string with whitespace, ie. "Sample List"
+	def update_list(self, list_name):
+		index = self.current
+		if index is None:
+			return
+		self.drop_list_entries(index, list_name)
+		if utodo_journal.list_path(list_name).exists():
+			self.add_list_entries(index, list_name, utodo_journal.list_signature(list_name))
+		self.dirty = True
+
+	# remove a deleted list from the index
+	# Args: list_name string with whitespace, ie. "Sample List"
+	def remove_list(self, list_name):
+		index = self.current
+		if index is None:
+			return
+		self.drop_list_entries(index, list_name)
+		self.dirty = True
+
+	# bring a loaded index up to date with lists changed by other processes
+	# Only the given lists are re-read, and only if their signatures moved; with no names every list
+	# file's signature is checked, which is the fallback when nothing reported what changed
+	# Args: list_names names of lists that may have changed, or None if unknown
+	def revalidate(self, list_names=None):
+		if self.current is None:
+			return # load checks every list when it first runs
+		if list_names is None:
+			list_names = set(self.current["lists"])
+			list_names.update(list_names_on_disk())
+
+		for list_name in list_names:
+			entry = self.current["lists"].get(list_name)
+			if not utodo_journal.list_path(list_name).exists():
+				if entry is not None:
+					self.remove_list(list_name)
+			elif entry is None or entry.get("sig") != utodo_journal.list_signature(list_name):
+				self.update_list(list_name)
+
+	# update the index for changed tasks without re-reading their list
+	# Args: list_name string with whitespace; old_sig/new_sig list signatures before and after the change;
+	#       removed/added lists of task lines the change took out of or put into the list
+	def apply_change(self, list_name, old_sig, new_sig, removed, added):
+		index = self.current
+		if index is None:
+			return
+		entry = index["lists"].get(list_name)
+		self.dirty = True
+
+		if entry is None or entry["sig"] != old_sig:
+			# the index was already behind this list, so read it again
+			self.update_list(list_name)
+			return
+
+		self.apply_entries(index, entry, list_name, removed, added)
+		entry["sig"] = new_sig
@@ -0,0 +1,577 @@
+# This file provides the storage backends for to-do lists in the UTodo application.
+# Lists can live in the pipe-delimited data/*.txt files (the default) or in a SQLite database,
+# chosen by the optional "Storage" setting in data/settings.json ("text" or "sqlite").
+#
+# Run `python utodo_storage.py import` to copy data/*.txt into the database, or
+# `python utodo_storage.py export` to write the database back out as data/*.txt.
+
+import sys
+import json
+import itertools
+import sqlite3
+from contextlib import contextmanager, nullcontext
+from datetime import date
+from pathlib import Path
+
+import utodo_catalog
+import utodo_hashes
+import utodo_index
+import utodo_journal
+import utodo_lock
+import utodo_metrics
+import utodo_offsets
+import utodo_recur
+import utodo_search
+
+BASE_DIR = Path(__file__).parent
+DATA_DIR = BASE_DIR / "data"
+SETTINGS_FILE = DATA_DIR / "settings.json"
+DATABASE_FILE = DATA_DIR / "utodo.db"
+
+# Every backend stores tasks as lines in the "name|YYYY-MM-DD|description" format and
+# addresses them by their 1-based position within a list, like the menus do.
+class StorageBackend:
+
+	# return the names of every to-do list
+	def list_names(self):
+		raise NotImplementedError
+
+	# return the number of to-do lists
+	def num_lists(self):
+		return len(self.list_names())
+
+	# return the number of tasks in a list
+	def num_tasks(self, list_name):
+		return len(self.read_list(list_name))
+
+	# return the task lines of a list, in order
+	def read_list(self, list_name):
+		raise NotImplementedError
+
+	# yield the task lines of a list, in order, without holding the whole list where possible
+	def iter_list(self, list_name):
+		yield from self.read_list(list_name)
+
+	# return the task lines from 0-based position start up to (not including) stop, in order
+	# reading no further into the list than stop where the backend allows
+	def read_range(self, list_name, start, stop):
+		return list(itertools.islice(self.iter_list(list_name), start, stop))
+
+	# check whether an exact copy of a task line (ignoring surrounding whitespace) is already in a list
+	def has_task(self, list_name, task):
+		task = task.strip()
+		return any(line.strip() == task for line in self.iter_list(list_name))
+
+	# return groups of tasks that share a name and due date but differ in description, across every list
+	# each group is [(list name, task line), ...]
+	def near_duplicates(self):
+		groups = {}
+		for list_name in self.list_names():
+			for line in self.iter_list(list_name):
+				name, due, description = split_task(line.strip())
+				groups.setdefault((name, due), {}).setdefault(description, []).append((list_name, line))
+		return [sum(found.values(), []) for found in groups.values() if len(found) > 1]
+
+	# return [(list name, task line), ...] for tasks whose name or description has a word starting with
+	# every word of the query, due between first and last if given, ordered by due date
+	# first/last are datetime.date objects, None leaves that end of the range open
+	def search(self, query, first=None, last=None):
+		terms = utodo_search.query_terms(query)
+		if not terms:
+			return []
+		return utodo_search.sort_hits([(list_name, line) for list_name in self.list_names() for line in self.iter_list(list_name)
+			if utodo_search.matches(line, terms) and utodo_search.due_in_range(line, first, last)])
+
+	# create an empty list, returning where it was stored
+	def create_list(self, list_name):
+		raise NotImplementedError
+
+	# delete a list and its tasks, returning False if it did not exist
+	def delete_list(self, list_name):
+		raise NotImplementedError
+
+	# replace every task in a list (creating it if needed), used to import and export
+	def replace_list(self, list_name, lines):
+		raise NotImplementedError
+
+	# add a task line to the end of a list
+	def add_task(self, list_name, task):
+		raise NotImplementedError
+
+	# add several task lines to the end of a list in one write
+	def add_tasks(self, list_name, tasks):
+		for task in tasks:
+			self.add_task(list_name, task)
+
+	# replace the task at task_num with a new task line
+	# old_task is the task's line as the caller read it, if the caller may have waited on a user since:
+	# the task is then found wherever it moved to, or LookupError raised if it changed (see find_task)
+	def edit_task(self, list_name, task_num, new_task, old_task=None):
+		raise NotImplementedError
+
+	# remove the task at task_num; op is "delete" or "complete"; old_task as for edit_task
+	def remove_task(self, list_name, task_num, op="delete", old_task=None):
+		raise NotImplementedError
+
+	# remove several tasks by position in one write
+	def remove_tasks(self, list_name, task_nums, op="delete"):
+		for task_num in sorted(task_nums, reverse=True): # later positions first so earlier ones stay put
+			self.remove_task(list_name, task_num, op)
+
+	# return [(list name, task line), ...] for tasks due between first and last, inclusive
+	# first/last are datetime.date objects, None leaves that end of the range open
+	def due_between(self, first, last):
+		raise NotImplementedError
+
+	# yield (due date, list name, task line) for a list's tasks due between first and last, inclusive,
+	# in due-date order (same-day tasks in list order), leaving out repeating tasks - see utodo_core.agenda
+	# first/last are datetime.date objects, None leaves that end of the range open
+	def due_run(self, list_name, first=None, last=None):
+		run = []
+		for line in self.iter_list(list_name):
+			day = utodo_index.task_day(line)
+			if day is not None and (first is None or day >= first.isoformat()) and (last is None or day <= last.isoformat()):
+				run.append((day, line))
+		run.sort(key=lambda item: item[0])
+		for day, line in run:
+			yield date.fromisoformat(day), list_name, line
+
+	# return a due_run for every list
+	def due_runs(self, first=None, last=None):
+		return [self.due_run(list_name, first, last) for list_name in self.list_names()]
+
+	# return [(list name, task line), ...] for every repeating task, whose occurrences the caller
+	# works out for the dates it wants (see utodo_core.due_occurrences)
+	def recurring_tasks(self):
+		return [(list_name, line) for list_name in self.list_names() for line in self.iter_list(list_name)
+			if utodo_recur.line_rule(line) is not None]
+
+	# context for bulk writes, where a backend may put off index upkeep until the end
+	def bulk(self):
+		return nullcontext()
+
+	# context keeping other sessions from changing a list, for a caller that reads tasks and then
+	# changes them - the backend's own writes already hold it
+	def lock(self, list_name):
+		return nullcontext()
+
+	# return the 1-based position of a task as it was read earlier; task_num is where it was then,
+	# and other sessions may have moved it since
+	# Raises LookupError if another session changed or removed the task
+	def find_task(self, list_name, task_num, old_task):
+		if self.read_range(list_name, task_num - 1, task_num) == [old_task]:
+			return task_num
+		for num, line in enumerate(self.iter_list(list_name), 1):
+			if line == old_task:
+				return num
+		raise LookupError(f"task {task_num} of {list_name} was changed or removed in another session")
+
+# Lists stored as data/<list>.txt, changed through the write-ahead journal
+class TextBackend(StorageBackend):
+
+	def __init__(self):
+		# per-session cache of to-do list lines: {list name: (signature, [lines])}
+		self.list_cache = {}
+		# set during bulk writes - the due index is left alone and catches up by signature when next loaded,
+		# and duplicate checks trust the hash sets this process is keeping up to date
+		self.in_bulk = False
+
+	@contextmanager
+	def bulk(self):
+		self.in_bulk = True
+		try:
+			yield
+		finally:
+			self.in_bulk = False
+
+	# the list's advisory lock, see utodo_lock
+	def lock(self, list_name):
+		return utodo_lock.exclusive(list_name)
+
+	def list_names(self):
+		return utodo_catalog.get_list_names()
+
+	def num_lists(self):
+		return utodo_catalog.get_num_lists()
+
+	def num_tasks(self, list_name):
+		info = utodo_catalog.get_list_info(list_name)
+		return info["tasks"] if info is not None else 0 # an unknown list has no tasks, as in SQLite
+
+	# re-reads the file and journal only when they have changed on disk
+	def read_list(self, list_name):
+		sig = utodo_journal.list_signature(list_name)
+
+		cached = self.list_cache.get(list_name)
+		if cached is not None and cached[0] == sig:
+			utodo_metrics.count("list_cache", result="hit")
+			return cached[1]
+
+		utodo_metrics.count("list_cache", result="miss")
+		lines = utodo_journal.read_list(list_name) # the list file with any journaled changes applied
+		self.list_cache[list_name] = (sig, lines)
+		return lines
+
+	# streams the list file line by line when there are no journaled changes to apply
+	def iter_list(self, list_name):
+		if utodo_journal.journal_path(list_name).exists() or list_name in self.list_cache:
+			yield from self.read_list(list_name)
+			return
+		with open(utodo_journal.list_path(list_name), "r") as file:
+			for line in file:
+				yield line.rstrip("\n")
+
+	# reads just the lines asked for through the list file's offset index, unless the whole list is cached
+	def read_range(self, list_name, start, stop):
+		cached = self.list_cache.get(list_name)
+		if cached is not None and cached[0] == utodo_journal.list_signature(list_name):
+			return cached[1][start:stop]
+		return utodo_journal.read_range(list_name, start, stop)
+
+	# called after a whole list file is written or removed so cached and indexed copies are refreshed
+	def list_written(self, list_name):
+		self.list_cache.pop(list_name, None) # mtime may not tick between quick writes, so never trust the old entry
+		utodo_hashes.forget_list(list_name)
+		utodo_offsets.forget_list(list_name)
+		if self.in_bulk:
+			pass
+		elif utodo_journal.list_path(list_name).exists():
+			utodo_index.update_list(list_name)
+			utodo_search.update_list(list_name)
+		else:
+			utodo_index.remove_list(list_name)
+			utodo_search.remove_list(list_name)
+		utodo_catalog.update_list(list_name)
+
+	# journals changes to a list in one write and updates the cached and indexed copies in place, all
+	# under the list's lock so another session's change cannot land between the append and the updates
+	# entries are the journal entries; changes is a list of (task position, old task line, new task line)
+	# they make, applied in order - the position is None for a new task, and old/new lines are None when absent
+	def record_changes(self, list_name, entries, changes):
+		if not self.in_bulk:
+			# loaded now, an index sees the list as it was before the append and patches its entry; loaded
+			# after, it would find the list's signature moved and read the whole list again
+			utodo_index.due_index.before_change()
+			utodo_search.search_index.before_change()
+		with self.lock(list_name):
+			old_sig = utodo_journal.list_signature(list_name)
+			utodo_journal.append_many(list_name, entries)
+			new_sig = utodo_journal.list_signature(list_name)
+
+			# apply the same changes to the cached lines instead of reading the list again
+			cached = self.list_cache.pop(list_name, None)
+			if cached is not None and cached[0] == old_sig:
+				lines = cached[1]
+				for task_num, old_task, new_task in changes:
+					if old_task is None:
+						lines.append(new_task)
+					elif new_task is None:
+						del lines[task_num - 1]
+					else:
+						lines[task_num - 1] = new_task
+				self.list_cache[list_name] = (new_sig, lines)
+
+			removed = [change[1] for change in changes if change[1] is not None]
+			added = [change[2] for change in changes if change[2] is not None]
+			if not self.in_bulk:
+				utodo_index.apply_change(list_name, old_sig, new_sig, removed, added)
+				utodo_search.apply_change(list_name, old_sig, new_sig, removed, added)
+			utodo_hashes.apply_change(list_name, old_sig, new_sig, removed, added)
+			utodo_catalog.apply_change(list_name, old_sig, new_sig, len(added) - len(removed))
+
+	# looks the task up in the list's persisted hash set
+	def has_task(self, list_name, task):
+		return utodo_hashes.contains(list_name, task, trust_loaded=self.in_bulk)
+
+	def near_duplicates(self):
+		return utodo_hashes.find_near_duplicates(self.list_names())
+
+	# looks the words up in the persisted inverted index
+	def search(self, query, first=None, last=None):
+		return utodo_search.search(query, first, last)
+
+	def create_list(self, list_name):
+		file_path = f"data/{list_name.replace(' ', '_')}.txt"
+		with self.lock(list_name):
+			open(utodo_journal.list_path(list_name), "w").close()
+			self.list_written(list_name)
+		return file_path
+
+	def delete_list(self, list_name):
+		path = utodo_journal.list_path(list_name)
+		with self.lock(list_name):
+			if not path.exists():
+				return False
+			path.unlink(missing_ok=True) # if somehow an error is thrown, nothing happens and silent
+			utodo_journal.discard(list_name)
+			self.list_written(list_name)
+		return True
+
+	def replace_list(self, list_name, lines):
+		with self.lock(list_name):
+			utodo_journal.discard(list_name)
+			utodo_journal.write_snapshot(list_name, lines)
+			self.list_written(list_name)
+
+	def add_task(self, list_name, task):
+		self.add_tasks(list_name, [task])
+
+	def add_tasks(self, list_name, tasks):
+		if tasks:
+			entry = {"op": "add", "task": tasks[0]} if len(tasks) == 1 else {"op": "add", "tasks": list(tasks)}
+			self.record_changes(list_name, [entry], [(None, None, task) for task in tasks])
+
+	def edit_task(self, list_name, task_num, new_task, old_task=None):
+		with self.lock(list_name):
+			if old_task is None:
+				old_task = self.read_range(list_name, task_num - 1, task_num)[0]
+			else:
+				task_num = self.find_task(list_name, task_num, old_task)
+			entry = {"op": "edit", "id": utodo_journal.task_id(old_task), "task": new_task}
+			self.record_changes(list_name, [entry], [(task_num, old_task, new_task)])
+
+	# tombstones tasks by their ids in the list's journal - they are dropped from the list file at compaction
+	def remove_task(self, list_name, task_num, op="delete", old_task=None):
+		with self.lock(list_name):
+			if old_task is not None:
+				task_num = self.find_task(list_name, task_num, old_task)
+			self.remove_tasks(list_name, [task_num], op)
+
+	def remove_tasks(self, list_name, task_nums, op="delete"):
+		with self.lock(list_name):
+			# a single task is read through the offset index, several from the whole list
+			lines = self.read_list(list_name) if len(task_nums) > 1 else None
+			entries = []
+			changes = []
+			for num in sorted(task_nums, reverse=True): # later positions first so earlier ones stay put
+				task = lines[num - 1] if lines is not None else self.read_range(list_name, num - 1, num)[0]
+				entries.append({"op": op, "id": utodo_journal.task_id(task)})
+				changes.append((num, task, None))
+			self.record_changes(list_name, entries, changes)
+
+	def due_between(self, first, last):
+		return utodo_index.due_between(utodo_index.get_index(), first, last)
+
+	def recurring_tasks(self):
+		return utodo_index.recurring(utodo_index.get_index())
+
+	# walks the list's own due dates in the due index
+	def due_run(self, list_name, first=None, last=None):
+		return utodo_index.list_run(utodo_index.get_index(), list_name, first, last)
+
+	# the runs share the due index's tasks grouped by list as they are read
+	def due_runs(self, first=None, last=None):
+		index = utodo_index.get_index()
+		grouped = {}
+		return [utodo_index.list_run(index, list_name, first, last, grouped) for list_name in self.list_names()]
+
+# split a task line into (name, due, description) columns, None for fields the line does not have
+# The description keeps any further '|' characters so the line can be rebuilt exactly
+def split_task(task):
+	fields = task.split('|', 2)
+	return fields + [None] * (3 - len(fields))
+
+# rebuild a task line from its columns
+def join_task(name, due, description):
+	return "|".join(field for field in (name, due, description) if field is not None)
+
+# Lists stored in a SQLite database with indexes on list position and due date
+class SqliteBackend(StorageBackend):
+
+	def __init__(self, path=None):
+		self.path = path or DATABASE_FILE
+		self.conn = sqlite3.connect(self.path)
+		self.conn.execute("PRAGMA foreign_keys = ON")
+		with self.conn:
+			self.conn.execute("CREATE TABLE IF NOT EXISTS lists (name TEXT PRIMARY KEY)")
+			self.conn.execute("""CREATE TABLE IF NOT EXISTS tasks (
+				id INTEGER PRIMARY KEY,
+				list TEXT NOT NULL REFERENCES lists (name) ON DELETE CASCADE,
+				pos INTEGER NOT NULL,
+				name TEXT NOT NULL,
+				due TEXT,
+				description TEXT)""")
+			self.conn.execute("CREATE INDEX IF NOT EXISTS tasks_by_list ON tasks (list, pos)")
+			self.conn.execute("CREATE INDEX IF NOT EXISTS tasks_by_due ON tasks (due)")
+			self.conn.execute("CREATE INDEX IF NOT EXISTS tasks_by_name ON tasks (list, name, due)")
+
+	def list_names(self):
+		return [row[0] for row in self.conn.execute("SELECT name FROM lists ORDER BY rowid")]
+
+	def num_lists(self):
+		return self.conn.execute("SELECT COUNT(*) FROM lists").fetchone()[0]
+
+	def num_tasks(self, list_name):
+		return self.conn.execute("SELECT COUNT(*) FROM tasks WHERE list = ?", (list_name,)).fetchone()[0]
+
+	def read_list(self, list_name):
+		rows = self.conn.execute("SELECT name, due, description FROM tasks WHERE list = ? ORDER BY pos", (list_name,))
+		return [join_task(*row) for row in rows]
+
+	def iter_list(self, list_name):
+		rows = self.conn.execute("SELECT name, due, description FROM tasks WHERE list = ? ORDER BY pos", (list_name,))
+		for row in rows:
+			yield join_task(*row)
+
+	def read_range(self, list_name, start, stop):
+		rows = self.conn.execute("SELECT name, due, description FROM tasks WHERE list = ? ORDER BY pos LIMIT ? OFFSET ?",
+			(list_name, max(stop - start, 0), start))
+		return [join_task(*row) for row in rows]
+
+	# an indexed lookup on list, name and due date
+	def has_task(self, list_name, task):
+		name, due, description = split_task(task.strip())
+		row = self.conn.execute("""SELECT 1 FROM tasks
+			WHERE list = ? AND name = ? AND due IS ? AND description IS ? LIMIT 1""",
+			(list_name, name, due, description)).fetchone()
+		return row is not None
+
+	def near_duplicates(self):
+		rows = self.conn.execute("""SELECT list, name, due, description FROM tasks
+			WHERE (name, due) IN (SELECT name, due FROM tasks GROUP BY name, due HAVING COUNT(DISTINCT COALESCE(description, '')) > 1)
+			ORDER BY name, due, list, pos""")
+		groups = {}
+		for row in rows:
+			groups.setdefault((row[1], row[2]), []).append((row[0], join_task(*row[1:])))
+		return list(groups.values())
+
+	# return the row id of the task at a 1-based position in a list
+	def task_row(self, list_name, task_num):
+		row = self.conn.execute("SELECT id FROM tasks WHERE list = ? ORDER BY pos LIMIT 1 OFFSET ?",
+			(list_name, task_num - 1)).fetchone()
+		if row is None:
+			raise IndexError(f"{list_name} has no task {task_num}")
+		return row[0]
+
+	def create_list(self, list_name):
+		with self.conn:
+			self.conn.execute("INSERT OR IGNORE INTO lists (name) VALUES (?)", (list_name,))
+		return str(Path("data") / self.path.name)
+
+	def delete_list(self, list_name):
+		with self.conn:
+			deleted = self.conn.execute("DELETE FROM lists WHERE name = ?", (list_name,)).rowcount
+		return deleted > 0
+
+	def replace_list(self, list_name, lines):
+		with self.conn:
+			self.conn.execute("INSERT OR IGNORE INTO lists (name) VALUES (?)", (list_name,))
+			self.conn.execute("DELETE FROM tasks WHERE list = ?", (list_name,))
+			self.conn.executemany("INSERT INTO tasks (list, pos, name, due, description) VALUES (?, ?, ?, ?, ?)",
+				((list_name, pos, *split_task(line)) for pos, line in enumerate(lines, 1)))
+
+	def add_task(self, list_name, task):
+		with self.conn:
+			self.conn.execute("""INSERT INTO tasks (list, pos, name, due, description)
+				SELECT ?, COALESCE(MAX(pos), 0) + 1, ?, ?, ? FROM tasks WHERE list = ?""",
+				(list_name, *split_task(task), list_name))
+
+	def add_tasks(self, list_name, tasks):
+		with self.conn:
+			start = self.conn.execute("SELECT COALESCE(MAX(pos), 0) FROM tasks WHERE list = ?", (list_name,)).fetchone()[0]
+			self.conn.executemany("INSERT INTO tasks (list, pos, name, due, description) VALUES (?, ?, ?, ?, ?)",
+				((list_name, pos, *split_task(task)) for pos, task in enumerate(tasks, start + 1)))
+
+	def edit_task(self, list_name, task_num, new_task, old_task=None):
+		with self.conn:
+			if old_task is not None:
+				task_num = self.find_task(list_name, task_num, old_task)
+			self.conn.execute("UPDATE tasks SET name = ?, due = ?, description = ? WHERE id = ?",
+				(*split_task(new_task), self.task_row(list_name, task_num)))
+
+	def remove_task(self, list_name, task_num, op="delete", old_task=None):
+		with self.conn:
+			if old_task is not None:
+				task_num = self.find_task(list_name, task_num, old_task)
+			self.conn.execute("DELETE FROM tasks WHERE id = ?", (self.task_row(list_name, task_num),))
+
+	def remove_tasks(self, list_name, task_nums, op="delete"):
+		rows = [self.task_row(list_name, num) for num in task_nums]
+		with self.conn:
+			self.conn.executemany("DELETE FROM tasks WHERE id = ?", ((row,) for row in rows))
+
+	def due_between(self, first, last):
+		rows = self.conn.execute("""SELECT list, name, due, description FROM tasks
+			WHERE due BETWEEN ? AND ? AND due NOT LIKE '% every %' ORDER BY due, list, pos""",
+			("" if first is None else first.isoformat(), "9999-12-31" if last is None else last.isoformat()))
+		# BETWEEN compares text, so it also lets through dates that do not exist, ie. 2025-02-30
+		hits = [(row[0], join_task(*row[1:])) for row in rows]
+		return [(list_name, line) for list_name, line in hits if utodo_index.task_day(line) is not None]
+
+	# an indexed query per list, read from the cursor only as far as the caller goes
+	def due_run(self, list_name, first=None, last=None):
+		rows = self.conn.execute("""SELECT name, due, description FROM tasks
+			WHERE list = ? AND due BETWEEN ? AND ? AND due NOT LIKE '% every %' ORDER BY due, pos""",
+			(list_name, "" if first is None else first.isoformat(), "9999-12-31" if last is None else last.isoformat()))
+		for row in rows:
+			line = join_task(*row)
+			day = utodo_index.task_day(line)
+			if day is not None:
+				yield date.fromisoformat(day), list_name, line
+
+	def recurring_tasks(self):
+		rows = self.conn.execute("""SELECT list, name, due, description FROM tasks
+			WHERE due LIKE '% every %' ORDER BY list, pos""")
+		return [(row[0], join_task(*row[1:])) for row in rows if utodo_recur.line_rule(join_task(*row[1:])) is not None]
+
+# backend shared by everything in this process once chosen
+backend = None
+
+# return the storage backend named by the "Storage" setting, "text" when it is not set
+def get_backend():
+	global backend
+
+	if backend is None:
+		try:
+			with open(SETTINGS_FILE, "r") as settings_file:
+				storage = json.load(settings_file).get("Storage", "text")
+		except (OSError, ValueError):
+			storage = "text"
+		backend = SqliteBackend() if storage == "sqlite" else TextBackend()
+	return backend
+
+# switch everything in this process to another data directory, ie. another user's
+# Pending index and hash changes are saved to the old directory first
+# Args: data_dir path of a directory holding settings.json and to-do list files
+def use_data_dir(data_dir):
+	global DATA_DIR, SETTINGS_FILE, DATABASE_FILE, backend
+
+	for module in (utodo_journal, utodo_index, utodo_catalog, utodo_hashes, utodo_search):
+		module.set_data_dir(data_dir)
+	if isinstance(backend, SqliteBackend):
+		backend.conn.close()
+	backend = None
+	DATA_DIR = Path(data_dir)
+	SETTINGS_FILE = DATA_DIR / "settings.json"
+	DATABASE_FILE = DATA_DIR / "utodo.db"
+
+# save what this process changed in the sidecar files and close its journals, as exiting does
+# For a process that ends with os._exit, which skips the atexit handlers
+def save_all():
+	utodo_journal.close_all()
+	utodo_index.due_index.flush()
+	utodo_search.search_index.flush()
+	utodo_catalog.flush()
+	utodo_hashes.flush_hashes()
+
+# copy every list from one backend to another, keeping task order and text exactly
+def copy_lists(source, target):
+	num_tasks = 0
+	for list_name in source.list_names():
+		lines = source.read_list(list_name)
+		target.replace_list(list_name, lines)
+		num_tasks += len(lines)
+	return num_tasks
+
+if __name__ == "__main__":
+	match sys.argv[1:]:
+		case ["import"]:
+			num_tasks = copy_lists(TextBackend(), SqliteBackend())
+			print(f"Imported {num_tasks} tasks into {DATABASE_FILE}.")
+			print("Set \"Storage\": \"sqlite\" in data/settings.json to use it.")
+		case ["export"]:
+			num_tasks = copy_lists(SqliteBackend(), TextBackend())
+			print(f"Exported {num_tasks} tasks to {DATA_DIR}.")
+		case _:
+			print("Usage: python utodo_storage.py import|export")
+			sys.exit(1)
@@ -0,0 +1,174 @@
+# This file stress-tests the UTodo application's list locking with concurrent writers and readers.
+# Writer processes add, edit and remove tasks on the same few lists while reader processes read the
+# lists and build the notification digest, all against a generated data directory. It reports how long
+# writers waited for list locks and how long reads took, then checks that no write was lost and that
+# every list a reader saw was a consistent snapshot.
+#
+# Usage:
+#   python utodo_stress.py                                   4 writers, 4 readers for 5 seconds
+#   python utodo_stress.py --writers 8 --readers 2 --seconds 20
+#   python utodo_stress.py --locked-readers                  readers take shared locks, for comparison
+
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+import utodo_bench
+import utodo_core
+import utodo_lock
+import utodo_notifications
+
+# return the value below which a fraction of the sorted samples fall, in milliseconds
+def percentile(samples, fraction):
+	if not samples:
+		return 0.0
+	return samples[min(len(samples) - 1, int(fraction * len(samples)))] * 1000
+
+# add, edit and remove this writer's own tasks until the deadline
+# Every change goes through the storage backend, which takes the list's lock; edits and removals name
+# the task by its line, so they find it wherever other writers have moved it
+# Args: data_dir generated data directory; list_names lists to write to; deadline time.time() to stop at;
+#       writer number of this writer; results multiprocessing queue for the report
+def writer(data_dir, list_names, deadline, writer, results):
+	utodo_core.use_data_dir(data_dir)
+	utodo_lock.waits = []
+	rng = random.Random(writer)
+	live = {list_name: [] for list_name in list_names}
+	ops = 0
+	errors = []
+
+	while time.time() < deadline:
+		list_name = rng.choice(list_names)
+		mine = live[list_name]
+		op = rng.random()
+		try:
+			if op < 0.6 or not mine:
+				task = f"Writer {writer} task {ops}|2025-01-01|added under contention"
+				utodo_core.storage().add_task(list_name, task)
+				mine.append(task)
+			elif op < 0.8:
+				old_task = mine.pop(rng.randrange(len(mine)))
+				new_task = f"Writer {writer} task {ops}|2025-01-02|edited under contention"
+				utodo_core.storage().edit_task(list_name, 1, new_task, old_task)
+				mine.append(new_task)
+			else:
+				old_task = mine.pop(rng.randrange(len(mine)))
+				utodo_core.storage().remove_task(list_name, 1, "delete", old_task)
+		except LookupError as e:
+			errors.append(str(e)) # only another writer could have changed the task - a lost update
+		ops += 1
+
+	results.put({"role": "writer", "ops": ops, "waits": utodo_lock.waits, "live": live, "errors": errors})
+
+# read the lists, and build the digest as a fresh notifier run would, until the deadline
+# Each list read is checked against the generated tasks, which writers never touch: all of them must be
+# there, once, in their original order
+# Args: data_dir generated data directory; list_names lists to read; originals {list name: [lines]};
+#       deadline time.time() to stop at; locked take a shared lock around each read;
+#       digest build the digest instead of reading lists; results multiprocessing queue for the report
+def reader(data_dir, list_names, originals, deadline, locked, digest, results):
+	utodo_core.use_data_dir(data_dir)
+	utodo_lock.waits = []
+	rng = random.Random()
+	latencies = []
+	errors = []
+
+	while time.time() < deadline:
+		start = time.perf_counter()
+		if digest:
+			utodo_core.use_data_dir(data_dir) # nothing cached, like each cron run
+			utodo_notifications.collect_due_tasks(utodo_notifications.get_windows())
+			latencies.append(time.perf_counter() - start)
+			continue
+
+		list_name = rng.choice(list_names)
+		if locked:
+			with utodo_lock.shared(list_name):
+				lines = utodo_core.storage().read_list(list_name)
+		else:
+			lines = utodo_core.storage().read_list(list_name)
+		latencies.append(time.perf_counter() - start)
+
+		generated = [line for line in lines if not line.startswith("Writer ")]
+		if generated != originals[list_name] or len(set(lines)) != len(lines):
+			errors.append(f"inconsistent read of {list_name}: {len(lines)} tasks")
+
+	results.put({"role": "digest" if digest else "reader", "ops": len(latencies), "latencies": latencies,
+		"waits": utodo_lock.waits, "errors": errors})
+
+# print a line of latency figures for some samples, in seconds
+def print_latencies(label, samples):
+	samples = sorted(samples)
+	print(f"  {label:<20}{len(samples):>10}{percentile(samples, 0.5):>10.3f}{percentile(samples, 0.95):>10.3f}"
+		f"{percentile(samples, 0.99):>10.3f}{percentile(samples, 1.0):>10.3f}")
+
+# run writers and readers against a generated data directory and report on them
+# Returns the number of problems found
+def run(num_writers, num_readers, seconds, num_lists, num_tasks, locked=False):
+	data_dir = Path(tempfile.mkdtemp(prefix="utodo-stress-"))
+	try:
+		utodo_bench.generate(data_dir, num_lists, num_tasks)
+		utodo_core.use_data_dir(data_dir)
+		list_names = utodo_core.list_names()
+		originals = {list_name: utodo_core.storage().read_list(list_name) for list_name in list_names}
+
+		# spawned, so each worker starts with nothing cached, as separate runs of utodo would
+		context = multiprocessing.get_context("spawn")
+		results = context.Queue()
+		deadline = time.time() + seconds + 1 # time for the workers to start up
+		workers = [context.Process(target=writer, args=(data_dir, list_names, deadline, n, results))
+			for n in range(num_writers)]
+		workers += [context.Process(target=reader, args=(data_dir, list_names, originals, deadline, locked, n == 0, results))
+			for n in range(num_readers)]
+		for worker in workers:
+			worker.start()
+		reports = [results.get() for worker in workers]
+		for worker in workers:
+			worker.join()
+
+		print(f"\n{num_writers} writers, {num_readers} readers ({'shared locks' if locked else 'snapshot reads'}), "
+			f"{seconds}s on {num_lists} lists of {num_tasks} tasks")
+		print(f"  {'':<20}{'count':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+		print_latencies("writer lock wait", [wait for report in reports if report["role"] == "writer" for wait in report["waits"]])
+		print_latencies("list read", [latency for report in reports if report["role"] == "reader" for latency in report["latencies"]])
+		print_latencies("digest", [latency for report in reports if report["role"] == "digest" for latency in report["latencies"]])
+		if locked:
+			print_latencies("reader lock wait", [wait for report in reports if report["role"] == "reader" for wait in report["waits"]])
+
+		# every writer's surviving tasks, and nothing else, must be in the lists now
+		utodo_core.use_data_dir(data_dir)
+		problems = [error for report in reports for error in report["errors"]]
+		for list_name in list_names:
+			lines = utodo_core.storage().read_list(list_name)
+			expected = originals[list_name] + [task for report in reports if report["role"] == "writer"
+				for task in report["live"][list_name]]
+			if sorted(lines) != sorted(expected):
+				missing = len(set(expected) - set(lines))
+				extra = len(set(lines) - set(expected))
+				problems.append(f"{list_name}: {missing} writes lost, {extra} tasks that should be gone")
+
+		writes = sum(report["ops"] for report in reports if report["role"] == "writer")
+		print(f"  {writes} writes ({writes / seconds:.0f}/s), {len(problems)} problems")
+		for problem in problems[:20]:
+			print(f"    {problem}")
+		return len(problems)
+	finally:
+		utodo_core.use_data_dir(utodo_core.utodo_storage.BASE_DIR / "data") # saves sidecars while the directory still exists
+		shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Stress-test UTodo list locking with concurrent writers and readers.")
+	parser.add_argument("--writers", type=int, default=4, help="writer processes")
+	parser.add_argument("--readers", type=int, default=4, help="reader processes, the first building digests")
+	parser.add_argument("--seconds", type=float, default=5, help="how long to run")
+	parser.add_argument("--lists", type=int, default=2, help="number of lists, all shared by every worker")
+	parser.add_argument("--tasks", type=int, default=2000, help="number of generated tasks")
+	parser.add_argument("--locked-readers", action="store_true", help="readers take shared locks instead of reading snapshots")
+	args = parser.parse_args()
+
+	sys.exit(1 if run(args.writers, args.readers, args.seconds, args.lists, args.tasks, args.locked_readers) else 0)
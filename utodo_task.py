@@ -0,0 +1,103 @@
+# This file defines the Task record shared by the UTodo application's menus, commands and notifier.
+# A task line "name|YYYY-MM-DD|description" is split and its date parsed once, into a small
+# object with fixed slots instead of a per-instance dict, and can be turned back into the exact line.
+# A repeating task has a utodo_recur.Rule in place of its due date.
+
+from datetime import date, datetime
+
+from utodo_recur import Rule
+
+# return a stored YYYY-MM-DD date as a datetime.date, or the text unchanged if it is anything else
+# Stored dates always have this shape, checked at fixed offsets so date.fromisoformat (about 50
+# times faster than strptime) only sees text it would turn back into the same string
+def parse_iso(text):
+	if len(text) == 10 and text[4] == "-" and text[7] == "-":
+		try:
+			return date.fromisoformat(text)
+		except ValueError:
+			pass
+	return text
+
+# return a due date typed by a user, YYYY-MM-DD or MM/DD/YYYY, as a datetime.date
+# Raises ValueError for anything else
+def parse_due(text):
+	due = parse_iso(text)
+	if isinstance(due, date):
+		return due
+	return datetime.strptime(text, "%m/%d/%Y").date()
+
+class Task:
+	__slots__ = ("name", "due", "description")
+
+	# Args: name string; due datetime.date, a Rule for a repeating task, or a string kept as-is
+	#       (None if the line has no date field); description string, None if the line has no description field
+	def __init__(self, name, due=None, description=None):
+		self.name = name
+		self.due = due
+		self.description = description
+
+	# parse a task line as stored in a to-do list
+	# The description keeps any further '|' characters so the line can be rebuilt exactly
+	@classmethod
+	def from_line(cls, line):
+		fields = line.rstrip("\n").split("|", 2)
+		name = fields[0]
+		due = parse_iso(fields[1]) if len(fields) > 1 else None
+		if isinstance(due, str) and " every " in due:
+			due = Rule.parse(due) or due
+		description = fields[2] if len(fields) > 2 else None
+		return cls(name, due, description)
+
+	# the due date as stored: YYYY-MM-DD, a repeat rule, or the original text if it was not a valid date
+	@property
+	def due_text(self):
+		if isinstance(self.due, date):
+			return self.due.isoformat()
+		if isinstance(self.due, Rule):
+			return self.due.to_text()
+		return self.due or ""
+
+	@property
+	def recurring(self):
+		return isinstance(self.due, Rule)
+
+	# the date the task is next due: its due date, or a repeating task's earliest outstanding occurrence
+	# None if it has no valid due date
+	@property
+	def next_due(self):
+		return self.due_in()
+
+	# return the first date the task is due between first and last, inclusive, or None if it is not
+	# Args: first/last datetime.date objects, None leaves that end of the range open
+	def due_in(self, first=None, last=None):
+		if isinstance(self.due, Rule):
+			return next(self.due.occurrences(first, last), None)
+		if isinstance(self.due, date) and (first is None or self.due >= first) and (last is None or self.due <= last):
+			return self.due
+		return None
+
+	# return one occurrence of a repeating task as a task due on that day
+	def occurrence(self, day):
+		return Task(self.name, day, self.description)
+
+	# the task line as it is stored in a to-do list
+	def to_line(self):
+		fields = [self.name]
+		if self.due is not None:
+			fields.append(self.due_text)
+			if self.description is not None:
+				fields.append(self.description)
+		return "|".join(fields)
+
+	def __eq__(self, other):
+		return isinstance(other, Task) and self.to_line() == other.to_line()
+
+	def __hash__(self):
+		return hash(self.to_line())
+
+	def __repr__(self):
+		return f"Task({self.to_line()!r})"
+
+# parse every line of a list into Task records
+def parse_tasks(lines):
+	return [Task.from_line(line) for line in lines]
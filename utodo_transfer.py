@@ -0,0 +1,161 @@
+# This file streams tasks into and out of the UTodo application as CSV or JSON lines.
+# Records flow through generators one at a time, so memory stays flat however large the file is:
+# only a small write buffer per list is held; duplicate checks use the storage's own hash sets.
+#
+# Record fields: list, name, due (YYYY-MM-DD or MM/DD/YYYY), description
+
+import sys
+import csv
+import json
+from contextlib import nullcontext
+from datetime import date
+
+import utodo_storage
+from utodo_recur import Rule
+from utodo_task import Task, parse_due
+
+FIELDS = ["list", "name", "due", "description"]
+
+# tasks buffered for a list before they are written, and across all lists before everything is flushed
+BUFFER_SIZE = 1000
+MAX_BUFFERED = 50000
+
+# return the format for a file: "csv" or "jsonl", from its extension unless one is given
+def guess_format(path, file_format=None):
+	if file_format:
+		return file_format
+	return "jsonl" if str(path).endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+# open a path for reading or writing text, "-" meaning stdin/stdout (left open afterwards)
+def open_stream(path, mode):
+	if path == "-":
+		return nullcontext(sys.stdin if mode == "r" else sys.stdout)
+	return open(path, mode, newline="", encoding="utf-8")
+
+# yield records from a CSV or JSON lines file
+# Args: path file to read, "-" for stdin; file_format "csv" or "jsonl", guessed from the extension if None
+def read_records(path, file_format=None):
+	with open_stream(path, "r") as stream:
+		if guess_format(path, file_format) == "jsonl":
+			for line_num, line in enumerate(stream, 1):
+				if line.strip():
+					try:
+						yield json.loads(line)
+					except ValueError as e:
+						raise ValueError(f"line {line_num} is not valid JSON ({e})") from None
+		else:
+			yield from csv.DictReader(stream)
+
+# return a due date string as YYYY-MM-DD, accepting MM/DD/YYYY as well, or a repeating task's rule
+# Raises ValueError for anything that is not a date, a rule or text holding one
+def normalize_due(due):
+	if isinstance(due, date):
+		return due.isoformat()
+	if isinstance(due, Rule):
+		return due.to_text()
+	if not isinstance(due, str):
+		raise ValueError(f"due date must be text, not {due!r}")
+	rule = Rule.parse(due.strip()) # a repeating task, as exported
+	if rule is not None:
+		return rule.to_text()
+	return parse_due(due).isoformat() # the storage format is the fast path
+
+# return a text field of a record, raising ValueError if it is missing or not text
+# Args: record dict; field name of the field; required False lets a missing or null field be ""
+def text_field(record, field, required=True):
+	value = record.get(field)
+	if value is None and not required:
+		return ""
+	if value is None:
+		raise ValueError(f"missing field {field!r}")
+	if not isinstance(value, str):
+		raise ValueError(f"field {field!r} must be text, not {value!r}")
+	return value
+
+# turn a record into (list name, task line), rejecting records the list files cannot hold
+# Raises ValueError for a record that is not an object, lacks a field or has one of the wrong type
+def record_to_task(record):
+	if not isinstance(record, dict):
+		raise ValueError(f"expected an object with fields {', '.join(FIELDS)}, not {record!r}")
+	list_name = text_field(record, "list").strip()
+	name = text_field(record, "name")
+	description = text_field(record, "description", required=False)
+	if record.get("due") is None: # a short CSV row leaves it None
+		raise ValueError("missing field 'due'")
+	if not list_name or "|" in name or "\n" in name or "\n" in description:
+		raise ValueError(f"cannot store task {name!r} in list {list_name!r}")
+	return list_name, f"{name}|{normalize_due(record['due'])}|{description}"
+
+# add a stream of records to storage, skipping exact duplicates of stored or earlier tasks
+# Stored tasks are checked through storage.has_task, tasks still buffered through the buffer itself.
+# Args: records iterable of record dicts; storage backend to write to, the configured one if None
+# Returns (number added, number skipped as duplicates)
+def import_records(records, storage=None):
+	storage = storage or utodo_storage.get_backend()
+	known_lists = set(storage.list_names())
+	pending = {} # {list name: {task line: None}} - task lines waiting to be written, in order
+	num_pending = 0
+	added = skipped = 0
+
+	with storage.bulk():
+		try:
+			for record_num, record in enumerate(records, 1):
+				try:
+					list_name, task = record_to_task(record)
+				except ValueError as e:
+					raise ValueError(f"record {record_num}: {e}") from None
+
+				if list_name not in known_lists:
+					storage.create_list(list_name)
+					known_lists.add(list_name)
+
+				batch = pending.setdefault(list_name, {})
+				if task in batch or storage.has_task(list_name, task):
+					skipped += 1
+					continue
+				batch[task] = None
+				num_pending += 1
+				added += 1
+
+				if len(batch) >= BUFFER_SIZE:
+					storage.add_tasks(list_name, list(batch))
+					num_pending -= len(batch)
+					del pending[list_name]
+				elif num_pending >= MAX_BUFFERED:
+					# many lists each holding a partial batch - write them all out
+					for pending_list, pending_batch in pending.items():
+						storage.add_tasks(pending_list, list(pending_batch))
+					pending.clear()
+					num_pending = 0
+		finally:
+			# keep everything accepted before a bad record stopped the import
+			for list_name, batch in pending.items():
+				storage.add_tasks(list_name, list(batch))
+
+	return added, skipped
+
+# yield a record for every task in the given lists, one list streamed at a time
+# Args: list_names names of lists to export, every list if None; storage backend, the configured one if None
+def export_records(list_names=None, storage=None):
+	storage = storage or utodo_storage.get_backend()
+	for list_name in list_names or storage.list_names():
+		for line in storage.iter_list(list_name):
+			task = Task.from_line(line)
+			yield {"list": list_name, "name": task.name, "due": task.due_text, "description": task.description or ""}
+
+# write records to a CSV or JSON lines file, returning how many were written
+# Args: records iterable of record dicts; path file to write, "-" for stdout; file_format "csv" or "jsonl"
+def write_records(records, path, file_format=None):
+	count = 0
+	with open_stream(path, "w") as stream:
+		if guess_format(path, file_format) == "jsonl":
+			for record in records:
+				stream.write(json.dumps(record) + "\n")
+				count += 1
+		else:
+			writer = csv.DictWriter(stream, fieldnames=FIELDS)
+			writer.writeheader()
+			for record in records:
+				writer.writerow(record)
+				count += 1
+	return count
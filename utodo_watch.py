@@ -0,0 +1,96 @@
+# This file watches the data directory for changed to-do lists in the UTodo application.
+# Long-running processes use it to re-parse only the lists that changed since they last looked.
+# On Linux the kernel reports changes through inotify; elsewhere (or if inotify is unavailable)
+# the watcher reports "unknown" and callers fall back to comparing each list's mtime and size.
+
+import os
+import sys
+import struct
+import ctypes
+import ctypes.util
+import logging
+from pathlib import Path
+
+# inotify event flags, from <sys/inotify.h>
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# struct inotify_event: int wd; uint32_t mask, cookie, len; then len bytes of name
+EVENT_HEADER = struct.Struct("iIII")
+
+# return the list a changed file belongs to, or None for files that are not lists or journals
+def file_list_name(file_name):
+	for suffix in (".txt", ".log"):
+		if file_name.endswith(suffix) and not file_name.startswith("."):
+			return file_name[:-len(suffix)].replace('_', ' ')
+	return None
+
+# Reports no changes it can vouch for; callers check every list's signature instead
+class PollingWatcher:
+
+	def changed(self):
+		return None
+
+	def close(self):
+		pass
+
+# Collects the names of changed lists from inotify events on the data and journal directories
+class InotifyWatcher:
+
+	def __init__(self, data_dir):
+		self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+		self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+		if self.fd < 0:
+			raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+		journal_dir = Path(data_dir) / ".utodo" / "journal"
+		journal_dir.mkdir(parents=True, exist_ok=True)
+		for path in (Path(data_dir), journal_dir):
+			if self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK) < 0:
+				error = ctypes.get_errno()
+				os.close(self.fd)
+				raise OSError(error, f"inotify_add_watch failed for {path}")
+
+	# return the names of lists changed since the last call, or None if events were lost
+	def changed(self):
+		names = set()
+		overflowed = False
+		while True:
+			try:
+				data = os.read(self.fd, 65536)
+			except BlockingIOError:
+				break
+			offset = 0
+			while offset < len(data):
+				wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+				offset += EVENT_HEADER.size
+				name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+				offset += length
+				if mask & IN_Q_OVERFLOW:
+					overflowed = True
+				list_name = file_list_name(name)
+				if list_name is not None:
+					names.add(list_name)
+		return None if overflowed else names
+
+	def close(self):
+		os.close(self.fd)
+
+# return the best watcher available for a data directory
+# Args: data_dir path of a directory holding to-do list files
+def watch(data_dir):
+	if sys.platform.startswith("linux"):
+		try:
+			return InotifyWatcher(data_dir)
+		except (OSError, AttributeError) as e:
+			logging.warning(f"inotify unavailable ({e}), checking list mtimes instead")
+	return PollingWatcher()